@@ -1,49 +1,403 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import sqlite3
 import os
-import xml.etree.ElementTree as ET
-import argparse
 import sys
-import time
-import traceback
-# Modifique a linha de importação do datetime para:
-from datetime import datetime
-
-# Para detecção de teclas em diferentes plataformas
-try:
-    # Windows
-    import msvcrt
-    def getch():
-        return msvcrt.getch().decode('utf-8', errors='ignore')
-except ImportError:
+import atexit
+import importlib
+import queue
+import threading
+import zlib
+from contextlib import contextmanager, nullcontext
+
+class _LazyModule:
+    """
+    Adia a importação de um módulo até o primeiro acesso a um atributo.
+    Cada operação só paga pelos módulos que realmente utiliza, o que reduz
+    o tempo de inicialização do executável.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+ET = _LazyModule('xml.etree.ElementTree')
+traceback = _LazyModule('traceback')
+hashlib = _LazyModule('hashlib')
+random = _LazyModule('random')
+
+# False no modo de linha de comando: sem limpar a tela nem aguardar teclas
+INTERACTIVE = True
+
+def _load_getch():
+    """Seleciona a implementação de leitura de tecla da plataforma."""
     try:
-        # Unix/Linux/MacOS
-        import termios
-        import tty
+        # Windows
+        import msvcrt
         def getch():
-            fd = sys.stdin.fileno()
-            old_settings = termios.tcgetattr(fd)
-            try:
-                tty.setraw(fd)
-                ch = sys.stdin.read(1)
-            finally:
-                termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-            return ch
+            return msvcrt.getch().decode('utf-8', errors='ignore')
     except ImportError:
-        # Fallback
-        def getch():
-            return input("Pressione Enter para continuar...")
+        try:
+            # Unix/Linux/MacOS
+            import termios
+            import tty
+            def getch():
+                fd = sys.stdin.fileno()
+                old_settings = termios.tcgetattr(fd)
+                try:
+                    tty.setraw(fd)
+                    ch = sys.stdin.read(1)
+                finally:
+                    termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+                return ch
+        except ImportError:
+            # Fallback
+            def getch():
+                return input("Pressione Enter para continuar...")
+    return getch
+
+def getch():
+    """Lê uma tecla. Os módulos de terminal só são carregados no primeiro uso."""
+    global getch
+    getch = _load_getch()
+    return getch()
+
+def clear_screen():
+    """Limpa a tela apenas no modo interativo."""
+    if INTERACTIVE:
+        os.system('cls' if os.name == 'nt' else 'clear')
 
 # Caminho para o database (ajuste conforme necessário)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATABASE = os.path.join(BASE_DIR, '..', 'Programa de Chamados', 'backend', 'database.db')
 
-def get_db_connection():
-    """Estabelece conexão com o banco de dados SQLite."""
-    conn = sqlite3.connect(DATABASE)
-    conn.execute('PRAGMA foreign_keys = ON')
-    return conn
+# Exibe o detalhe de cada registro processado (--verbose)
+VERBOSE = False
+
+# Intervalo mínimo entre atualizações da linha de progresso (segundos)
+PROGRESS_INTERVAL = 0.5       # Em terminal interativo
+PROGRESS_LOG_INTERVAL = 10    # Saída redirecionada para arquivo/log
+
+# Configuração do pool de conexões
+POOL_MAX_READERS = 4          # Conexões de leitura simultâneas
+POOL_CHECKOUT_TIMEOUT = 30    # Segundos aguardando uma conexão livre
+BUSY_TIMEOUT_MS = 5000        # Espera do SQLite por um bloqueio de outro processo (--busy-timeout)
+DB_PRAGMAS = (
+    'PRAGMA foreign_keys = ON',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Medição de inicialização (--startup-timing / --benchmark-startup)
+STARTUP_TIMING = False
+STARTUP_BUDGET_MS = 200       # Tempo máximo aceitável até a primeira consulta SQL
+STARTUP_MARKER = 'primeira_consulta_sql='
+_first_query_reported = False
+
+def _mark_first_query():
+    """Registra em stderr o instante da primeira consulta SQL da execução."""
+    global _first_query_reported
+    if STARTUP_TIMING and not _first_query_reported:
+        _first_query_reported = True
+        elapsed_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+        sys.stderr.write(f"{STARTUP_MARKER}{time.time():.6f} (script: {elapsed_ms:.1f} ms)\n")
+        sys.stderr.flush()
+
+def benchmark_startup(runs=5):
+    """
+    Mede o tempo entre o lançamento do programa e a primeira consulta SQL
+    de uma exportação de clientes, comparando com STARTUP_BUDGET_MS.
+
+    Em executáveis gerados pelo PyInstaller a medição inclui a extração do
+    --onefile, pois o próprio executável é relançado.
+
+    Returns:
+        bool: True se a mediana estiver dentro do orçamento
+    """
+    import statistics
+    import subprocess
+    import tempfile
+
+    if getattr(sys, 'frozen', False):
+        command = [sys.executable]
+    else:
+        command = [sys.executable, os.path.abspath(__file__)]
+
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, 'benchmark.xml')
+        for _ in range(runs):
+            started = time.time()
+            result = subprocess.run(
+                command + ['--db', DATABASE, '--export-clients', output, '--startup-timing', '--no-history'],
+                capture_output=True, text=True)
+            marker = [line for line in result.stderr.splitlines() if line.startswith(STARTUP_MARKER)]
+            if not marker:
+                print("\nNão foi possível medir a inicialização (nenhuma consulta SQL executada).")
+                print(result.stdout[-500:] or result.stderr[-500:])
+                return False
+            first_query = float(marker[0][len(STARTUP_MARKER):].split()[0])
+            timings.append((first_query - started) * 1000)
+
+    median = statistics.median(timings)
+    print("\nTempo até a primeira consulta SQL:")
+    print(f"  execuções: {runs}")
+    print(f"  mínimo: {min(timings):.1f} ms | mediana: {median:.1f} ms | máximo: {max(timings):.1f} ms")
+    print(f"  orçamento: {STARTUP_BUDGET_MS} ms")
+    if median > STARTUP_BUDGET_MS:
+        print("  REGRESSÃO: a inicialização excedeu o orçamento")
+        return False
+    print("  OK")
+    return True
+
+def _readonly_uri(path):
+    """Monta a URI SQLite somente leitura para o caminho informado."""
+    from urllib.parse import quote
+    normalized = os.path.abspath(path).replace('\\', '/')
+    if not normalized.startswith('/'):
+        normalized = '/' + normalized  # Caminhos Windows (c:/...)
+    return f"file://{quote(normalized, safe='/:')}?mode=ro"
+
+class ConnectionManager:
+    """
+    Gerencia as conexões com o banco de dados SQLite.
+
+    Mantém um pool limitado de conexões de leitura e uma única conexão de
+    escrita. Os pragmas são aplicados uma única vez, quando a conexão é
+    criada, e a saúde da conexão é verificada a cada retirada do pool.
+    """
+
+    def __init__(self, database, max_readers=POOL_MAX_READERS, timeout=POOL_CHECKOUT_TIMEOUT):
+        self.database = database
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer = None
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            'conexoes_criadas': 0,
+            'retiradas_leitura': 0,
+            'retiradas_escrita': 0,
+            'espera_total_s': 0.0,
+            'espera_maxima_s': 0.0,
+            'pico_em_uso': 0,
+            'conexoes_descartadas': 0,
+        }
+
+    def _connect(self, readonly):
+        """Abre uma nova conexão e aplica os pragmas uma única vez."""
+        if readonly:
+            conn = sqlite3.connect(_readonly_uri(self.database), uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False)
+        _mark_first_query()
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f'PRAGMA busy_timeout = {int(BUSY_TIMEOUT_MS)}')
+        with self._lock:
+            self._stats['conexoes_criadas'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """Verifica se a conexão ainda responde."""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._stats['conexoes_descartadas'] += 1
+
+    def _record_wait(self, waited):
+        with self._lock:
+            self._stats['espera_total_s'] += waited
+            self._stats['espera_maxima_s'] = max(self._stats['espera_maxima_s'], waited)
+
+    def _checkout_reader(self):
+        started = time.perf_counter()
+        conn = None
+        while conn is None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.max_readers
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._connect(readonly=True)
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    remaining = self.timeout - (time.perf_counter() - started)
+                    if remaining <= 0:
+                        raise sqlite3.OperationalError(
+                            'Tempo esgotado aguardando conexão de leitura livre')
+                    try:
+                        conn = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                with self._lock:
+                    self._created -= 1
+                conn = None
+
+        self._record_wait(time.perf_counter() - started)
+        with self._lock:
+            self._in_use += 1
+            self._stats['retiradas_leitura'] += 1
+            self._stats['pico_em_uso'] = max(self._stats['pico_em_uso'], self._in_use)
+        return conn
+
+    def _checkin_reader(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        # Encerra qualquer transação de leitura pendente antes de devolver
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def reader(self):
+        """Retira uma conexão de leitura do pool durante o bloco `with`."""
+        conn = self._checkout_reader()
+        try:
+            yield conn
+        finally:
+            self._checkin_reader(conn)
+
+    @contextmanager
+    def writer(self):
+        """
+        Retira a conexão de escrita exclusiva durante o bloco `with`.
+        Alterações não confirmadas ao final do bloco são desfeitas.
+        """
+        started = time.perf_counter()
+        if not self._writer_lock.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError('Tempo esgotado aguardando a conexão de escrita')
+        try:
+            self._record_wait(time.perf_counter() - started)
+            with self._lock:
+                self._stats['retiradas_escrita'] += 1
+            if self._writer is not None and not self._is_healthy(self._writer):
+                self._discard(self._writer)
+                self._writer = None
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            try:
+                yield self._writer
+            finally:
+                if self._writer.in_transaction:
+                    self._writer.rollback()
+        finally:
+            self._writer_lock.release()
+
+    @contextmanager
+    def snapshot(self, readers=2):
+        """
+        Retira `readers` conexões de leitura que enxergam o mesmo instantâneo
+        do banco, para leituras paralelas consistentes entre si.
+
+        A conexão de escrita obtém o bloqueio de escrita (BEGIN IMMEDIATE) só
+        enquanto as transações de leitura são abertas, o que impede que outro
+        programa confirme alterações entre uma e outra. Fora do modo WAL as
+        transações de leitura abertas impedem outros programas de confirmar
+        alterações até que as conexões sejam devolvidas.
+        """
+        conns = []
+        try:
+            for _ in range(readers):
+                conns.append(self._checkout_reader())
+            with self.writer() as write_conn:
+                write_conn.execute('BEGIN IMMEDIATE')
+                for conn in conns:
+                    conn.execute('BEGIN')
+                    conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            yield conns
+        finally:
+            for conn in conns:
+                self._checkin_reader(conn)
+
+    def stats(self):
+        """Retorna as estatísticas de espera e utilização do pool."""
+        with self._lock:
+            stats = dict(self._stats)
+            checkouts = stats['retiradas_leitura'] + stats['retiradas_escrita']
+            stats['leitores_abertos'] = self._created
+            stats['leitores_em_uso'] = self._in_use
+            stats['leitores_maximo'] = self.max_readers
+        stats['espera_media_s'] = stats['espera_total_s'] / checkouts if checkouts else 0.0
+        stats['utilizacao_pico'] = f"{stats['pico_em_uso'] / self.max_readers:.0%}"
+        return stats
 
-def show_error_report(operation, errors, details=None):
+    def close(self):
+        """Fecha todas as conexões ociosas e a conexão de escrita."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+_connection_manager = None
+
+def get_connection_manager():
+    """Retorna o gerenciador de conexões do database atual, criando-o se necessário."""
+    global _connection_manager
+    if _connection_manager is None or _connection_manager.database != DATABASE:
+        if _connection_manager is not None:
+            _connection_manager.close()
+        _connection_manager = ConnectionManager(DATABASE)
+    return _connection_manager
+
+def close_connection_manager():
+    """Fecha o gerenciador de conexões, se houver um ativo."""
+    global _connection_manager
+    if _connection_manager is not None:
+        _connection_manager.close()
+        _connection_manager = None
+
+atexit.register(close_connection_manager)
+
+def print_pool_stats():
+    """Imprime as estatísticas do pool de conexões utilizado na execução."""
+    if _connection_manager is None:
+        return
+    print("\nEstatísticas do pool de conexões:")
+    for key, value in _connection_manager.stats().items():
+        if isinstance(value, float):
+            value = f"{value:.4f}"
+        print(f"  {key}: {value}")
+
+def show_error_report(operation, errors, details=None, stream=None):
     """
     Exibe um relatório detalhado de erros.
     
@@ -51,30 +405,65 @@ def show_error_report(operation, errors, details=None):
         operation (str): Tipo de operação (importação/exportação)
         errors (list): Lista de erros encontrados
         details (dict, optional): Detalhes adicionais da operação
+        stream (file, optional): Destino do relatório (padrão: stdout)
     """
-    os.system('cls' if os.name == 'nt' else 'clear')
-    print("\n┌─────────────────────────────────────────────────────────────┐")
-    print("│                    RELATÓRIO DE ERROS                       │")
-    print("└─────────────────────────────────────────────────────────────┘")
-    print(f"\nOperação: {operation}")
-    print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    from datetime import datetime
+    out = stream or sys.stdout
+    clear_screen()
+    print("\n┌─────────────────────────────────────────────────────────────┐", file=out)
+    print("│                    RELATÓRIO DE ERROS                       │", file=out)
+    print("└─────────────────────────────────────────────────────────────┘", file=out)
+    print(f"\nOperação: {operation}", file=out)
+    print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", file=out)
     
     if details:
-        print("\nDetalhes da Operação:")
+        print("\nDetalhes da Operação:", file=out)
         for key, value in details.items():
-            print(f"  {key}: {value}")
+            print(f"  {key}: {value}", file=out)
     
-    print("\nErros Encontrados:")
+    print("\nErros Encontrados:", file=out)
     for i, error in enumerate(errors, 1):
-        print(f"\n{i}. Tipo de Erro: {error.get('type', 'Desconhecido')}")
-        print(f"   Descrição: {error.get('message', 'Sem descrição')}")
+        print(f"\n{i}. Tipo de Erro: {error.get('type', 'Desconhecido')}", file=out)
+        print(f"   Descrição: {error.get('message', 'Sem descrição')}", file=out)
         if error.get('data'):
-            print(f"   Dados Afetados: {error['data']}")
+            print(f"   Dados Afetados: {error['data']}", file=out)
         if error.get('suggestion'):
-            print(f"   Sugestão: {error['suggestion']}")
+            print(f"   Sugestão: {error['suggestion']}", file=out)
     
-    print("\nPressione qualquer tecla para continuar...")
-    getch()
+    if INTERACTIVE:
+        print("\nPressione qualquer tecla para continuar...", file=out)
+        getch()
+
+# Caminho que representa a entrada/saída padrão (pipes): stdin nas
+# importações e stdout nas exportações
+STDIO_PATH = '-'
+
+def _input_size(xml_file):
+    """Tamanho do arquivo de entrada, ou None para a entrada padrão."""
+    return None if xml_file == STDIO_PATH else os.path.getsize(xml_file)
+
+@contextmanager
+def open_output(output_file):
+    """
+    Abre o arquivo de saída em modo binário; '-' usa a saída padrão (sem fechá-la).
+
+    O arquivo é gravado como `output_file` + '.parcial' e só substitui o
+    destino ao fim do bloco sem erros; em caso de erro, o parcial é removido
+    e um arquivo anterior com o mesmo nome fica intacto.
+    """
+    if output_file == STDIO_PATH:
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+    else:
+        partial = output_file + '.parcial'
+        try:
+            with open(partial, 'wb') as f:
+                yield f
+            os.replace(partial, output_file)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
 
 def check_directory_permissions(directory):
     """
@@ -105,6 +494,9 @@ def verify_xml_path(file_path, mode='w'):
     mode: 'w' para escrita, 'r' para leitura
     Retorna (bool, str) - (sucesso, mensagem de erro)
     """
+    if file_path == STDIO_PATH:
+        # Pipes dispensam a verificação (e o arquivo de teste)
+        return True, None
     try:
         # Validações básicas
         if not file_path:
@@ -151,310 +543,3078 @@ def verify_xml_path(file_path, mode='w'):
     except Exception as e:
         return False, f"Erro ao verificar caminho: {str(e)}"
 
-def export_clients(output_file):
-    """Exporta clientes para arquivo XML com validação melhorada."""
-    errors = []
-    operation_details = {'arquivo_destino': output_file}
-    
-    try:
-        # Verifica permissões
-        success, error = verify_xml_path(output_file, 'w')
-        if not success:
-            errors.append({
-                'type': 'Erro de Permissão',
-                'message': error,
-                'suggestion': 'Verifique se você tem permissões de escrita no diretório'
-            })
-            show_error_report('Exportação de Clientes', errors, operation_details)
-            return False
+# Backup online do database antes das importações (API de backup do SQLite)
+BACKUP_ENABLED = True
+BACKUP_COMPRESS = False
+BACKUP_KEEP = 5
+# Diretório dos backups; None usa a pasta 'backups' ao lado do database
+BACKUP_DIR = None
+# Páginas copiadas por etapa e pausa entre etapas, para não travar o aplicativo
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.005
 
-        # Garante extensão .xml
-        if not output_file.lower().endswith('.xml'):
-            output_file += '.xml'
+def _backup_dir():
+    return BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'backups')
 
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Verifica se há clientes para exportar
-            cursor.execute("SELECT COUNT(*) FROM clientes")
-            total_clients = cursor.fetchone()[0]
-            
-            if total_clients == 0:
-                errors.append({
-                    'type': 'Dados Vazios',
-                    'message': 'Nenhum cliente encontrado para exportar',
-                    'suggestion': 'Verifique se existem clientes cadastrados'
-                })
-                show_error_report('Exportação de Clientes', errors, operation_details)
-                return False
+def list_backups():
+    """Backups do database atual, do mais recente para o mais antigo."""
+    directory = _backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    stem = os.path.splitext(os.path.basename(DATABASE))[0]
+    backups = [os.path.join(directory, name) for name in os.listdir(directory)
+               if name.startswith(f"{stem}-") and name.endswith(('.db', '.db.gz'))]
+    return sorted(backups, key=os.path.basename, reverse=True)
 
-            # Continua com a exportação
-            cursor.execute("PRAGMA table_info(clientes)")
-            column_names = [col[1] for col in cursor.fetchall()]
-            
-            cursor.execute(f"SELECT {', '.join(column_names)} FROM clientes")
-            clients = cursor.fetchall()
-
-            # Cria estrutura XML (usando tags em português)
-            root = ET.Element('clientes')
-            for client in clients:
-                client_elem = ET.SubElement(root, 'cliente')
-                for i, field in enumerate(column_names):
-                    field_elem = ET.SubElement(client_elem, field)
-                    field_elem.text = str(client[i]) if client[i] is not None else ''
-
-            # Salva o XML com tratamento de erros
-            tree = ET.ElementTree(root)
-            try:
-                with open(output_file, 'wb') as f:
-                    tree.write(f, encoding='utf-8', xml_declaration=True)
-            except Exception as e:
-                errors.append({
-                    'type': 'Erro de Escrita',
-                    'message': f"Falha ao salvar arquivo: {str(e)}",
-                    'suggestion': 'Verifique permissões e espaço em disco'
-                })
-                show_error_report('Exportação de Clientes', errors, operation_details)
-                return False
+def backup_database(compress=None, keep=None, rotate=True, reporter=None):
+    """
+    Copia o database com a API de backup do SQLite, sem parar o aplicativo.
 
-            print(f"\nExportação concluída com sucesso!")
-            print(f"Total de {len(clients)} clientes exportados")
-            print(f"Arquivo salvo em: {output_file}")
-            return True
+    A cópia é feita em etapas de BACKUP_PAGES_PER_STEP páginas com uma pausa
+    entre elas; se outra conexão alterar o banco durante a cópia, o SQLite a
+    reinicia, de modo que o resultado é sempre um retrato consistente.
+    O arquivo só recebe o nome final depois de completo.
 
-        except sqlite3.Error as e:
-            errors.append({
-                'type': 'Erro de Banco de Dados',
-                'message': str(e),
-                'suggestion': 'Verifique a conexão com o banco de dados'
-            })
-            show_error_report('Exportação de Clientes', errors, operation_details)
-            return False
+    Args:
+        compress (bool, optional): Compacta o backup com gzip (padrão: BACKUP_COMPRESS)
+        keep (int, optional): Quantidade de backups mantidos (padrão: BACKUP_KEEP)
+        rotate (bool): Remove os backups além de `keep`
+        reporter (ConsoleReporter, optional): Destino da mensagem de conclusão
 
-    except Exception as e:
+    Returns:
+        str: Caminho do backup criado
+    """
+    from datetime import datetime
+    compress = BACKUP_COMPRESS if compress is None else compress
+    keep = BACKUP_KEEP if keep is None else keep
+
+    directory = _backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(DATABASE))[0]
+    name = f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+    target = os.path.join(directory, name)
+    partial = target + '.parcial'
+
+    started = time.perf_counter()
+    source = sqlite3.connect(_readonly_uri(DATABASE), uri=True)
+    dest = sqlite3.connect(partial)
+    try:
+        source.backup(dest, pages=BACKUP_PAGES_PER_STEP,
+                      progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_PAUSE))
+    except BaseException:
+        dest.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    dest.close()
+
+    if compress:
+        import gzip
+        import shutil
+        with open(partial, 'rb') as f_in, gzip.open(partial + '.gz', 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        os.remove(partial)
+        partial += '.gz'
+        target += '.gz'
+    os.replace(partial, target)
+
+    size = os.path.getsize(target) / (1024 * 1024)
+    (reporter or CONSOLE).message(f"Backup criado: {target} ({size:.1f} MB em {time.perf_counter() - started:.2f} s)")
+
+    if rotate:
+        for old in list_backups()[keep:]:
+            os.remove(old)
+    return target
+
+def backup_before_import(operation, errors, details, reporter=None, action='importação'):
+    """
+    Cria o backup que antecede uma importação (ou outra alteração em massa,
+    descrita por `action`), se habilitado.
+
+    Returns:
+        bool: False se o backup falhou (o erro é acrescentado a `errors` e relatado)
+    """
+    if not BACKUP_ENABLED:
+        return True
+    reporter = reporter or CONSOLE
+    reporter.message(f"\nCriando backup do banco de dados antes da {action}...")
+    try:
+        details['backup'] = backup_database(reporter=reporter)
+        return True
+    except (sqlite3.Error, OSError) as e:
         errors.append({
-            'type': 'Erro Inesperado',
-            'message': str(e),
-            'data': {'traceback': traceback.format_exc()},
-            'suggestion': 'Entre em contato com o suporte técnico'
+            'type': 'Erro de Backup',
+            'message': f'Não foi possível criar o backup: {str(e)}',
+            'suggestion': 'Verifique o espaço em disco e as permissões da pasta de backups, '
+                          'ou use --no-backup para importar sem backup'
         })
-        show_error_report('Exportação de Clientes', errors, operation_details)
+        reporter.error_report(operation, errors, details)
         return False
 
-def test_xml_file(file_path):
-    """
-    Testa se um arquivo XML é válido e pode ser lido.
-    Retorna (bool, str) - (sucesso, mensagem de erro)
+def restore_database(backup_file, reporter=None):
     """
-    try:
-        if not os.path.exists(file_path):
-            return False, f"Arquivo não encontrado: {file_path}"
-        
-        try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            # Verifica se o root tem algum elemento e se é um dos formatos aceitos
-            if root.tag not in ['clients', 'clientes']:
-                return False, f"A tag raiz '{root.tag}' não é suportada. Use <clients> ou <clientes>."
-                
-            # Procura elementos client ou cliente
-            clients = root.findall('client') or root.findall('cliente')
-            if len(clients) == 0:
-                return False, "O arquivo XML está vazio (sem elementos client/cliente)"
-            return True, None
-        except ET.ParseError as e:
-            return False, f"Erro ao analisar o XML: {str(e)}"
-        except Exception as e:
-            return False, f"Erro ao ler o arquivo XML: {str(e)}"
-    except Exception as e:
-        return False, f"Erro ao verificar o arquivo XML: {str(e)}"
+    Restaura um backup (.db ou .db.gz) sobre o database atual.
 
-def import_clients(xml_file):
-    """Importa clientes de um arquivo XML para o banco de dados."""
-    errors = []
-    operation_details = {'arquivo_origem': xml_file}
-    imported_count = 0
-    skipped_count = 0
+    O backup é verificado (PRAGMA integrity_check) e copiado para o database
+    pela API de backup em uma única etapa, dentro de uma transação: outras
+    conexões veem o banco antigo ou o restaurado, nunca uma mistura. Antes, um
+    backup do estado atual é criado.
+
+    Args:
+        backup_file (str): Backup a restaurar (.db ou .db.gz)
+        reporter (ConsoleReporter, optional): Destino das mensagens e erros
 
+    Returns:
+        OperationResult: Verdadeiro se a restauração foi concluída
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'backup': backup_file, 'database': DATABASE}
+    result = OperationResult('Restauração de Backup', operation_details, errors)
+    temp_copy = None
     try:
-        # Testa se o arquivo XML é válido antes de prosseguir
-        valid_xml, xml_error = test_xml_file(xml_file)
-        if not valid_xml:
-            errors.append({
-                'type': 'Erro de XML',
-                'message': xml_error,
-                'suggestion': 'Verifique se o arquivo XML existe e está bem formatado'
-            })
-            show_error_report('Importação de Clientes', errors, operation_details)
-            return False
-            
-        # Verifica permissões
-        success, error = verify_xml_path(xml_file, 'r')
-        if not success:
-            errors.append({
-                'type': 'Erro de Permissão',
-                'message': error,
-                'suggestion': 'Verifique se o arquivo existe e você tem permissões de leitura'
-            })
-            show_error_report('Importação de Clientes', errors, operation_details)
-            return False
+        if not os.path.isfile(backup_file):
+            raise OSError(f"Arquivo não encontrado: {backup_file}")
+        source_file = backup_file
+        if backup_file.endswith('.gz'):
+            import gzip
+            import shutil
+            temp_copy = os.path.join(os.path.dirname(os.path.abspath(DATABASE)),
+                                     f".restauracao-{os.getpid()}.db")
+            with gzip.open(backup_file, 'rb') as f_in, open(temp_copy, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            source_file = temp_copy
 
-        # Parse XML com tratamento de erros mais detalhado
+        source = sqlite3.connect(_readonly_uri(source_file), uri=True)
         try:
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            print(f"Root tag: {root.tag}")  # Debug
-            
-            # Verifica se a tag raiz é suportada
-            if root.tag not in ['clients', 'clientes']:
+            check = source.execute("PRAGMA integrity_check").fetchone()[0]
+            if check != 'ok':
                 errors.append({
-                    'type': 'Formato Inválido',
-                    'message': f'A tag raiz do XML ({root.tag}) não é suportada',
-                    'suggestion': 'O arquivo deve usar <clients> ou <clientes> como tag raiz'
+                    'type': 'Backup Corrompido',
+                    'message': f'Verificação de integridade falhou: {check}',
+                    'suggestion': 'Escolha outro backup'
                 })
-                show_error_report('Importação de Clientes', errors, operation_details)
-                return False
-                
-        except Exception as e:
-            errors.append({
-                'type': 'Erro de Leitura',
-                'message': f'Erro ao ler o arquivo: {str(e)}',
-                'suggestion': 'Verifique se o arquivo não está corrompido'
-            })
-            show_error_report('Importação de Clientes', errors, operation_details)
-            return False
+                reporter.error_report('Restauração de Backup', errors, operation_details)
+                return result.finish(False)
 
-        # Verifica se há elementos <client> ou <cliente> no arquivo
-        client_elements = root.findall('client') or root.findall('cliente')
-        print(f"Encontrados {len(client_elements)} elementos client/cliente")  # Debug
-        
-        if len(client_elements) == 0:
-            errors.append({
-                'type': 'Arquivo Inválido',
-                'message': 'Não foram encontrados clientes no arquivo XML',
-                'suggestion': 'Verifique se o arquivo XML está no formato correto com tags <client> ou <cliente>'
-            })
-            show_error_report('Importação de Clientes', errors, operation_details)
-            return False
+            # Guarda o estado atual sem descartar backups antigos
+            operation_details['backup_anterior'] = backup_database(rotate=False, reporter=reporter)
 
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Verifica a estrutura da tabela clientes
-            cursor.execute("PRAGMA table_info(clientes)")
-            table_info = cursor.fetchall()
-            valid_columns = [col[1] for col in table_info]
-            
-            print(f"\nProcessando importação de clientes...")
-            
-            for client_elem in client_elements:
-                try:
-                    # Coleta os dados do cliente do XML
-                    client_data = {}
-                    
-                    # Processa cada campo do cliente no XML
-                    for field in valid_columns:
-                        elem = client_elem.find(field)
-                        if elem is not None and elem.text:
-                            client_data[field] = elem.text.strip()
-                        else:
-                            client_data[field] = None
-                    
-                    # Verifica se tem pelo menos o nome do cliente
-                    if not client_data.get('nome'):
-                        errors.append({
-                            'type': 'Dados Inválidos',
-                            'message': 'Cliente sem nome encontrado no XML',
-                            'suggestion': 'Todos os clientes devem ter um nome'
-                        })
-                        skipped_count += 1
-                        continue
-                    
-                    # Prepara a query de inserção dinâmica
-                    insert_columns = []
-                    values = []
-                    placeholders = []
-                    
-                    for field, value in client_data.items():
-                        if field != 'id':  # Excluímos o ID para o banco gerar um novo
-                            insert_columns.append(field)
-                            values.append(value)
-                            placeholders.append('?')
-                    
-                    # Imprime informações de depuração
-                    print(f"Importando cliente: {client_data.get('nome', 'Sem nome')}")
-                    
-                    # Insere o cliente
-                    query = f"""
-                        INSERT INTO clientes ({', '.join(insert_columns)})
-                        VALUES ({', '.join(placeholders)})
-                    """
-                    
-                    cursor.execute(query, values)
-                    imported_count += 1
-                    
-                except sqlite3.Error as e:
-                    errors.append({
-                        'type': 'Erro de Importação',
-                        'message': f'Erro ao importar cliente: {str(e)}',
-                        'data': {'cliente': client_data.get('nome', 'Desconhecido')},
-                        'suggestion': 'Verifique se os dados do cliente são válidos'
-                    })
-                    skipped_count += 1
-            
-            # Confirma as alterações
-            conn.commit()
-            
-        except sqlite3.Error as e:
-            errors.append({
-                'type': 'Erro de Banco de Dados',
-                'message': str(e),
-                'suggestion': 'Verifique a conexão com o banco de dados'
-            })
-            show_error_report('Importação de Clientes', errors, operation_details)
-            return False
+            with get_connection_manager().writer() as conn:
+                if conn.in_transaction:
+                    conn.commit()
+                source.backup(conn)
         finally:
-            if 'conn' in locals() and conn:
-                conn.close()
-
-        # Atualiza detalhes da operação
-        operation_details.update({
-            'total_processado': imported_count + skipped_count,
-            'importados': imported_count,
-            'ignorados': skipped_count
-        })
+            source.close()
 
-        if errors:
-            show_error_report('Importação de Clientes', errors, operation_details)
-            # Retornamos True se pelo menos um cliente foi importado com sucesso
-            return imported_count > 0
-            
-        print(f"\nImportação concluída com sucesso!")
-        print(f"Clientes importados: {imported_count}")
-        if skipped_count > 0:
-            print(f"Clientes ignorados devido a erros: {skipped_count}")
-        
-        return imported_count > 0
+        reporter.message(f"\nBackup restaurado com sucesso: {backup_file}")
+        reporter.message(f"Estado anterior salvo em: {operation_details['backup_anterior']}")
+        return result.finish(True)
 
-    except Exception as e:
+    except (sqlite3.Error, OSError) as e:
         errors.append({
-            'type': 'Erro Inesperado',
+            'type': 'Erro de Restauração',
             'message': str(e),
-            'data': {'traceback': traceback.format_exc()},
-            'suggestion': 'Entre em contato com o suporte técnico'
+            'suggestion': 'Verifique o arquivo de backup e se o banco não está bloqueado por outro processo'
         })
-        show_error_report('Importação de Clientes', errors, operation_details)
-        return False
+        reporter.error_report('Restauração de Backup', errors, operation_details)
+        return result.finish(False)
+    finally:
+        if temp_copy and os.path.exists(temp_copy):
+            os.remove(temp_copy)
 
-def import_calls(xml_file):
-    """Importa chamados de um arquivo XML para o banco de dados."""
-    errors = []
-    operation_details = {'arquivo_origem': xml_file}
+# Linhas lidas pelo primeiro fetchmany das exportações; os seguintes são
+# dimensionados por BatchSizer
+EXPORT_FETCH_SIZE = 1000
+EXPORT_FETCH_MIN = 50
+EXPORT_FETCH_MAX = 20000
+# Blocos pendentes entre as etapas do pipeline de exportação
+EXPORT_QUEUE_DEPTH = 8
+# Tamanho mínimo de cada escrita no arquivo exportado
+EXPORT_WRITE_SIZE = 1024 * 1024
+
+# Memória disponível para os lotes em andamento (--memory-budget), também
+# usada pelo índice de chaves da importação mesclada
+MEMORY_BUDGET = 64 * 1024 * 1024
+# Duração desejada de cada lote (--batch-target-ms): uma transação da
+# importação ou a serialização de um bloco da exportação. 0 mantém o tamanho
+BATCH_TARGET = 0.25
+
+def _approx_size(value):
+    """Memória aproximada de um registro em preparação (dicts, listas, tuplas e textos)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(item) for item in value)
+    return size
+
+class BatchSizer:
+    """
+    Escolhe o tamanho dos lotes (fetchmany nas exportações, transações nas
+    importações) a partir do que foi medido nos lotes anteriores.
+
+    O tamanho é ajustado para que cada lote leve cerca de `target_duration`
+    segundos e limitado para que os `depth` lotes que podem estar em memória
+    ao mesmo tempo caibam em `memory_budget`, pelo tamanho médio das linhas.
+
+    Args:
+        initial (int): Tamanho do primeiro lote
+        minimum (int): Menor tamanho permitido
+        maximum (int): Maior tamanho permitido
+        memory_budget (int, optional): Bytes disponíveis (padrão: MEMORY_BUDGET)
+        target_duration (float, optional): Segundos por lote (padrão: BATCH_TARGET)
+        depth (int): Lotes simultaneamente em memória (ex.: fila do pipeline)
+    """
+
+    def __init__(self, initial, minimum, maximum, memory_budget=None, target_duration=None, depth=1):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.memory_budget = MEMORY_BUDGET if memory_budget is None else memory_budget
+        self.target_duration = BATCH_TARGET if target_duration is None else target_duration
+        self.depth = depth
+        self.row_bytes = 0.0
+        self.smallest = self.largest = initial
+        self.observed = 0
+
+    def observe(self, rows, row_bytes, elapsed):
+        """
+        Registra um lote concluído e calcula o tamanho do próximo.
+
+        Args:
+            rows (int): Linhas do lote
+            row_bytes (float): Tamanho médio medido de cada linha
+            elapsed (float): Duração do lote em segundos
+        """
+        if rows <= 0:
+            return
+        # Média móvel, para que um lote atípico não domine a estimativa
+        self.row_bytes = row_bytes if not self.observed else 0.7 * self.row_bytes + 0.3 * row_bytes
+        self.observed += 1
+
+        size = self.size
+        if self.target_duration and elapsed > 0:
+            # Limita a variação por lote para não reagir demais
+            size = int(rows * self.target_duration / elapsed)
+            size = min(max(size, self.size // 2), self.size * 2)
+        if self.memory_budget and self.row_bytes:
+            size = min(size, int(self.memory_budget / (self.depth * self.row_bytes)))
+        self.size = min(max(size, self.minimum), self.maximum)
+        self.smallest = min(self.smallest, self.size)
+        self.largest = max(self.largest, self.size)
+
+    def stats(self):
+        """Tamanhos escolhidos, para os detalhes da operação."""
+        return {'final': self.size, 'minimo': self.smallest, 'maximo': self.largest,
+                'bytes_por_linha': round(self.row_bytes)}
+
+def _export_sizer():
+    """Dimensionador dos blocos de fetchmany; o pipeline mantém até EXPORT_QUEUE_DEPTH + 2 blocos."""
+    return BatchSizer(EXPORT_FETCH_SIZE, EXPORT_FETCH_MIN, EXPORT_FETCH_MAX, depth=EXPORT_QUEUE_DEPTH + 2)
+
+def _xml_text(value):
+    """Texto de um valor do banco como gravado no XML (None vira vazio)."""
+    return str(value) if value is not None else ''
+
+# Dialeto compacto (--compact): um elemento por linha do banco, com as colunas
+# como atributos e os andamentos direto dentro do chamado, e cada registro em
+# uma linha do arquivo. A raiz leva o atributo versao, que os importadores
+# usam para reconhecer o formato.
+XML_COMPACT_VERSION = '2'
+
+def _record_fields(record_elem, compact=False):
+    """Campo → texto de um registro do XML, em qualquer um dos dialetos."""
+    if compact:
+        return {field: value for field, value in record_elem.attrib.items() if field != 'hash'}
+    return {child.tag: child.text for child in record_elem}
+
+def _andamento_elements(call_elem, compact=False):
+    """Elementos <andamento> de um chamado, em qualquer um dos dialetos."""
+    if compact:
+        return call_elem.iterfind('andamento')
+    andamentos_elem = call_elem.find('andamentos')
+    return andamentos_elem.iterfind('andamento') if andamentos_elem is not None else ()
+
+def _nested_call_elements(client_elem, compact=False):
+    """Elementos <chamado> aninhados em um cliente (formato de export_nested)."""
+    if compact:
+        return client_elem.iterfind('chamado')
+    calls_elem = client_elem.find('chamados')
+    return calls_elem.iterfind('chamado') if calls_elem is not None else ()
+
+def content_hash(pairs):
+    """
+    Calcula um hash estável do conteúdo de um registro.
+
+    Args:
+        pairs (iterable): Pares (campo, valor) na ordem em que aparecem no XML.
+            Os valores são considerados como texto, do mesmo modo que no XML,
+            para que o importador possa recalcular o hash a partir do arquivo.
+
+    Returns:
+        str: Hash hexadecimal (BLAKE2b de 128 bits)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for field, value in pairs:
+        digest.update(field.encode('utf-8'))
+        digest.update(b'\x1f')
+        digest.update(_xml_text(value).encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+def element_hash(record_elem, compact=False):
+    """
+    Retorna o hash de um registro lido do XML: o atributo `hash`, se presente,
+    ou o hash recalculado a partir dos campos (incluindo os andamentos).
+    """
+    if record_elem.get('hash'):
+        return record_elem.get('hash')
+    if compact:
+        pairs = list(_record_fields(record_elem, compact).items())
+        for andamento in _andamento_elements(record_elem, compact):
+            pairs.extend((f"andamento.{field}", value) for field, value in andamento.attrib.items())
+        return content_hash(pairs)
+    pairs = []
+    for child in record_elem:
+        if child.tag == 'andamentos':
+            for andamento in child:
+                pairs.extend((f"andamento.{sub.tag}", sub.text) for sub in andamento)
+        else:
+            pairs.append((child.tag, child.text))
+    return content_hash(pairs)
+
+def load_hash_manifest(manifest_file):
+    """
+    Lê um manifesto de hashes (linhas 'id<TAB>hash') gerado na exportação.
+
+    Returns:
+        set: Hashes conhecidos (em bytes, para economizar memória)
+
+    Raises:
+        ValueError: Se uma linha trouxer um hash que não é hexadecimal
+    """
+    known = set()
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) == 2 and parts[1]:
+                try:
+                    known.add(bytes.fromhex(parts[1]))
+                except ValueError:
+                    raise ValueError(f"linha {line_number}: hash inválido ({parts[1][:40]!r})") from None
+    return known
+
+def _load_skip_manifest(skip_known, operation, errors, details, reporter):
+    """
+    Lê o manifesto de --skip-known antes de qualquer alteração no banco.
+
+    Returns:
+        tuple: (ok, hashes conhecidos ou None); com ok falso o erro já foi relatado
+    """
+    if not skip_known:
+        return True, None
+    try:
+        return True, load_hash_manifest(skip_known)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        errors.append({
+            'type': 'Manifesto Inválido',
+            'message': f'Erro ao ler o manifesto {skip_known}: {e}',
+            'suggestion': 'Use o manifesto gravado por --hash-manifest na exportação (linhas id<TAB>hash)'
+        })
+        reporter.error_report(operation, errors, details)
+        return False, None
+
+class XmlStreamWriter:
+    """
+    Escreve um documento XML registro a registro, sem montar a árvore inteira
+    em memória. Opcionalmente grava o manifesto de hashes dos registros. No
+    dialeto compacto cada registro ocupa uma linha.
+    """
+
+    def __init__(self, stream, root_tag, manifest=None, compact=False):
+        self.stream = stream
+        self.root_tag = root_tag
+        self.manifest = manifest
+        self.compact = compact
+        self.count = 0
+        self.bytes = 0
+
+    def __enter__(self):
+        self.stream.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+        start = f'<{self.root_tag} versao="{XML_COMPACT_VERSION}">\n' if self.compact else f"<{self.root_tag}>"
+        self.stream.write(start.encode('utf-8'))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.stream.write(f"</{self.root_tag}>".encode('utf-8'))
+        return False
+
+    def write(self, record_elem, record_id=None, digest=None):
+        """Serializa um registro e, se houver manifesto, registra seu hash."""
+        data = ET.tostring(record_elem, encoding='utf-8')
+        if self.compact:
+            data += b'\n'
+        self.stream.write(data)
+        self.bytes += len(data)
+        if self.manifest is not None and digest is not None:
+            self.manifest.write(f"{_xml_text(record_id)}\t{digest}\n")
+        self.count += 1
+
+_PIPELINE_END = object()
+
+@contextmanager
+def prefetch(chunks, depth=EXPORT_QUEUE_DEPTH):
+    """
+    Consome um iterador de blocos (ex.: fetchmany) em uma thread separada,
+    deixando até `depth` blocos prontos enquanto o chamador serializa os
+    anteriores. O SQLite libera o GIL durante a leitura, então a consulta
+    avança em paralelo com a montagem do XML.
+
+    Exceções da thread de leitura são repassadas ao chamador.
+    """
+    pending = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    return
+            put(_PIPELINE_END)
+        except BaseException as e:
+            put(e)
+
+    def consume():
+        while True:
+            item = pending.get()
+            if item is _PIPELINE_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    thread = threading.Thread(target=produce, name='export-reader', daemon=True)
+    thread.start()
+    try:
+        yield consume()
+    finally:
+        stop.set()
+        thread.join()
+
+class AsyncFileWriter:
+    """
+    Arquivo de saída gravado por uma thread própria.
+
+    Os bytes serializados são acumulados até EXPORT_WRITE_SIZE e entregues por
+    uma fila limitada à thread de escrita, que grava em blocos grandes enquanto
+    a serialização continua. Erros de gravação (ex.: disco cheio) são
+    relançados na próxima escrita ou no fechamento. Se informado, `phase`
+    (OperationResult.phase) recebe na fase 'escrita' o tempo em que a
+    serialização esperou pela thread de escrita.
+    """
+
+    def __init__(self, stream, buffer_size=EXPORT_WRITE_SIZE, depth=EXPORT_QUEUE_DEPTH, phase=None):
+        self.stream = stream
+        self.phase = phase or (lambda name: nullcontext())
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._pending = queue.Queue(maxsize=depth)
+        self._error = None
+        self._thread = threading.Thread(target=self._drain, name='export-writer', daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            data = self._pending.get()
+            if data is _PIPELINE_END:
+                return
+            if self._error is None:
+                try:
+                    self.stream.write(data)
+                except BaseException as e:
+                    self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, data):
+        self._check()
+        self._buffer += data
+        if len(self._buffer) >= self.buffer_size:
+            with self.phase('escrita'):
+                self._pending.put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        """Entrega o restante do buffer e aguarda a thread de escrita."""
+        with self.phase('escrita'):
+            if self._buffer:
+                self._pending.put(bytes(self._buffer))
+                self._buffer.clear()
+            self._pending.put(_PIPELINE_END)
+            self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Descarta o que falta gravar, mas não deixa a thread pendurada
+            self._buffer.clear()
+            self._pending.put(_PIPELINE_END)
+            self._thread.join()
+        return False
+
+# Operadores aceitos nas expressões de filtro (os compostos vêm primeiro)
+FILTER_OPERATORS = ('>=', '<=', '!=', '!~', '=', '>', '<', '~')
+
+def _escape_like(value):
+    """Escapa os curingas do LIKE para busca literal."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def compile_filter(expression, valid_columns):
+    """
+    Compila uma expressão de filtro em uma cláusula WHERE parametrizada.
+
+    A expressão é formada por condições separadas por ";", no formato
+    coluna<operador>valor. Operadores:
+        =  !=          igualdade; valores separados por vírgula viram IN / NOT IN,
+                       valor vazio vira IS NULL / IS NOT NULL
+        >= <= > <      comparação (ex: intervalos de data_abertura)
+        ~  !~          contém / não contém o texto (LIKE)
+
+    Exemplo: "data_abertura>=2024-01-01;data_abertura<2024-02-01;cliente_id=1,2;descricao~erro"
+
+    Args:
+        expression (str): Expressão de filtro (None ou vazia para nenhum filtro)
+        valid_columns (list): Colunas existentes na tabela
+
+    Returns:
+        tuple: (cláusula sem 'WHERE', lista de parâmetros)
+
+    Raises:
+        ValueError: Se a expressão for inválida ou usar colunas desconhecidas
+    """
+    conditions = []
+    params = []
+    if not expression:
+        return '', params
+
+    for clause in expression.split(';'):
+        clause = clause.strip()
+        if not clause:
+            continue
+
+        # Localiza o primeiro operador da condição
+        position, operator = None, None
+        for candidate in FILTER_OPERATORS:
+            index = clause.find(candidate)
+            if index > 0 and (position is None or index < position):
+                position, operator = index, candidate
+        if operator is None:
+            raise ValueError(f"Condição sem operador: '{clause}'")
+
+        column = clause[:position].strip()
+        value = clause[position + len(operator):].strip()
+        if column not in valid_columns:
+            raise ValueError(f"Coluna desconhecida no filtro: '{column}'")
+
+        if operator in ('=', '!='):
+            negate = operator == '!='
+            if value == '':
+                conditions.append(f"{column} IS {'NOT ' if negate else ''}NULL")
+                continue
+            values = [v.strip() for v in value.split(',') if v.strip()]
+            if len(values) == 1:
+                conditions.append(f"{column} {operator} ?")
+            else:
+                placeholders = ', '.join('?' * len(values))
+                conditions.append(f"{column} {'NOT ' if negate else ''}IN ({placeholders})")
+            params.extend(values)
+        elif operator in ('~', '!~'):
+            negate = operator == '!~'
+            conditions.append(f"{column} {'NOT ' if negate else ''}LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(value)}%")
+        else:
+            conditions.append(f"{column} {operator} ?")
+            params.append(value)
+
+    return ' AND '.join(conditions), params
+
+# Histórico de execuções: cada OperationResult concluído é gravado em um
+# SQLite próprio, ao lado do database (--history-db), para acompanhar as
+# tendências de desempenho com --history
+HISTORY_ENABLED = True
+HISTORY_DB = None              # Padrão: importexport_historico.db ao lado do database
+HISTORY_BASELINE_RUNS = 10     # Execuções anteriores que formam a referência (mediana)
+HISTORY_REGRESSION = 0.2       # Queda de vazão acima da qual a execução é sinalizada
+HISTORY_TREND_DAYS = 30        # Janela comparada com a janela anterior no relatório
+# Primeira contagem presente nos detalhes, usada para calcular a vazão
+HISTORY_ROW_KEYS = ('total_processado', 'registros_lidos', 'exportados',
+                    'clientes_exportados', 'chamados_arquivados')
+# Threads que não gravam no histórico (ex.: as exportações paralelas de export_all,
+# que distorceriam a referência das exportações avulsas)
+_history_local = threading.local()
+
+def _history_db():
+    return HISTORY_DB or os.path.join(os.path.dirname(os.path.abspath(DATABASE)),
+                                      'importexport_historico.db')
+
+def _open_history():
+    """Abre o banco de histórico, criando a tabela na primeira vez."""
+    conn = sqlite3.connect(_history_db(), timeout=5)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS execucoes (
+            id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            operacao TEXT NOT NULL,
+            sucesso INTEGER NOT NULL,
+            duracao_s REAL,
+            registros INTEGER,
+            arquivo TEXT,
+            bytes INTEGER,
+            tamanho_banco INTEGER,
+            fases TEXT,
+            detalhes TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_execucoes_operacao ON execucoes(operacao, data)")
+    return conn
+
+def _file_size(path):
+    if not path or path == STDIO_PATH:
+        return None
+    for candidate in (path, path + '.xml'):
+        if os.path.isfile(candidate):
+            return os.path.getsize(candidate)
+    return None
+
+def record_history(result):
+    """
+    Grava uma execução no histórico: operação, desfecho, duração por fase,
+    registros, tamanho do arquivo e do database e os detalhes completos.
+    Falhas ao gravar o histórico nunca interrompem a operação.
+    """
+    import json
+    from datetime import datetime
+
+    details = result.details or {}
+    rows = next((details[key] for key in HISTORY_ROW_KEYS
+                 if isinstance(details.get(key), int)), None)
+    path = details.get('arquivo_destino') or details.get('arquivo_origem')
+    size = details.get('bytes') or _file_size(path)
+
+    # O tempo não atribuído a uma fase medida fica em 'restante'
+    phases = dict(result.phases)
+    if details.get('tempo_espera_bloqueio_s'):
+        # A espera por bloqueio acontece dentro da gravação dos lotes
+        phases['espera_bloqueio'] = details['tempo_espera_bloqueio_s']
+        if 'gravacao' in phases:
+            phases['gravacao'] = max(phases['gravacao'] - phases['espera_bloqueio'], 0.0)
+    phases['restante'] = max(result.duration - sum(phases.values()), 0.0)
+
+    try:
+        conn = _open_history()
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT INTO execucoes (data, operacao, sucesso, duracao_s, registros, arquivo,
+                                           bytes, tamanho_banco, fases, detalhes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (datetime.now().isoformat(timespec='seconds'), result.operation, int(result.ok),
+                      round(result.duration, 4), rows, path, size, _file_size(DATABASE),
+                      json.dumps({name: round(value, 4) for name, value in phases.items()}),
+                      json.dumps(details, ensure_ascii=False, default=str)))
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+class OperationResult:
+    """
+    Resultado estruturado de uma operação de importação ou exportação.
+
+    `details` traz as contagens e arquivos (os mesmos dados exibidos no
+    relatório) e `errors` os erros no formato de show_error_report. Avaliado
+    como bool, vale o sucesso da operação. `phases` guarda o tempo das fases
+    medidas com phase(); a execução é gravada no histórico ao concluir.
+    """
+
+    def __init__(self, operation, details, errors):
+        self.operation = operation
+        self.details = details
+        self.errors = errors
+        self.ok = None
+        self.started = time.perf_counter()
+        self.duration = None
+        self.phases = {}
+        self._nested = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Soma a duração do bloco `with` ao tempo da fase `name`. O tempo de uma
+        fase aberta dentro de outra é descontado da externa, então as fases
+        não se sobrepõem.
+        """
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            self._end_phase(name, started)
+
+    def timed(self, iterable, name):
+        """Percorre `iterable` somando à fase `name` o tempo de obter cada item."""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            self._nested.append(0.0)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._end_phase(name, started)
+            yield item
+
+    def _end_phase(self, name, started):
+        elapsed = time.perf_counter() - started
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - self._nested.pop()
+        if self._nested:
+            self._nested[-1] += elapsed
+
+    def finish(self, ok):
+        """Registra o desfecho e a duração (e a grava no histórico); retorna o próprio resultado."""
+        self.ok = bool(ok)
+        self.duration = time.perf_counter() - self.started
+        if HISTORY_ENABLED and not getattr(_history_local, 'paused', False):
+            record_history(self)
+        return self
+
+    def __bool__(self):
+        return bool(self.ok)
+
+    def __repr__(self):
+        return f"OperationResult({self.operation!r}, ok={self.ok}, details={self.details!r})"
+
+class ConsoleReporter:
+    """
+    Saída das operações no console: mensagens com print, progresso na linha
+    de status e erros com show_error_report. É o padrão do menu e da CLI.
+
+    Args:
+        stream (file, optional): Destino do texto (padrão: stdout). A CLI usa
+            stderr quando a exportação é gravada na saída padrão.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def message(self, text):
+        print(text, file=self.stream or sys.stdout)
+
+    def progress(self, label, total_bytes=None, total_rows=None):
+        return ProgressReporter(label, total_bytes=total_bytes, total_rows=total_rows,
+                                stream=self.stream)
+
+    def error_report(self, operation, errors, details=None):
+        show_error_report(operation, errors, details, stream=self.stream)
+
+class CallbackReporter(ConsoleReporter):
+    """
+    Saída das operações para uso como biblioteca: nada é impresso e cada
+    evento é repassado a uma função, quando informada.
+
+    Args:
+        on_progress (callable, optional): on_progress(ProgressReporter), chamado
+            em taxa limitada com rows, position e total_bytes atualizados
+        on_error (callable, optional): on_error(operação, erro) para cada erro
+            relatado, com o erro no formato de show_error_report
+        on_message (callable, optional): on_message(texto) para as mensagens
+    """
+
+    def __init__(self, on_progress=None, on_error=None, on_message=None):
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.on_message = on_message
+
+    def message(self, text):
+        if self.on_message:
+            self.on_message(text.strip('\n'))
+
+    def progress(self, label, total_bytes=None, total_rows=None):
+        return ProgressReporter(label, total_bytes=total_bytes, total_rows=total_rows,
+                                callback=self.on_progress or (lambda progress: None))
+
+    def error_report(self, operation, errors, details=None):
+        if self.on_error:
+            for error in errors:
+                self.on_error(operation, error)
+
+CONSOLE = ConsoleReporter()
+
+def set_database(path):
+    """Define o database usado pelas operações (equivale a --db)."""
+    global DATABASE
+    DATABASE = path
+
+def _clients_select(cursor, filter_expr=None):
+    """
+    Monta a consulta de clientes com o filtro compilado.
+
+    Returns:
+        tuple: (colunas, sql, parâmetros)
+
+    Raises:
+        ValueError: Se o filtro for inválido
+    """
+    cursor.execute("PRAGMA table_info(clientes)")
+    column_names = [col[1] for col in cursor.fetchall()]
+    where, params = compile_filter(filter_expr, column_names)
+    where_sql = f" WHERE {where}" if where else ""
+    return column_names, f"SELECT {', '.join(column_names)} FROM clientes{where_sql}", params
+
+def _calls_select(cursor, status=None, filter_expr=None, search=None):
+    """
+    Monta a consulta de chamados com status, filtro e busca textual.
+
+    Returns:
+        tuple: (colunas, sql, parâmetros)
+
+    Raises:
+        ValueError: Se o filtro for inválido
+    """
+    cursor.execute("PRAGMA table_info(chamados)")
+    column_names = [col[1] for col in cursor.fetchall()]
+    where, params = compile_filter(filter_expr, column_names)
+
+    # Adiciona filtro de status se especificado
+    if status:
+        where = f"status = ? AND ({where})" if where else "status = ?"
+        params.insert(0, status)
+
+    # Restringe aos chamados encontrados pelo índice de busca
+    if search:
+        match = f"id IN (SELECT rowid FROM {SEARCH_INDEX_TABLE} WHERE {SEARCH_INDEX_TABLE} MATCH ?)"
+        where = f"{match} AND ({where})" if where else match
+        params.insert(0, search)
+
+    query = f"SELECT {', '.join(column_names)} FROM chamados"
+    if where:
+        query += f" WHERE {where}"
+    return column_names, query, params
+
+ANDAMENTO_FIELDS = ['id', 'data_hora', 'texto']
+ANDAMENTOS_IN_SIZE = 500       # Chamados por consulta IN em _fetch_andamentos
+
+def _fetch_andamentos(cursor, calls):
+    """
+    Busca os andamentos de um bloco de chamados em poucas consultas.
+
+    Returns:
+        dict: id do chamado -> lista de (id, data_hora, texto) em ordem de data
+    """
+    andamentos_by_call = {}
+    for start in range(0, len(calls), ANDAMENTOS_IN_SIZE):
+        ids = [call[0] for call in calls[start:start + ANDAMENTOS_IN_SIZE]]
+        cursor.execute(f"""
+            SELECT chamado_id, id, data_hora, texto
+            FROM chamado_andamentos
+            WHERE chamado_id IN ({', '.join('?' * len(ids))})
+            ORDER BY chamado_id, data_hora, id
+        """, ids)
+        for row in cursor:
+            andamentos_by_call.setdefault(row[0], []).append(row[1:])
+    return andamentos_by_call
+
+def iter_clients(filter_expr=None, chunk_size=EXPORT_FETCH_SIZE):
+    """
+    Percorre os clientes do banco como dicionários, lendo em blocos.
+
+    Args:
+        filter_expr (str, optional): Expressão de filtro (ver compile_filter)
+        chunk_size (int): Linhas por fetchmany
+
+    Yields:
+        dict: coluna -> valor
+    """
+    with get_connection_manager().reader() as conn:
+        cursor = conn.cursor()
+        column_names, query, params = _clients_select(cursor, filter_expr)
+        cursor.execute(query, params)
+        for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+            for row in rows:
+                yield dict(zip(column_names, row))
+
+def iter_calls(status=None, filter_expr=None, search=None, chunk_size=EXPORT_FETCH_SIZE):
+    """
+    Percorre os chamados do banco como dicionários, com seus andamentos.
+
+    A busca textual usa o índice já existente (ver refresh_search_index).
+
+    Yields:
+        dict: coluna -> valor, mais 'andamentos' (lista de dicionários)
+    """
+    with get_connection_manager().reader() as conn:
+        cursor = conn.cursor()
+        andamentos_cursor = conn.cursor()
+        column_names, query, params = _calls_select(cursor, status, filter_expr, search)
+        cursor.execute(query, params)
+        for calls in iter(lambda: cursor.fetchmany(chunk_size), []):
+            andamentos_by_call = _fetch_andamentos(andamentos_cursor, calls)
+            for call in calls:
+                record = dict(zip(column_names, call))
+                record['andamentos'] = [dict(zip(ANDAMENTO_FIELDS, andamento))
+                                        for andamento in andamentos_by_call.get(call[0], [])]
+                yield record
+
+def client_element(column_names, row, with_hash=False, compact=False):
+    """
+    Monta o elemento <cliente> de uma linha da tabela clientes.
+
+    Returns:
+        tuple: (elemento, hash do conteúdo ou None se with_hash for False)
+    """
+    if compact:
+        client_elem = ET.Element('cliente', {field: _xml_text(value)
+                                             for field, value in zip(column_names, row)})
+    else:
+        client_elem = ET.Element('cliente')
+        for i, field in enumerate(column_names):
+            field_elem = ET.SubElement(client_elem, field)
+            field_elem.text = _xml_text(row[i])
+    digest = content_hash(zip(column_names, row)) if with_hash else None
+    return client_elem, digest
+
+def call_element(column_names, row, andamentos, with_hash=False, compact=False):
+    """
+    Monta o elemento <chamado> de uma linha da tabela chamados, com os
+    andamentos (tuplas id, data_hora, texto) aninhados.
+
+    Returns:
+        tuple: (elemento, hash do conteúdo ou None se with_hash for False)
+    """
+    if compact:
+        # Colunas como atributos e um <andamento/> por linha, sem <andamentos>
+        call_elem = ET.Element('chamado', {field: _xml_text(value)
+                                           for field, value in zip(column_names, row)})
+        for andamento in andamentos:
+            ET.SubElement(call_elem, 'andamento', {field: _xml_text(value)
+                                                   for field, value in zip(ANDAMENTO_FIELDS, andamento)})
+    else:
+        call_elem = ET.Element('chamado')
+
+        # Adiciona todos os campos do chamado
+        for field_idx, field in enumerate(column_names):
+            sub = ET.SubElement(call_elem, field)
+            sub.text = _xml_text(row[field_idx])
+
+        # Adiciona os andamentos do chamado
+        andamentos_elem = ET.SubElement(call_elem, 'andamentos')
+        for andamento in andamentos:
+            andamento_elem = ET.SubElement(andamentos_elem, 'andamento')
+            for field_idx, field in enumerate(ANDAMENTO_FIELDS):
+                sub = ET.SubElement(andamento_elem, field)
+                sub.text = _xml_text(andamento[field_idx])
+
+    # Hash do chamado inclui os andamentos
+    digest = None
+    if with_hash:
+        pairs = list(zip(column_names, row))
+        for andamento in andamentos:
+            pairs.extend((f"andamento.{field}", value)
+                         for field, value in zip(ANDAMENTO_FIELDS, andamento))
+        digest = content_hash(pairs)
+    return call_elem, digest
+
+def export_clients(output_file, filter_expr=None, with_hash=False, hash_manifest=None,
+                   reporter=None, compact=False, connection=None):
+    """
+    Exporta clientes para arquivo XML com validação melhorada.
+
+    Args:
+        output_file (str): Caminho do arquivo XML de destino
+        filter_expr (str, optional): Expressão de filtro (ver compile_filter)
+        with_hash (bool): Grava o hash do conteúdo de cada cliente no atributo `hash`
+        hash_manifest (str, optional): Arquivo onde gravar as linhas 'id<TAB>hash'
+        reporter (ConsoleReporter, optional): Destino das mensagens e erros
+        compact (bool): Usa o dialeto compacto (colunas como atributos)
+        connection (sqlite3.Connection, optional): Conexão de leitura já aberta
+            (ex.: um instantâneo de export_all); padrão: uma conexão do pool
+
+    Returns:
+        OperationResult: Verdadeiro se a exportação foi concluída
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivo_destino': output_file}
+    if filter_expr:
+        operation_details['filtro'] = filter_expr
+    if compact:
+        operation_details['formato'] = 'compacto'
+    result = OperationResult('Exportação de Clientes', operation_details, errors)
+    
+    try:
+        # Verifica permissões
+        success, error = verify_xml_path(output_file, 'w')
+        if not success:
+            errors.append({
+                'type': 'Erro de Permissão',
+                'message': error,
+                'suggestion': 'Verifique se você tem permissões de escrita no diretório'
+            })
+            reporter.error_report('Exportação de Clientes', errors, operation_details)
+            return result.finish(False)
+
+        # Garante extensão .xml
+        if output_file != STDIO_PATH and not output_file.lower().endswith('.xml'):
+            output_file += '.xml'
+
+        try:
+            with nullcontext(connection) if connection else get_connection_manager().reader() as conn:
+                cursor = conn.cursor()
+
+                # Compila o filtro em cláusula WHERE parametrizada
+                try:
+                    column_names, query, params = _clients_select(cursor, filter_expr)
+                except ValueError as e:
+                    errors.append({
+                        'type': 'Filtro Inválido',
+                        'message': str(e),
+                        'suggestion': 'Use o formato coluna<op>valor separado por ";" (ex: cidade=SP,RJ;nome~Silva)'
+                    })
+                    reporter.error_report('Exportação de Clientes', errors, operation_details)
+                    return result.finish(False)
+            
+                # Verifica se há clientes para exportar
+                with result.phase('consulta'):
+                    cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+                    total_clients = cursor.fetchone()[0]
+            
+                if total_clients == 0:
+                    errors.append({
+                        'type': 'Dados Vazios',
+                        'message': 'Nenhum cliente encontrado para exportar',
+                        'suggestion': 'Verifique se existem clientes cadastrados'
+                    })
+                    reporter.error_report('Exportação de Clientes', errors, operation_details)
+                    return result.finish(False)
+
+                # Continua com a exportação
+                with result.phase('consulta'):
+                    cursor.execute(query, params)
+                sizer = _export_sizer()
+
+                # Grava o XML em fluxo, lendo os clientes em blocos (tags em português)
+                try:
+                    # Leitura, serialização e gravação rodam em paralelo (pipeline); as
+                    # fases medem o tempo da serialização e o que ela esperou das outras
+                    with open_output(output_file) as f, AsyncFileWriter(f, phase=result.phase) as out, \
+                            (open(hash_manifest, 'w', encoding='utf-8') if hash_manifest else nullcontext()) as manifest, \
+                            prefetch(iter(lambda: cursor.fetchmany(sizer.size), [])) as chunks, \
+                            XmlStreamWriter(out, 'clientes', manifest, compact) as writer:
+                        for rows in result.timed(chunks, 'consulta'):
+                            started, written = time.perf_counter(), writer.bytes
+                            with result.phase('serializacao'):
+                                for client in rows:
+                                    client_elem, digest = client_element(column_names, client,
+                                                                         with_hash or bool(hash_manifest), compact)
+                                    if with_hash:
+                                        client_elem.set('hash', digest)
+                                    writer.write(client_elem, client[0], digest)
+                            sizer.observe(len(rows), (writer.bytes - written) / len(rows),
+                                          time.perf_counter() - started)
+                        exported = writer.count
+                except OSError as e:
+                    errors.append({
+                        'type': 'Erro de Escrita',
+                        'message': f"Falha ao salvar arquivo: {str(e)}",
+                        'suggestion': 'Verifique permissões e espaço em disco'
+                    })
+                    reporter.error_report('Exportação de Clientes', errors, operation_details)
+                    return result.finish(False)
+
+            operation_details['exportados'] = exported
+            operation_details['tamanho_bloco'] = sizer.stats()
+            reporter.message(f"\nExportação concluída com sucesso!")
+            reporter.message(f"Total de {exported} clientes exportados")
+            reporter.message(f"Arquivo salvo em: {output_file}" if output_file != STDIO_PATH
+                             else "Arquivo enviado para a saída padrão")
+            if hash_manifest:
+                reporter.message(f"Manifesto de hashes salvo em: {hash_manifest}")
+            return result.finish(True)
+
+        except sqlite3.Error as e:
+            errors.append({
+                'type': 'Erro de Banco de Dados',
+                'message': str(e),
+                'suggestion': 'Verifique a conexão com o banco de dados'
+            })
+            reporter.error_report('Exportação de Clientes', errors, operation_details)
+            return result.finish(False)
+
+    except Exception as e:
+        errors.append({
+            'type': 'Erro Inesperado',
+            'message': str(e),
+            'data': {'traceback': traceback.format_exc()},
+            'suggestion': 'Entre em contato com o suporte técnico'
+        })
+        reporter.error_report('Exportação de Clientes', errors, operation_details)
+        return result.finish(False)
+
+def _iter_rows(cursor, chunk_size=EXPORT_FETCH_SIZE):
+    """Percorre o resultado de uma consulta lendo em blocos de fetchmany."""
+    for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+        yield from rows
+
+def _nested_queries(calls_query, client_query=None):
+    """
+    Consultas de chamados e de andamentos lidas por export_nested, na ordem
+    exigida por _nested_clients (também analisadas por --analyze).
+
+    Com `client_query` (consulta de clientes filtrada), as duas leem apenas
+    os chamados dos clientes exportados, e cada uma recebe os parâmetros do
+    filtro de clientes.
+
+    Returns:
+        tuple: (SQL dos chamados, SQL dos andamentos)
+    """
+    if client_query:
+        where = f"cliente_id IN (SELECT id FROM ({client_query}))"
+    else:
+        where = "cliente_id IS NOT NULL"
+    calls = f"{calls_query} WHERE {where} ORDER BY cliente_id, id"
+    # c.id (e não a.chamado_id) para que a chave tenha o mesmo tipo e a mesma
+    # ordem da coluna id dos chamados
+    andamentos = (
+        "SELECT c.cliente_id, c.id, a.id, a.data_hora, a.texto "
+        "FROM chamados c JOIN chamado_andamentos a ON a.chamado_id = c.id "
+        f"WHERE c.{where} "
+        "ORDER BY c.cliente_id, c.id, a.data_hora, a.id"
+    )
+    return calls, andamentos
+
+def _sqlite_order(value):
+    """
+    Chave de comparação com a ordem do ORDER BY do SQLite (NULL, números,
+    texto e BLOB), para valores de tipos diferentes na mesma coluna.
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+def _nested_clients(clients, calls, andamentos, client_key, stats, sizer):
+    """
+    Combina (sort-merge) três cursores já ordenados em clientes com seus
+    chamados e andamentos aninhados.
+
+    `clients` vem ordenado por id, `calls` por (cliente_id, id) e `andamentos`
+    por (cliente_id, chamado_id, data_hora, id), com as duas primeiras colunas
+    sendo cliente_id e chamado_id. As chaves são comparadas com _sqlite_order,
+    pois cliente_id pode ter valores de tipos diferentes (ex.: texto em um
+    banco antigo). Cada cursor é lido uma única vez e só o cliente corrente
+    fica em memória. Chamados sem cliente correspondente na exportação são
+    contados em stats['chamados_ignorados'].
+
+    Yields:
+        list: blocos de cerca de sizer.size linhas (clientes, chamados e
+        andamentos), com tuplas (cliente, [(chamado, [andamentos])])
+    """
+    calls = _iter_rows(calls)
+    andamentos = _iter_rows(andamentos)
+    call = next(calls, None)
+    andamento = next(andamentos, None)
+    chunk = []
+    chunk_size = 0
+
+    for client in _iter_rows(clients):
+        client_id = _sqlite_order(client[0])
+        # Chamados de clientes fora da exportação (cliente inexistente)
+        while call is not None and _sqlite_order(call[client_key]) < client_id:
+            stats['chamados_ignorados'] += 1
+            call = next(calls, None)
+
+        client_calls = []
+        while call is not None and _sqlite_order(call[client_key]) == client_id:
+            key = (client_id, _sqlite_order(call[0]))
+            while andamento is not None and \
+                    (_sqlite_order(andamento[0]), _sqlite_order(andamento[1])) < key:
+                andamento = next(andamentos, None)
+            items = []
+            while andamento is not None and \
+                    (_sqlite_order(andamento[0]), _sqlite_order(andamento[1])) == key:
+                items.append(andamento[2:])
+                andamento = next(andamentos, None)
+            client_calls.append((call, items))
+            chunk_size += 1 + len(items)
+            call = next(calls, None)
+
+        chunk.append((client, client_calls))
+        chunk_size += 1
+        if chunk_size >= sizer.size:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+
+    while call is not None:
+        stats['chamados_ignorados'] += 1
+        call = next(calls, None)
+    if chunk:
+        yield chunk
+
+def _warn_journal_mode(conn, operation_details, reporter):
+    """
+    Avisa quando o database não usa WAL. No journal de rollback, a transação
+    de leitura de um instantâneo impede que o HelpHub confirme gravações até
+    o fim da exportação; só em WAL leitura e gravação correm em paralelo.
+    """
+    mode = conn.execute('PRAGMA journal_mode').fetchone()[0].lower()
+    if mode != 'wal':
+        operation_details['journal_mode'] = mode
+        reporter.message(f"O banco não usa WAL (journal_mode={mode}): as gravações do HelpHub "
+                         "aguardam o fim da exportação. Para ativar (uma única vez, com o "
+                         "HelpHub fechado): PRAGMA journal_mode = WAL;")
+
+def export_nested(output_file, filter_expr=None, reporter=None, compact=False):
+    """
+    Exporta cada cliente com seus chamados e andamentos aninhados
+    (<cliente> → <chamados> → <andamentos>), em um único XML.
+
+    As três tabelas são lidas em paralelo por cursores ordenados pelas chaves
+    de cliente e de chamado, dentro de uma mesma transação de leitura, e
+    combinadas em fluxo: a memória usada não depende do tamanho do banco.
+    O arquivo gerado é aceito por import_clients.
+
+    Args:
+        output_file (str): Caminho do arquivo XML de destino
+        filter_expr (str, optional): Filtro dos clientes (ver compile_filter)
+        reporter (ConsoleReporter, optional): Destino das mensagens e erros
+        compact (bool): Usa o dialeto compacto (colunas como atributos e
+            chamados direto dentro do cliente)
+
+    Returns:
+        OperationResult: Verdadeiro se a exportação foi concluída
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivo_destino': output_file}
+    if filter_expr:
+        operation_details['filtro'] = filter_expr
+    if compact:
+        operation_details['formato'] = 'compacto'
+    result = OperationResult('Exportação Aninhada', operation_details, errors)
+
+    try:
+        # Verifica permissões
+        success, error = verify_xml_path(output_file, 'w')
+        if not success:
+            errors.append({
+                'type': 'Erro de Permissão',
+                'message': error,
+                'suggestion': 'Verifique se você tem permissões de escrita no diretório'
+            })
+            reporter.error_report('Exportação Aninhada', errors, operation_details)
+            return result.finish(False)
+
+        # Garante extensão .xml
+        if output_file != STDIO_PATH and not output_file.lower().endswith('.xml'):
+            output_file += '.xml'
+
+        try:
+            with get_connection_manager().reader() as conn:
+                cursor = conn.cursor()
+                calls_cursor = conn.cursor()
+                andamentos_cursor = conn.cursor()
+
+                try:
+                    client_columns, client_query, params = _clients_select(cursor, filter_expr)
+                except ValueError as e:
+                    errors.append({
+                        'type': 'Filtro Inválido',
+                        'message': str(e),
+                        'suggestion': 'Use o formato coluna<op>valor separado por ";" (ex: cidade=SP,RJ;nome~Silva)'
+                    })
+                    reporter.error_report('Exportação Aninhada', errors, operation_details)
+                    return result.finish(False)
+                call_columns, calls_query, _ = _calls_select(calls_cursor)
+                client_key = call_columns.index('cliente_id')
+
+                # Os três cursores leem o mesmo instantâneo do banco
+                _warn_journal_mode(conn, operation_details, reporter)
+                conn.execute('BEGIN')
+                try:
+                    with result.phase('consulta'):
+                        cursor.execute(f"SELECT COUNT(*) FROM ({client_query})", params)
+                        total_clients = cursor.fetchone()[0]
+                    if total_clients == 0:
+                        errors.append({
+                            'type': 'Dados Vazios',
+                            'message': 'Nenhum cliente encontrado para exportar',
+                            'suggestion': 'Verifique se existem clientes cadastrados'
+                        })
+                        reporter.error_report('Exportação Aninhada', errors, operation_details)
+                        return result.finish(False)
+
+                    with result.phase('consulta'):
+                        cursor.execute(f"{client_query} ORDER BY id", params)
+                        # Com filtro, chamados e andamentos se restringem aos clientes filtrados
+                        nested_calls, nested_andamentos = _nested_queries(
+                            calls_query, client_query if filter_expr else None)
+                        calls_cursor.execute(nested_calls, params)
+                        andamentos_cursor.execute(nested_andamentos, params)
+
+                    stats = {'chamados_ignorados': 0}
+                    calls_count = 0
+                    andamentos_count = 0
+                    sizer = _export_sizer()
+                    progress = reporter.progress('Exportando clientes', total_rows=total_clients)
+                    with open_output(output_file) as f, AsyncFileWriter(f, phase=result.phase) as out, \
+                            prefetch(_nested_clients(cursor, calls_cursor, andamentos_cursor,
+                                                     client_key, stats, sizer)) as chunks, \
+                            XmlStreamWriter(out, 'clientes', compact=compact) as writer:
+                        for groups in result.timed(chunks, 'consulta'):
+                            started, written = time.perf_counter(), writer.bytes
+                            rows = len(groups)
+                            with result.phase('serializacao'):
+                                for client, client_calls in groups:
+                                    client_elem, _ = client_element(client_columns, client, compact=compact)
+                                    calls_elem = client_elem if compact else ET.SubElement(client_elem, 'chamados')
+                                    for call, andamentos in client_calls:
+                                        call_elem, _ = call_element(call_columns, call, andamentos,
+                                                                    compact=compact)
+                                        calls_elem.append(call_elem)
+                                        andamentos_count += len(andamentos)
+                                        rows += 1 + len(andamentos)
+                                    calls_count += len(client_calls)
+                                    writer.write(client_elem)
+                            sizer.observe(rows, (writer.bytes - written) / rows,
+                                          time.perf_counter() - started)
+                            progress.update(rows=len(groups))
+                        exported = writer.count
+                    progress.finish()
+                finally:
+                    conn.rollback()
+
+        except OSError as e:
+            errors.append({
+                'type': 'Erro de Escrita',
+                'message': f"Falha ao salvar arquivo: {str(e)}",
+                'suggestion': 'Verifique permissões e espaço em disco'
+            })
+            reporter.error_report('Exportação Aninhada', errors, operation_details)
+            return result.finish(False)
+        except sqlite3.Error as e:
+            errors.append({
+                'type': 'Erro de Banco de Dados',
+                'message': str(e),
+                'suggestion': 'Verifique a conexão com o banco de dados'
+            })
+            reporter.error_report('Exportação Aninhada', errors, operation_details)
+            return result.finish(False)
+
+        operation_details.update({
+            'clientes_exportados': exported,
+            'chamados_exportados': calls_count,
+            'andamentos_exportados': andamentos_count,
+            'chamados_ignorados': stats['chamados_ignorados'],
+            'tamanho_bloco': sizer.stats(),
+        })
+        reporter.message(f"\nExportação concluída com sucesso!")
+        reporter.message(f"Clientes exportados: {exported}")
+        reporter.message(f"Chamados exportados: {calls_count}")
+        reporter.message(f"Andamentos exportados: {andamentos_count}")
+        if stats['chamados_ignorados']:
+            reporter.message(f"Chamados sem cliente na exportação (não incluídos): {stats['chamados_ignorados']}")
+        reporter.message(f"Arquivo salvo em: {output_file}" if output_file != STDIO_PATH
+                         else "Arquivo enviado para a saída padrão")
+        return result.finish(True)
+
+    except Exception as e:
+        errors.append({
+            'type': 'Erro Inesperado',
+            'message': str(e),
+            'data': {'traceback': traceback.format_exc()},
+            'suggestion': 'Entre em contato com o suporte técnico'
+        })
+        reporter.error_report('Exportação Aninhada', errors, operation_details)
+        return result.finish(False)
+
+class ProgressReporter:
+    """
+    Exibe o andamento de operações longas em uma única linha de status.
+
+    Conta linhas e bytes (posição no arquivo durante a leitura incremental)
+    e redesenha a linha em taxa limitada, mostrando linhas/s, MB/s e o tempo
+    estimado restante. Fora de um terminal, imprime uma linha a cada
+    PROGRESS_LOG_INTERVAL segundos para não poluir os logs.
+
+    Com `callback`, nada é escrito: callback(progress) é chamado na mesma taxa
+    limitada (e uma última vez, com `finished` verdadeiro, ao final).
+    """
+
+    def __init__(self, label, total_bytes=None, total_rows=None, stream=None, callback=None):
+        self.label = label
+        self.total_bytes = total_bytes
+        self.total_rows = total_rows
+        self.stream = stream or sys.stdout
+        self.callback = callback
+        self.interactive = callback is None and hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.interval = PROGRESS_INTERVAL if self.interactive or callback else PROGRESS_LOG_INTERVAL
+        self.rows = 0
+        self.position = 0
+        self.finished = False
+        self.started = time.perf_counter()
+        self._last_render = self.started
+
+    def update(self, rows=0, position=None):
+        """Registra linhas processadas e a posição atual no arquivo."""
+        self.rows += rows
+        if position is not None:
+            self.position = position
+        now = time.perf_counter()
+        if now - self._last_render >= self.interval:
+            self._last_render = now
+            self._render(now)
+
+    def _render(self, now):
+        if self.callback:
+            self.callback(self)
+            return
+        elapsed = max(now - self.started, 1e-9)
+        rows_per_s = self.rows / elapsed
+        mb_per_s = self.position / elapsed / (1024 * 1024)
+        line = f"{self.label}: {self.rows} linhas | {rows_per_s:,.0f} linhas/s"
+        if self.position:
+            line += f" | {mb_per_s:.1f} MB/s"
+
+        # Estimativa pelo total de bytes ou, na falta dele, pelo total de linhas
+        eta = None
+        if self.total_bytes and self.position:
+            eta = (self.total_bytes - self.position) / (self.position / elapsed)
+            line += f" | {self.position / self.total_bytes:.0%}"
+        elif self.total_rows and self.rows:
+            eta = (self.total_rows - self.rows) / rows_per_s
+            line += f" | {self.rows / self.total_rows:.0%}"
+        if eta is not None:
+            line += f" | ETA {_format_duration(max(eta, 0))}"
+
+        if self.interactive:
+            self.stream.write(f"\r{line:<79}")
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        """Desenha a linha final e encerra a linha de status."""
+        self.finished = True
+        self._render(time.perf_counter())
+        if self.interactive:
+            self.stream.write("\n")
+            self.stream.flush()
+
+def _format_duration(seconds):
+    """Formata uma duração em segundos como HH:MM:SS."""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+# Tamanho das fatias do arquivo mapeado entregues ao parser incremental.
+# Fatias pequenas mantêm poucos eventos pendentes (e poucos elementos vivos)
+# entre uma limpeza da árvore e outra; 16 KB foi o mais rápido nas medições.
+XML_FEED_SIZE = 16 * 1024
+
+@contextmanager
+def map_xml_file(xml_file):
+    """
+    Mapeia o arquivo XML em memória (somente leitura) e fornece uma memoryview
+    sobre ele. As fatias da view são entregues ao parser sem cópias para
+    objetos bytes intermediários.
+    """
+    import mmap
+    with open(xml_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ET.ParseError('O arquivo XML está vazio')
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with memoryview(mapping) as view:
+                yield view
+        finally:
+            mapping.close()
+
+def find_record_offsets(view, record_tags, start=0):
+    """
+    Localiza no arquivo mapeado o início de cada registro (<chamado>, <cliente>...).
+
+    A busca é feita direto nos bytes, sem analisar o XML, e serve para dividir
+    o arquivo em blocos ou retomar uma importação a partir de um registro.
+    Como o texto dos campos é escapado na exportação, uma tag de registro
+    só aparece literalmente no início de um elemento.
+
+    Args:
+        view (memoryview): Arquivo mapeado (ver map_xml_file)
+        record_tags (list): Tags dos registros
+        start (int): Posição inicial da busca
+
+    Yields:
+        int: Posição do '<' de abertura de cada registro, em ordem
+    """
+    data = view.obj
+    patterns = [f"<{tag}".encode('utf-8') for tag in record_tags]
+    size = len(view)
+    positions = {pattern: data.find(pattern, start) for pattern in patterns}
+    while True:
+        pattern, pos = min(((p, pos) for p, pos in positions.items() if pos != -1),
+                           key=lambda item: item[1], default=(None, -1))
+        if pattern is None:
+            return
+        after = pos + len(pattern)
+        # Ignora tags que apenas começam com o nome procurado (ex.: <chamados>)
+        if after < size and data[after:after + 1] in (b'>', b' ', b'/', b'\t', b'\n', b'\r'):
+            yield pos
+        positions[pattern] = data.find(pattern, after)
+
+def iter_xml_records(xml_file, root_tags, record_tags, progress=None, start_offset=0,
+                     root_attrib=None, skip_records=0):
+    """
+    Lê o arquivo XML de forma incremental, produzindo cada elemento de
+    registro (<cliente>, <chamado>...) assim que ele é concluído.
+
+    O arquivo é mapeado em memória e entregue ao parser em fatias de uma
+    memoryview. Os registros já processados são descartados da árvore,
+    mantendo o uso de memória constante independentemente do tamanho do arquivo.
+
+    Args:
+        xml_file (str): Caminho do arquivo XML
+        root_tags (list): Tags raiz aceitas
+        record_tags (list): Tags dos registros produzidos
+        progress (ProgressReporter, optional): Recebe linhas e posição no arquivo
+        start_offset (int): Posição de um registro (ver find_record_offsets) a
+            partir da qual a leitura é retomada; o cabeçalho do arquivo é lido antes
+        root_attrib (dict, optional): Recebe os atributos da raiz (ex.: versao)
+            antes do primeiro registro
+        skip_records (int): Registros a pular a partir de start_offset, localizados
+            com find_record_offsets sem analisar o XML (retomada de uma importação)
+
+    Raises:
+        ValueError: Se a tag raiz não for suportada ou o arquivo tiver menos
+            registros que skip_records
+        ET.ParseError: Se o XML estiver malformado
+    """
+    if xml_file == STDIO_PATH:
+        # A entrada padrão não pode ser mapeada: lê em blocos, sem retomada
+        if start_offset or skip_records:
+            raise ValueError('A entrada padrão não permite retomar a importação')
+        stream = sys.stdin.buffer
+        yield from _parse_records(_stream_chunks(stream), root_tags, record_tags, progress,
+                                  root_attrib)
+        return
+
+    with map_xml_file(xml_file) as view:
+        if skip_records:
+            import itertools
+            offsets = find_record_offsets(view, record_tags, start_offset)
+            start_offset = next(itertools.islice(offsets, skip_records, None), None)
+            if start_offset is None:
+                raise ValueError(f'O arquivo não tem registros após os {skip_records} já importados')
+        chunks = _view_chunks(view, record_tags, start_offset)
+        try:
+            yield from _parse_records(chunks, root_tags, record_tags, progress, root_attrib)
+        finally:
+            # Libera a fatia em uso (ex.: após um erro de XML) antes de desfazer o mapeamento
+            chunks.close()
+
+def _view_chunks(view, record_tags, start_offset=0):
+    """Fatias do arquivo mapeado e a posição ao fim de cada uma."""
+    if start_offset:
+        # Entrega ao parser a declaração e a tag raiz que precedem o primeiro registro
+        header_end = min(next(find_record_offsets(view, record_tags), start_offset), start_offset)
+        with view[0:header_end] as chunk:
+            yield chunk, start_offset
+    position = start_offset
+    while position < len(view):
+        end = min(position + XML_FEED_SIZE, len(view))
+        with view[position:end] as chunk:
+            yield chunk, end
+        position = end
+
+def _stream_chunks(stream):
+    """Blocos lidos de um fluxo (ex.: stdin) e a quantidade de bytes já lida."""
+    position = 0
+    while True:
+        chunk = stream.read(XML_FEED_SIZE)
+        if not chunk:
+            return
+        position += len(chunk)
+        yield chunk, position
+
+def _parse_records(chunks, root_tags, record_tags, progress=None, root_attrib=None):
+    """Alimenta o parser incremental com `chunks` e produz os registros concluídos."""
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    depth = 0
+    position = 0
+    chunks = iter(chunks)
+
+    finished = False
+    while not finished:
+        try:
+            chunk, position = next(chunks)
+            parser.feed(chunk)
+        except StopIteration:
+            # Sinaliza o fim do documento (falha se o XML estiver incompleto)
+            parser.close()
+            finished = True
+
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                    if elem.tag not in root_tags:
+                        raise ValueError(f"A tag raiz do XML ({elem.tag}) não é suportada")
+                    if root_attrib is not None:
+                        root_attrib.update(elem.attrib)
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1:
+                if elem.tag in record_tags:
+                    yield elem
+                    if progress:
+                        progress.update(rows=1, position=position)
+                # Libera os registros já processados
+                root.clear()
+
+def test_xml_file(file_path, root_tags=('clients', 'clientes'), record_tags=('client', 'cliente')):
+    """
+    Testa se um arquivo XML é válido e pode ser lido.
+    A leitura é interrompida no primeiro registro encontrado.
+    Retorna (bool, str) - (sucesso, mensagem de erro)
+    """
+    if file_path == STDIO_PATH:
+        # Ler o início consumiria a entrada; os erros surgem durante a importação
+        return True, None
+    try:
+        if not os.path.exists(file_path):
+            return False, f"Arquivo não encontrado: {file_path}"
+        
+        try:
+            records = iter_xml_records(file_path, root_tags, record_tags)
+            try:
+                next(records)
+            except StopIteration:
+                return False, f"O arquivo XML está vazio (sem elementos {'/'.join(record_tags)})"
+            finally:
+                records.close()
+            return True, None
+        except ValueError as e:
+            return False, f"{str(e)}. Use {' ou '.join(f'<{tag}>' for tag in root_tags)}."
+        except ET.ParseError as e:
+            return False, f"Erro ao analisar o XML: {str(e)}"
+        except Exception as e:
+            return False, f"Erro ao ler o arquivo XML: {str(e)}"
+    except Exception as e:
+        return False, f"Erro ao verificar o arquivo XML: {str(e)}"
+
+# Registros por transação nas importações (tamanho inicial do lote; os
+# seguintes são dimensionados por BatchSizer)
+IMPORT_BATCH_SIZE = 500
+IMPORT_BATCH_MIN = 20
+IMPORT_BATCH_MAX = 5000
+# Um registro a cada N tem o tamanho em memória medido
+IMPORT_SIZE_SAMPLE = 8
+# Novas tentativas de um lote quando o banco está bloqueado por outro processo
+IMPORT_LOCK_RETRIES = 8
+IMPORT_RETRY_DELAY = 0.1      # Espera base, dobrada a cada tentativa
+IMPORT_RETRY_MAX_DELAY = 5.0
+
+LOCK_SUGGESTION = ('O banco continuou bloqueado por outro programa (ex.: HelpHub). Os lotes '
+                   'confirmados foram mantidos; tente novamente ou aumente --busy-timeout/--lock-retries')
+
+# Códigos SQLITE_BUSY e SQLITE_LOCKED
+_LOCK_ERROR_CODES = (5, 6)
+
+def _with_lock_retry(conn, action, retries=None, on_wait=None):
+    """
+    Executa action() e, se o banco continuar bloqueado por outro processo
+    além do busy_timeout, desfaz a transação aberta em `conn` e tenta de novo
+    após uma espera exponencial com variação aleatória, até `retries` vezes
+    (padrão: IMPORT_LOCK_RETRIES). on_wait(segundos) é chamado a cada espera.
+
+    Returns:
+        O retorno de action()
+    """
+    retries = IMPORT_LOCK_RETRIES if retries is None else retries
+    attempt = 0
+    while True:
+        try:
+            return action()
+        except sqlite3.OperationalError as e:
+            if not _is_lock_error(e) or attempt >= retries:
+                raise
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Espera exponencial com variação, para não colidir de novo com o aplicativo
+            delay = min(IMPORT_RETRY_DELAY * 2 ** attempt, IMPORT_RETRY_MAX_DELAY)
+            delay *= random.uniform(0.5, 1.5)
+            time.sleep(delay)
+            attempt += 1
+            if on_wait:
+                on_wait(delay)
+
+def _is_lock_error(error):
+    """Indica se o erro do SQLite é um bloqueio por outra conexão (database is locked/busy)."""
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in _LOCK_ERROR_CODES
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+class ImportBatcher:
+    """
+    Grava os registros importados em transações de `batch_size` registros.
+
+    Cada registro é aplicado dentro de um SAVEPOINT próprio: se qualquer
+    instrução do registro falhar (por exemplo, um andamento do chamado),
+    somente aquele registro é desfeito e o restante do lote segue para o
+    COMMIT. Usado como gerenciador de contexto sobre a conexão de escrita.
+
+    O lote obtém o bloqueio de escrita logo no início (BEGIN IMMEDIATE). Se
+    outro processo, como o HelpHub, mantiver o banco bloqueado além do
+    busy_timeout, o lote inteiro é desfeito e tentado novamente após uma
+    espera crescente com variação aleatória, sem que os registros sejam
+    contados como falhas. O tamanho do lote é recalculado a cada COMMIT
+    (ver BatchSizer), pela duração da transação e pelo tamanho medido dos
+    registros, para que os registros pendentes caibam em `memory_budget`.
+
+    Args:
+        conn: Conexão de escrita
+        apply_record (callable): apply_record(cursor, registro) grava o registro e
+            pode retornar uma contagem (ex.: andamentos gravados, duplicados
+            mapeados), somada em `children` somente após o COMMIT do lote
+        on_error (callable): on_error(registro, exceção) para registros desfeitos
+        batch_size (int): Registros da primeira transação
+        prepare_batch (callable, optional): prepare_batch(cursor, registros) chamado
+            após o BEGIN, antes de aplicar os registros do lote
+        finish_batch (callable, optional): finish_batch(cursor) chamado antes do
+            COMMIT para gravar em conjunto o que os registros deixaram em
+            tabelas de preparação. Se falhar, o lote é desfeito e regravado
+            chamando finish_batch dentro do SAVEPOINT de cada registro, de modo
+            que apenas os registros com problema sejam descartados.
+        target_duration (float, optional): Duração desejada de cada transação em
+            segundos (padrão: BATCH_TARGET); 0 mantém o tamanho fixo
+        memory_budget (int, optional): Memória para os registros pendentes
+            (padrão: MEMORY_BUDGET)
+        lock_retries (int, optional): Novas tentativas de um lote bloqueado
+            (padrão: IMPORT_LOCK_RETRIES)
+        phase (callable, optional): OperationResult.phase da operação, que recebe
+            o tempo das fases 'gravacao' e 'commit'
+        committed_records (int): Registros da entrada já confirmados antes do
+            primeiro lote (ex.: na retomada de uma importação)
+
+    `committed_records` avança a cada COMMIT até a posição, na entrada, do
+    último registro do lote (o `read` informado em add), de onde uma
+    importação interrompida pode ser retomada.
+    """
+
+    def __init__(self, conn, apply_record, on_error, batch_size=None,
+                 prepare_batch=None, finish_batch=None, target_duration=None, lock_retries=None,
+                 memory_budget=None, phase=None, committed_records=0):
+        self.conn = conn
+        self.apply_record = apply_record
+        self.on_error = on_error
+        self.sizer = BatchSizer(batch_size or IMPORT_BATCH_SIZE, IMPORT_BATCH_MIN, IMPORT_BATCH_MAX,
+                                memory_budget, target_duration)
+        self.prepare_batch = prepare_batch
+        self.finish_batch = finish_batch
+        self.lock_retries = IMPORT_LOCK_RETRIES if lock_retries is None else lock_retries
+        self.phase = phase or (lambda name: nullcontext())
+        self.pending = []
+        self.committed_records = committed_records
+        self._read = committed_records
+        self.imported = 0
+        self.failed = 0
+        self.children = 0
+        self.batches = 0
+        self.replayed = 0
+        self.lock_waits = 0
+        self.lock_wait_time = 0.0
+        self.longest_transaction = 0.0
+        self._sampled_bytes = 0
+        self._sampled = 0
+        self._isolation_level = None
+
+    def __enter__(self):
+        # Controle manual de transações (BEGIN/SAVEPOINT/COMMIT explícitos)
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self._isolation_level = self.conn.isolation_level
+        self.conn.isolation_level = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+            else:
+                # Registros do lote ainda não confirmado são descartados
+                self.pending = []
+        finally:
+            if self.conn.in_transaction:
+                self.conn.execute('ROLLBACK')
+            self.conn.isolation_level = self._isolation_level
+        return False
+
+    def add(self, record, read=None):
+        """
+        Enfileira um registro, gravando o lote quando ele estiver completo.
+        `read` é a quantidade de registros lidos da entrada até este (padrão:
+        um a mais que o registro anterior).
+        """
+        self._read = self._read + 1 if read is None else read
+        self.pending.append(record)
+        if len(self.pending) % IMPORT_SIZE_SAMPLE == 1:
+            self._sampled_bytes += _approx_size(record)
+            self._sampled += 1
+        if len(self.pending) >= self.sizer.size:
+            self.flush()
+
+    def flush(self):
+        """Grava o lote pendente em uma única transação."""
+        if not self.pending:
+            return
+        cursor = self.conn.cursor()
+        imported, failed, children, failures, elapsed = self.retry(lambda: self._write_batch(cursor))
+
+        # Contabiliza somente após o COMMIT do lote
+        self.committed_records = self._read
+        self.imported += imported
+        self.failed += failed
+        self.children += children
+        self.batches += 1
+        self.longest_transaction = max(self.longest_transaction, elapsed)
+        self.sizer.observe(len(self.pending), self._sampled_bytes / max(self._sampled, 1), elapsed)
+        self._sampled_bytes = self._sampled = 0
+        self.pending = []
+        for record, e in failures:
+            self.on_error(record, e)
+
+    def retry(self, action):
+        """
+        Executa action() com as mesmas novas tentativas dos lotes quando o
+        banco está bloqueado (ver _with_lock_retry), contando as esperas nas
+        estatísticas. Usado também nas gravações que preparam a importação.
+        """
+        with self.phase('gravacao'):
+            return _with_lock_retry(self.conn, action, self.lock_retries, self._lock_waited)
+
+    def _lock_waited(self, delay):
+        self.lock_waits += 1
+        self.lock_wait_time += delay
+
+    def _write_batch(self, cursor):
+        """Grava o lote, refazendo-o registro a registro se finish_batch falhar."""
+        try:
+            return self._write(cursor, per_record=False)
+        except sqlite3.Error as e:
+            if not self.finish_batch or _is_lock_error(e):
+                raise
+            # A gravação em conjunto falhou: refaz o lote registro a registro
+            if self.conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            self.replayed += 1
+            return self._write(cursor, per_record=True)
+
+    def stats(self):
+        """Estatísticas dos lotes, para os detalhes da operação."""
+        return {
+            'lotes': self.batches,
+            'lotes_refeitos': self.replayed,
+            'tamanho_lote': self.sizer.stats(),
+            'transacao_mais_longa_s': round(self.longest_transaction, 3),
+            'esperas_por_bloqueio': self.lock_waits,
+            'tempo_espera_bloqueio_s': round(self.lock_wait_time, 3),
+        }
+
+    def _write(self, cursor, per_record):
+        """
+        Aplica o lote pendente em uma transação e faz o COMMIT.
+
+        Returns:
+            tuple: (importados, falhas, filhos, [(registro, erro)], duração em segundos)
+        """
+        # Obtém o bloqueio de escrita já no início; o tempo até consegui-lo
+        # (busy_timeout) é contado como espera por bloqueio
+        started = time.perf_counter()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+        finally:
+            locked_at = time.perf_counter()
+            self.lock_wait_time += locked_at - started
+        if self.prepare_batch:
+            self.prepare_batch(cursor, self.pending)
+        imported = failed = children = 0
+        failures = []
+        for record in self.pending:
+            cursor.execute('SAVEPOINT registro')
+            try:
+                count = self.apply_record(cursor, record) or 0
+                if per_record and self.finish_batch:
+                    self.finish_batch(cursor)
+            except sqlite3.Error as e:
+                if _is_lock_error(e):
+                    # Não é um problema do registro: o lote será tentado novamente
+                    raise
+                cursor.execute('ROLLBACK TO registro')
+                cursor.execute('RELEASE registro')
+                failed += 1
+                failures.append((record, e))
+            else:
+                cursor.execute('RELEASE registro')
+                imported += 1
+                children += count
+        if not per_record and self.finish_batch:
+            self.finish_batch(cursor)
+        with self.phase('commit'):
+            cursor.execute('COMMIT')
+        return imported, failed, children, failures, time.perf_counter() - locked_at
+
+# Mapeamento de IDs de origem para os IDs gerados na importação.
+# Permite que referências entre arquivos (ex.: chamados.cliente_id) sejam
+# reescritas para os novos IDs. 'origem' identifica o sistema/arquivo de origem.
+ID_MAP_TABLE = 'importacao_mapa_ids'
+DEFAULT_ID_SOURCE = 'padrao'
+
+def ensure_id_map(cursor):
+    """Cria a tabela de mapeamento de IDs, se necessário."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ID_MAP_TABLE} (
+            tabela TEXT NOT NULL,
+            origem TEXT NOT NULL,
+            id_origem TEXT NOT NULL,
+            id_novo INTEGER NOT NULL,
+            importado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tabela, origem, id_origem)
+        )
+    """)
+
+def record_id_mapping(cursor, table, source, original_id, new_id):
+    """Registra que `original_id` da origem passou a ser `new_id` na tabela."""
+    if original_id is None:
+        return
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {ID_MAP_TABLE} (tabela, origem, id_origem, id_novo)
+        VALUES (?, ?, ?, ?)
+    """, (table, source, str(original_id), new_id))
+
+def lookup_id_mappings(cursor, table, source, original_ids):
+    """
+    Busca em lote os novos IDs de um conjunto de IDs de origem.
+
+    Returns:
+        dict: id_origem (str) -> id_novo
+    """
+    original_ids = list({str(value) for value in original_ids if value is not None})
+    mapping = {}
+    # Respeita o limite de parâmetros por instrução do SQLite
+    for start in range(0, len(original_ids), 500):
+        chunk = original_ids[start:start + 500]
+        cursor.execute(f"""
+            SELECT id_origem, id_novo FROM {ID_MAP_TABLE}
+            WHERE tabela = ? AND origem = ? AND id_origem IN ({', '.join('?' * len(chunk))})
+        """, [table, source] + chunk)
+        mapping.update(cursor.fetchall())
+    return mapping
+
+# Tabela temporária (da conexão de escrita) onde os andamentos de um lote de
+# chamados aguardam a transferência em conjunto para chamado_andamentos
+ANDAMENTOS_STAGING_TABLE = 'temp.andamentos_importacao'
+
+def ensure_andamentos_staging(cursor):
+    """Cria (vazia) a tabela de preparação dos andamentos, se necessário."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ANDAMENTOS_STAGING_TABLE} (
+            seq INTEGER PRIMARY KEY,
+            chamado_id INTEGER NOT NULL,
+            data_hora TEXT,
+            texto TEXT
+        )
+    """)
+    cursor.execute(f"DELETE FROM {ANDAMENTOS_STAGING_TABLE}")
+
+def _call_record(call_elem, valid_columns, compact=False):
+    """
+    Coleta do elemento <chamado> os valores das colunas da tabela chamados,
+    o ID de origem e os andamentos (tuplas data_hora, texto).
+
+    Returns:
+        dict: {'chamado': dados, 'original_id': id de origem, 'andamentos': lista}
+    """
+    # Coleta todos os campos disponíveis no XML em uma única passada
+    fields = _record_fields(call_elem, compact)
+    call_data = {}
+    for field in valid_columns:
+        value = fields.get(field)
+        call_data[field] = value.strip() if value else None
+
+    # Guardamos o ID original para o mapeamento de IDs
+    original_id = fields.get('id') or None
+
+    return {'chamado': call_data, 'original_id': original_id,
+            'andamentos': _andamento_values(call_elem, compact)}
+
+def _andamento_values(call_elem, compact=False):
+    """Andamentos de um <chamado> como (data_hora, texto), só os que têm os dois campos."""
+    andamentos = []
+    for andamento_elem in _andamento_elements(call_elem, compact):
+        values = _record_fields(andamento_elem, compact)
+        data_hora = values.get('data_hora')
+        texto = values.get('texto')
+        if data_hora and texto:
+            andamentos.append((data_hora, texto))
+    return andamentos
+
+def _insert_call(cursor, record, source):
+    """
+    Insere um chamado (ver _call_record) com novo ID, registra o mapeamento
+    do ID de origem e deixa os andamentos na tabela de preparação.
+
+    Returns:
+        int: Quantidade de andamentos preparados
+    """
+    call_data = record['chamado']
+    # Não inserimos o ID, deixamos o banco gerar
+    insert_columns = [field for field in call_data if field != 'id']
+    query = f"""
+        INSERT INTO chamados ({', '.join(insert_columns)})
+        VALUES ({', '.join('?' * len(insert_columns))})
+    """
+    cursor.execute(query, [call_data[field] for field in insert_columns])
+    new_call_id = cursor.lastrowid
+    record_id_mapping(cursor, 'chamados', source, record['original_id'], new_call_id)
+
+    # Andamentos vão para a tabela de preparação com o ID do novo
+    # chamado e são transferidos em conjunto antes do COMMIT do lote
+    cursor.executemany(f"""
+        INSERT INTO {ANDAMENTOS_STAGING_TABLE} (chamado_id, data_hora, texto)
+        VALUES (?, ?, ?)
+    """, [(new_call_id, data_hora, texto) for data_hora, texto in record['andamentos']])
+    return len(record['andamentos'])
+
+def _move_staged_andamentos(cursor):
+    """Transfere os andamentos preparados com uma única instrução, na ordem em que foram lidos."""
+    cursor.execute(f"""
+        INSERT INTO chamado_andamentos (chamado_id, data_hora, texto)
+        SELECT chamado_id, data_hora, texto
+        FROM {ANDAMENTOS_STAGING_TABLE}
+        ORDER BY seq
+    """)
+    cursor.execute(f"DELETE FROM {ANDAMENTOS_STAGING_TABLE}")
+
+def _client_data(client_elem, valid_columns, compact=False):
+    """Coleta do elemento <cliente> os valores das colunas da tabela clientes."""
+    fields = _record_fields(client_elem, compact)
+    client_data = {}
+    for field in valid_columns:
+        value = fields.get(field)
+        client_data[field] = value.strip() if value else None
+    return client_data
+
+def _insert_client(cursor, client_data, source):
+    """
+    Insere um cliente com novo ID e registra o mapeamento do ID de origem.
+
+    Returns:
+        int: ID gerado para o cliente
+    """
+    # Excluímos o ID para o banco gerar um novo
+    insert_columns = [field for field in client_data if field != 'id']
+    query = f"""
+        INSERT INTO clientes ({', '.join(insert_columns)})
+        VALUES ({', '.join('?' * len(insert_columns))})
+    """
+    cursor.execute(query, [client_data[field] for field in insert_columns])
+    new_id = cursor.lastrowid
+    record_id_mapping(cursor, 'clientes', source, client_data.get('id'), new_id)
+    return new_id
+
+def _resume_hint(suggestion, confirmed_count):
+    """Sugestão de uma importação interrompida, com a retomada se houve registros confirmados."""
+    if not confirmed_count:
+        return suggestion
+    return (f"{suggestion.rstrip('.')}. Para continuar de onde parou, repita a importação "
+            f"com --resume-from {confirmed_count}.")
+
+def import_clients(xml_file, source=DEFAULT_ID_SOURCE, skip_known=None, reporter=None,
+                resume_from=0):
+    """
+    Importa clientes de um arquivo XML para o banco de dados.
+
+    Aceita também o formato aninhado de export_nested: os chamados e
+    andamentos dentro de <cliente><chamados> são gravados junto com o
+    cliente, já apontando para o novo ID dele.
+
+    Args:
+        xml_file (str): Caminho do arquivo XML
+        source (str): Origem dos dados no mapeamento de IDs
+        skip_known (str, optional): Manifesto de hashes de uma exportação anterior;
+            clientes com conteúdo idêntico a ela são ignorados
+        reporter (ConsoleReporter, optional): Destino das mensagens, do progresso e dos erros
+        resume_from (int): Registros do início do arquivo já importados por uma
+            execução interrompida (ver 'registros_confirmados' no erro), pulados
+            sem serem analisados
+
+    Returns:
+        OperationResult: Verdadeiro se ao menos um registro foi importado
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivo_origem': xml_file, 'origem': source}
+    if resume_from:
+        operation_details['retomado_de'] = resume_from
+    result = OperationResult('Importação de Clientes', operation_details, errors)
+    read_count = resume_from
+    imported_count = 0
+    skipped_count = 0
+    unchanged_count = 0
+    nested = {'chamados': 0, 'andamentos': 0, 'chamados_ignorados': 0}
+
+    try:
+        # Testa se o arquivo XML é válido antes de prosseguir
+        valid_xml, xml_error = test_xml_file(xml_file)
+        if not valid_xml:
+            errors.append({
+                'type': 'Erro de XML',
+                'message': xml_error,
+                'suggestion': 'Verifique se o arquivo XML existe e está bem formatado'
+            })
+            reporter.error_report('Importação de Clientes', errors, operation_details)
+            return result.finish(False)
+            
+        # Verifica permissões
+        success, error = verify_xml_path(xml_file, 'r')
+        if not success:
+            errors.append({
+                'type': 'Erro de Permissão',
+                'message': error,
+                'suggestion': 'Verifique se o arquivo existe e você tem permissões de leitura'
+            })
+            reporter.error_report('Importação de Clientes', errors, operation_details)
+            return result.finish(False)
+
+        manifest_ok, known_hashes = _load_skip_manifest(skip_known, 'Importação de Clientes', errors,
+                                                        operation_details, reporter)
+        if not manifest_ok:
+            return result.finish(False)
+
+        with result.phase('backup'):
+            backed_up = backup_before_import('Importação de Clientes', errors, operation_details, reporter)
+        if not backed_up:
+            return result.finish(False)
+
+        batch = None
+        try:
+            with get_connection_manager().writer() as conn:
+                cursor = conn.cursor()
+            
+                # Verifica a estrutura da tabela clientes
+                cursor.execute("PRAGMA table_info(clientes)")
+                table_info = cursor.fetchall()
+                valid_columns = [col[1] for col in table_info]
+                cursor.execute("PRAGMA table_info(chamados)")
+                call_columns = [col[1] for col in cursor.fetchall()]
+
+                reporter.message(f"\nProcessando importação de clientes...")
+                progress = reporter.progress('Importando clientes', total_bytes=_input_size(xml_file))
+            
+                def insert_client(cursor, record):
+                    client_id = _insert_client(cursor, record['cliente'], source)
+                    # Chamados aninhados: gravados no mesmo SAVEPOINT do cliente
+                    for call_record in record['chamados']:
+                        call_record['chamado']['cliente_id'] = client_id
+                        _insert_call(cursor, call_record, source)
+
+                def client_failed(record, e):
+                    # O cliente e seus chamados aninhados foram desfeitos juntos
+                    nested['chamados'] -= len(record['chamados'])
+                    nested['andamentos'] -= sum(len(call['andamentos']) for call in record['chamados'])
+                    errors.append({
+                        'type': 'Erro de Importação',
+                        'message': f'Erro ao importar cliente: {str(e)}',
+                        'data': {'cliente': record['cliente'].get('nome', 'Desconhecido')},
+                        'suggestion': 'Verifique se os dados do cliente e de seus chamados são válidos'
+                    })
+
+                batch = ImportBatcher(conn, insert_client, client_failed,
+                                      finish_batch=_move_staged_andamentos, phase=result.phase,
+                                      committed_records=resume_from)
+
+                def prepare_tables():
+                    ensure_id_map(cursor)
+                    ensure_andamentos_staging(cursor)
+                    conn.commit()
+
+                # A criação das tabelas auxiliares também espera o banco bloqueado
+                batch.retry(prepare_tables)
+                with batch:
+                    # Lê os elementos <client> ou <cliente> de forma incremental;
+                    # o atributo versao da raiz indica o dialeto compacto
+                    root_attrib = {}
+                    records = iter_xml_records(xml_file, ['clients', 'clientes'], ['client', 'cliente'],
+                                               progress, root_attrib=root_attrib, skip_records=resume_from)
+                    for client_elem in result.timed(records, 'leitura'):
+                        read_count += 1
+                        compact = root_attrib.get('versao') == XML_COMPACT_VERSION
+                        if known_hashes and bytes.fromhex(element_hash(client_elem, compact)) in known_hashes:
+                            unchanged_count += 1
+                            continue
+
+                        # Coleta os dados do cliente do XML
+                        client_data = _client_data(client_elem, valid_columns, compact)
+                    
+                        # Verifica se tem pelo menos o nome do cliente
+                        if not client_data.get('nome'):
+                            errors.append({
+                                'type': 'Dados Inválidos',
+                                'message': 'Cliente sem nome encontrado no XML',
+                                'suggestion': 'Todos os clientes devem ter um nome'
+                            })
+                            skipped_count += 1
+                            continue
+                    
+                        # Formato aninhado (export_nested)
+                        calls = []
+                        for call_elem in _nested_call_elements(client_elem, compact):
+                            call_record = _call_record(call_elem, call_columns, compact)
+                            if not call_record['chamado'].get('descricao'):
+                                errors.append({
+                                    'type': 'Dados Inválidos',
+                                    'message': 'Chamado sem descrição encontrado no XML',
+                                    'data': {'cliente': client_data['nome']},
+                                    'suggestion': 'Todos os chamados devem ter uma descrição'
+                                })
+                                nested['chamados_ignorados'] += 1
+                                continue
+                            calls.append(call_record)
+                            nested['chamados'] += 1
+                            nested['andamentos'] += len(call_record['andamentos'])
+                    
+                        if VERBOSE:
+                            reporter.message(f"Importando cliente: {client_data.get('nome', 'Sem nome')}")
+                    
+                        batch.add({'cliente': client_data, 'chamados': calls}, read_count)
+            
+                progress.finish()
+                imported_count = batch.imported
+                skipped_count += batch.failed
+            
+        except (ET.ParseError, ValueError) as e:
+            confirmed_count = batch.committed_records if batch else resume_from
+            errors.append({
+                'type': 'Erro de XML',
+                'message': f'Erro ao analisar o arquivo: {str(e)}',
+                'data': {'clientes_ja_confirmados': batch.imported if batch else 0,
+                         'registros_confirmados': confirmed_count},
+                'suggestion': _resume_hint('Verifique se o arquivo XML está bem formatado. Os lotes '
+                                           'confirmados antes do erro foram mantidos.', confirmed_count)
+            })
+            reporter.error_report('Importação de Clientes', errors, operation_details)
+            return result.finish(False)
+        except sqlite3.Error as e:
+            confirmed_count = batch.committed_records if batch else resume_from
+            errors.append({
+                'type': 'Erro de Banco de Dados',
+                'message': str(e),
+                'data': {'registros_confirmados': confirmed_count},
+                'suggestion': _resume_hint(LOCK_SUGGESTION if _is_lock_error(e) else
+                                           'Verifique a conexão com o banco de dados', confirmed_count)
+            })
+            reporter.error_report('Importação de Clientes', errors, operation_details)
+            return result.finish(False)
+
+        # Atualiza detalhes da operação
+        operation_details.update({
+            'total_processado': imported_count + skipped_count,
+            'importados': imported_count,
+            'ignorados': skipped_count,
+            'inalterados_ignorados': unchanged_count,
+            **batch.stats()
+        })
+        if nested['chamados'] or nested['chamados_ignorados']:
+            operation_details.update({
+                'chamados_importados': nested['chamados'],
+                'andamentos_importados': nested['andamentos'],
+                'chamados_ignorados': nested['chamados_ignorados']
+            })
+
+        if errors:
+            reporter.error_report('Importação de Clientes', errors, operation_details)
+            # Retornamos True se pelo menos um cliente foi importado com sucesso
+            return result.finish(imported_count > 0)
+            
+        reporter.message(f"\nImportação concluída com sucesso!")
+        reporter.message(f"Clientes importados: {imported_count}")
+        if nested['chamados'] > 0:
+            reporter.message(f"Chamados aninhados importados: {nested['chamados']}")
+            reporter.message(f"Andamentos importados: {nested['andamentos']}")
+        if unchanged_count > 0:
+            reporter.message(f"Clientes inalterados desde a última exportação: {unchanged_count}")
+        if skipped_count > 0:
+            reporter.message(f"Clientes ignorados devido a erros: {skipped_count}")
+        if batch.lock_waits:
+            reporter.message(f"Esperas pelo banco bloqueado por outro programa: {batch.lock_waits} "
+                             f"({batch.lock_wait_time:.1f} s)")
+        
+        return result.finish(imported_count > 0 or unchanged_count > 0)
+
+    except Exception as e:
+        errors.append({
+            'type': 'Erro Inesperado',
+            'message': str(e),
+            'data': {'traceback': traceback.format_exc()},
+            'suggestion': 'Entre em contato com o suporte técnico'
+        })
+        reporter.error_report('Importação de Clientes', errors, operation_details)
+        return result.finish(False)
+
+# Custo estimado em memória de cada chave (hash de 16 bytes, tupla e entrada do dict)
+MERGE_KEY_COST = 200
+
+class DedupIndex:
+    """
+    Índice das chaves já vistas na importação mesclada.
+
+    As chaves ficam em um dict enquanto cabem em `memory_budget`; ao passar do
+    limite, são transferidas para uma tabela de um banco SQLite temporário
+    (apagado ao fechar) e a memória é liberada. Cada chave guarda a origem e o
+    ID do primeiro registro que a usou.
+    """
+
+    def __init__(self, memory_budget=MEMORY_BUDGET):
+        self.limit = max(memory_budget // MERGE_KEY_COST, 1)
+        self.memory = {}
+        self.spill = None
+        self.spilled = 0
+
+    def _spill(self):
+        if self.spill is None:
+            # Banco temporário em disco, removido automaticamente pelo SQLite
+            self.spill = sqlite3.connect('')
+            self.spill.execute("""
+                CREATE TABLE chaves (
+                    chave BLOB PRIMARY KEY,
+                    origem TEXT,
+                    id_origem TEXT
+                ) WITHOUT ROWID
+            """)
+        self.spill.executemany("INSERT OR IGNORE INTO chaves VALUES (?, ?, ?)",
+                               ((key, *owner) for key, owner in self.memory.items()))
+        self.spill.commit()
+        self.spilled += len(self.memory)
+        self.memory.clear()
+
+    def check_and_add(self, key, owner):
+        """
+        Registra a chave se ela for nova.
+
+        Returns:
+            tuple: (origem, id_origem) do primeiro registro com a chave, ou None se nova
+        """
+        found = self.memory.get(key)
+        if found is not None:
+            return found
+        if self.spill is not None:
+            row = self.spill.execute("SELECT origem, id_origem FROM chaves WHERE chave = ?",
+                                     (key,)).fetchone()
+            if row is not None:
+                return row
+        self.memory[key] = owner
+        if len(self.memory) > self.limit:
+            self._spill()
+        return None
+
+    def __contains__(self, key):
+        if key in self.memory:
+            return True
+        return self.spill is not None and self.spill.execute(
+            "SELECT 1 FROM chaves WHERE chave = ?", (key,)).fetchone() is not None
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+def _merge_files(pattern):
+    """Lista os arquivos XML de um diretório ou de um padrão glob, em ordem."""
+    import glob
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.xml')
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+def merge_source(source, xml_file):
+    """Origem usada no mapeamento de IDs para um arquivo da importação mesclada."""
+    return f"{source}:{os.path.splitext(os.path.basename(xml_file))[0]}"
+
+def merge_import_clients(pattern, source=DEFAULT_ID_SOURCE, key_fields=None,
+                         memory_budget=MEMORY_BUDGET, reporter=None):
+    """
+    Importa clientes de vários arquivos XML, eliminando duplicados entre eles.
+
+    Todos os arquivos são lidos em fluxo e carregados em uma única sequência
+    de lotes (ImportBatcher). A chave de cada cliente é o hash dos campos de
+    `key_fields` (ou de todos os campos exceto o ID), sem diferenciar
+    maiúsculas e espaços nas pontas; o índice de chaves transborda para um
+    SQLite temporário quando excede `memory_budget`.
+
+    O mapeamento de IDs usa a origem '<source>:<nome do arquivo sem extensão>'.
+    Um duplicado é mapeado para o novo ID do cliente mantido, para que os
+    chamados daquele arquivo possam ser importados com essa origem.
+
+    Args:
+        pattern (str): Diretório (lê *.xml) ou padrão glob dos arquivos
+        source (str): Prefixo da origem no mapeamento de IDs
+        key_fields (list, optional): Colunas que identificam um cliente
+        memory_budget (int): Memória máxima do índice de chaves, em bytes
+        reporter (ConsoleReporter, optional): Destino das mensagens, do progresso e dos erros
+
+    Returns:
+        OperationResult: Verdadeiro se ao menos um registro foi importado
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivos': pattern, 'origem': f"{source}:<arquivo>"}
+    result = OperationResult('Importação Mesclada de Clientes', operation_details, errors)
+    files = _merge_files(pattern)
+    if not files:
+        errors.append({
+            'type': 'Arquivos Não Encontrados',
+            'message': f'Nenhum arquivo XML encontrado em: {pattern}',
+            'suggestion': 'Informe um diretório com arquivos .xml ou um padrão como "filiais/*.xml"'
+        })
+        reporter.error_report('Importação Mesclada de Clientes', errors, operation_details)
+        return result.finish(False)
+
+    with result.phase('backup'):
+        backed_up = backup_before_import('Importação Mesclada de Clientes', errors, operation_details, reporter)
+    if not backed_up:
+        return result.finish(False)
+
+    index = DedupIndex(memory_budget)
+    read_count = duplicate_count = skipped_count = files_read = 0
+    failed_aliases = 0
+    batch = None
+
+    try:
+        with get_connection_manager().writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(clientes)")
+            valid_columns = [col[1] for col in cursor.fetchall()]
+            if key_fields:
+                unknown = [field for field in key_fields if field not in valid_columns]
+                if unknown:
+                    errors.append({
+                        'type': 'Chave Inválida',
+                        'message': f"Coluna(s) desconhecida(s) na chave: {', '.join(unknown)}",
+                        'suggestion': f"Colunas disponíveis: {', '.join(valid_columns)}"
+                    })
+                    reporter.error_report('Importação Mesclada de Clientes', errors, operation_details)
+                    return result.finish(False)
+            else:
+                key_fields = [field for field in valid_columns if field != 'id']
+
+            def apply_record(cursor, record):
+                # O retorno entra em batch.children só após o COMMIT do lote,
+                # então um lote refeito ou um SAVEPOINT desfeito não conta o mapeamento
+                if 'alias' in record:
+                    # Duplicado: aponta o ID de origem para o cliente mantido; conta
+                    # só o mapeamento realmente gravado
+                    return cursor.execute(f"""
+                        INSERT OR REPLACE INTO {ID_MAP_TABLE} (tabela, origem, id_origem, id_novo)
+                        SELECT tabela, ?, ?, id_novo FROM {ID_MAP_TABLE}
+                        WHERE tabela = 'clientes' AND origem = ? AND id_origem = ?
+                    """, (record['origem'], record['id_origem'], *record['alias'])).rowcount
+                _insert_client(cursor, record['cliente'], record['origem'])
+                return 0
+
+            def client_failed(record, e):
+                nonlocal failed_aliases
+                # Um mapeamento de duplicado só falha junto com o cliente mantido
+                if 'alias' in record:
+                    failed_aliases += 1
+                    return
+                errors.append({
+                    'type': 'Erro de Importação',
+                    'message': f'Erro ao importar cliente: {str(e)}',
+                    'data': {'cliente': record['cliente'].get('nome', 'Desconhecido'),
+                             'arquivo': record['arquivo']},
+                    'suggestion': 'Verifique se os dados do cliente são válidos'
+                })
+
+            batch = ImportBatcher(conn, apply_record, client_failed, memory_budget=memory_budget,
+                                  phase=result.phase)
+
+            def prepare_tables():
+                ensure_id_map(cursor)
+                conn.commit()
+
+            # A criação da tabela de mapeamento também espera o banco bloqueado
+            batch.retry(prepare_tables)
+
+            reporter.message(f"\nMesclando {len(files)} arquivo(s) de clientes...")
+            with batch:
+                for xml_file in files:
+                    file_source = merge_source(source, xml_file)
+                    root_attrib = {}
+                    progress = None
+                    try:
+                        progress = reporter.progress(f"Lendo {os.path.basename(xml_file)}",
+                                                    total_bytes=_input_size(xml_file))
+                        records = iter_xml_records(xml_file, ['clients', 'clientes'], ['client', 'cliente'],
+                                                   progress, root_attrib=root_attrib)
+                        for client_elem in result.timed(records, 'leitura'):
+                            read_count += 1
+                            client_data = _client_data(client_elem, valid_columns,
+                                                       root_attrib.get('versao') == XML_COMPACT_VERSION)
+                            if not client_data.get('nome'):
+                                errors.append({
+                                    'type': 'Dados Inválidos',
+                                    'message': 'Cliente sem nome encontrado no XML',
+                                    'data': {'arquivo': xml_file},
+                                    'suggestion': 'Todos os clientes devem ter um nome'
+                                })
+                                skipped_count += 1
+                                continue
+
+                            key = bytes.fromhex(content_hash(
+                                (field, (client_data.get(field) or '').casefold())
+                                for field in key_fields))
+                            original_id = client_data.get('id')
+                            owner = index.check_and_add(key, (file_source, original_id))
+                            if owner is None:
+                                batch.add({'cliente': client_data, 'origem': file_source,
+                                           'arquivo': xml_file})
+                            else:
+                                duplicate_count += 1
+                                if original_id is not None and owner[1] is not None:
+                                    batch.add({'alias': owner, 'origem': file_source,
+                                               'id_origem': original_id})
+                        files_read += 1
+                    except (ValueError, ET.ParseError) as e:
+                        errors.append({
+                            'type': 'Erro de XML',
+                            'message': f'Erro ao ler {xml_file}: {str(e)}',
+                            'suggestion': 'O arquivo foi ignorado a partir do erro; os demais foram processados'
+                        })
+                    except OSError as e:
+                        # Ex.: arquivo removido ou sem permissão depois de listado
+                        errors.append({
+                            'type': 'Erro de Leitura',
+                            'message': f'Erro ao abrir {xml_file}: {str(e)}',
+                            'suggestion': 'Verifique se o arquivo existe e você tem permissões de leitura. '
+                                          'Os demais arquivos foram processados'
+                        })
+                    finally:
+                        if progress is not None:
+                            progress.finish()
+
+    except sqlite3.Error as e:
+        errors.append({
+            'type': 'Erro de Banco de Dados',
+            'message': str(e),
+            'data': {'clientes_ja_confirmados': batch.imported if batch else 0},
+            'suggestion': (LOCK_SUGGESTION if _is_lock_error(e) else
+                            'Verifique a conexão com o banco de dados. Os lotes confirmados antes do erro foram mantidos.')
+        })
+        reporter.error_report('Importação Mesclada de Clientes', errors, operation_details)
+        return result.finish(False)
+    except Exception as e:
+        errors.append({
+            'type': 'Erro Inesperado',
+            'message': str(e),
+            'data': {'clientes_ja_confirmados': batch.imported if batch else 0,
+                     'traceback': traceback.format_exc()},
+            'suggestion': 'Entre em contato com o suporte técnico'
+        })
+        reporter.error_report('Importação Mesclada de Clientes', errors, operation_details)
+        return result.finish(False)
+    finally:
+        index.close()
+
+    # Os mapeamentos de duplicados passam pelo lote, mas não são clientes novos
+    mapped_duplicates = batch.children if batch else 0
+    imported_count = batch.imported - mapped_duplicates if batch else 0
+    failed_count = batch.failed - failed_aliases if batch else 0
+    operation_details.update({
+        'arquivos_lidos': f"{files_read}/{len(files)}",
+        'registros_lidos': read_count,
+        'duplicados': duplicate_count,
+        'duplicados_mapeados': mapped_duplicates,
+        'importados': imported_count,
+        'ignorados': skipped_count + failed_count,
+        'chaves_em_disco': index.spilled,
+        **(batch.stats() if batch else {})
+    })
+
+    if errors:
+        reporter.error_report('Importação Mesclada de Clientes', errors, operation_details)
+        return result.finish(imported_count > 0)
+
+    reporter.message(f"\nImportação mesclada concluída com sucesso!")
+    reporter.message(f"Arquivos lidos: {files_read}")
+    reporter.message(f"Registros lidos: {read_count}")
+    reporter.message(f"Duplicados entre arquivos: {duplicate_count}")
+    reporter.message(f"Clientes importados: {imported_count}")
+    if index.spilled:
+        reporter.message(f"Chaves transferidas para o índice em disco: {index.spilled}")
+    if batch and batch.lock_waits:
+        reporter.message(f"Esperas pelo banco bloqueado por outro programa: {batch.lock_waits} "
+                         f"({batch.lock_wait_time:.1f} s)")
+    return result.finish(True)
+
+# Índice de busca textual (FTS5) mantido por esta ferramenta no próprio database.
+# O rowid da tabela FTS é o id do chamado; a tabela de estado guarda uma
+# assinatura de cada chamado indexado para permitir atualização incremental.
+SEARCH_INDEX_TABLE = 'chamados_busca'
+SEARCH_STATE_TABLE = 'chamados_busca_estado'
+
+def _crc32(value):
+    """Função SQL auxiliar: CRC32 do texto (None vira 0)."""
+    if value is None:
+        return 0
+    return zlib.crc32(str(value).encode('utf-8'))
+
+def refresh_search_index():
+    """
+    Cria ou atualiza de forma incremental o índice FTS5 sobre
+    chamados.descricao e chamado_andamentos.texto.
+
+    Apenas chamados novos, alterados (descrição ou andamentos) ou removidos
+    desde a última atualização são reprocessados.
+
+    Returns:
+        dict: Quantidade de chamados reindexados, removidos e total indexado
+
+    Raises:
+        sqlite3.OperationalError: Se o SQLite não tiver suporte a FTS5
+    """
+    with get_connection_manager().writer() as conn:
+        conn.create_function('crc32', 1, _crc32, deterministic=True)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE}
+            USING fts5(descricao, andamentos, tokenize='unicode61 remove_diacritics 2')
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SEARCH_STATE_TABLE} (
+                chamado_id INTEGER PRIMARY KEY,
+                assinatura TEXT NOT NULL
+            )
+        """)
+
+        # Assinatura atual de cada chamado: texto da descrição + andamentos
+        cursor.execute("DROP TABLE IF EXISTS temp.busca_assinaturas")
+        cursor.execute("""
+            CREATE TEMP TABLE busca_assinaturas AS
+            SELECT c.id AS chamado_id,
+                   crc32(c.descricao) || ':' || COUNT(a.id) || ':' ||
+                   IFNULL(MAX(a.id), 0) || ':' || IFNULL(SUM(crc32(a.texto)), 0) AS assinatura
+            FROM chamados c
+            LEFT JOIN chamado_andamentos a ON a.chamado_id = c.id
+            GROUP BY c.id
+        """)
+        cursor.execute("DROP TABLE IF EXISTS temp.busca_alterados")
+        cursor.execute(f"""
+            CREATE TEMP TABLE busca_alterados AS
+            SELECT t.chamado_id, t.assinatura
+            FROM temp.busca_assinaturas t
+            LEFT JOIN {SEARCH_STATE_TABLE} e ON e.chamado_id = t.chamado_id
+            WHERE e.assinatura IS NOT t.assinatura
+        """)
+
+        # Remove do índice os chamados alterados ou que não existem mais
+        cursor.execute(f"""
+            DELETE FROM {SEARCH_INDEX_TABLE}
+            WHERE rowid IN (SELECT chamado_id FROM temp.busca_alterados)
+               OR rowid NOT IN (SELECT chamado_id FROM temp.busca_assinaturas)
+        """)
+        cursor.execute(f"""
+            DELETE FROM {SEARCH_STATE_TABLE}
+            WHERE chamado_id NOT IN (SELECT chamado_id FROM temp.busca_assinaturas)
+        """)
+        removed = cursor.rowcount
+
+        # Reindexa os chamados novos ou alterados
+        cursor.execute(f"""
+            INSERT INTO {SEARCH_INDEX_TABLE} (rowid, descricao, andamentos)
+            SELECT c.id, c.descricao,
+                   (SELECT group_concat(a.texto, char(10))
+                    FROM chamado_andamentos a WHERE a.chamado_id = c.id)
+            FROM chamados c
+            JOIN temp.busca_alterados t ON t.chamado_id = c.id
+        """)
+        reindexed = cursor.rowcount
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {SEARCH_STATE_TABLE} (chamado_id, assinatura)
+            SELECT chamado_id, assinatura FROM temp.busca_alterados
+        """)
+
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_STATE_TABLE}")
+        total = cursor.fetchone()[0]
+        cursor.execute("DROP TABLE temp.busca_alterados")
+        cursor.execute("DROP TABLE temp.busca_assinaturas")
+        conn.commit()
+
+    return {'reindexados': reindexed, 'removidos': removed, 'total_indexado': total}
+
+def export_calls(output_file, status=None, filter_expr=None, search=None,
+                 with_hash=False, hash_manifest=None, reporter=None, compact=False,
+                 connection=None):
+    """
+    Exporta chamados para um arquivo XML, com filtragem opcional.
+
+    Args:
+        output_file (str): Caminho do arquivo XML de destino
+        status (str, optional): Status exato dos chamados exportados
+        filter_expr (str, optional): Expressão de filtro (ver compile_filter)
+        search (str, optional): Consulta FTS5 sobre descrição e andamentos
+        with_hash (bool): Grava o hash do conteúdo de cada chamado (com seus
+            andamentos) no atributo `hash`
+        hash_manifest (str, optional): Arquivo onde gravar as linhas 'id<TAB>hash'
+        reporter (ConsoleReporter, optional): Destino das mensagens e erros
+        compact (bool): Usa o dialeto compacto (colunas e andamentos como atributos)
+        connection (sqlite3.Connection, optional): Conexão de leitura já aberta
+            (ex.: um instantâneo de export_all); padrão: uma conexão do pool
+
+    Returns:
+        OperationResult: Verdadeiro se a exportação foi concluída
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivo_destino': output_file}
+    for key, value in (('status', status), ('filtro', filter_expr), ('busca', search)):
+        if value:
+            operation_details[key] = value
+    if compact:
+        operation_details['formato'] = 'compacto'
+    result = OperationResult('Exportação de Chamados', operation_details, errors)
+
+    def fail(error_type, message, suggestion):
+        errors.append({'type': error_type, 'message': message, 'suggestion': suggestion})
+        reporter.error_report('Exportação de Chamados', errors, operation_details)
+        return result.finish(False)
+
+    try:
+        # Validar e ajustar o caminho do arquivo
+        if not output_file or output_file.strip() in ['c:/', 'c:', '/', '\\']:
+            return fail('Caminho Inválido',
+                        'Especifique um caminho completo incluindo o nome do arquivo.',
+                        'Exemplo: c:/HelpHub/export/chamados/chamados.xml')
+            
+        # Criar diretórios e verificar permissões (dispensado na saída padrão)
+        try:
+            if output_file != STDIO_PATH:
+                if not output_file.lower().endswith('.xml'):
+                    output_file += '.xml'
+
+                dir_path = os.path.dirname(output_file)
+                if dir_path:
+                    os.makedirs(dir_path, exist_ok=True)
+
+                # O arquivo é gravado como .parcial no mesmo diretório e
+                # renomeado no fim; o destino atual não é truncado aqui
+                if not os.access(dir_path or '.', os.W_OK):
+                    raise PermissionError(f"Sem permissão de escrita em: {dir_path or '.'}")
+        except Exception as e:
+            return fail('Erro de Permissão', f'Erro ao preparar o arquivo: {e}',
+                        'Verifique se você tem permissões de escrita no diretório')
+
+        # Atualiza o índice de busca antes de filtrar pelo texto
+        if search:
+            try:
+                index_stats = refresh_search_index()
+            except sqlite3.OperationalError as e:
+                return fail('Erro no Índice de Busca', f'Erro ao atualizar o índice de busca: {e}',
+                            'Verifique se o SQLite possui suporte a FTS5 e se o banco permite escrita.')
+            reporter.message(f"\nÍndice de busca atualizado: {index_stats['reindexados']} chamado(s) reindexado(s)")
+
+        # Conexão de leitura retirada do pool (ou a recebida do chamador)
+        with nullcontext(connection) if connection else get_connection_manager().reader() as conn:
+            cursor = conn.cursor()
+
+            # Compila o filtro em cláusula WHERE parametrizada
+            try:
+                column_names, query, params = _calls_select(cursor, status, filter_expr, search)
+            except ValueError as e:
+                return fail('Filtro Inválido', str(e),
+                            'Use o formato coluna<op>valor separado por ";" (ex: status=Aberto;data_abertura>=2024-01-01)')
+
+            with result.phase('consulta'):
+                cursor.execute(query, params)
+            andamentos_cursor = conn.cursor()
+            hashed = with_hash or bool(hash_manifest)
+
+            sizer = _export_sizer()
+
+            def fetch_calls():
+                # Executado na thread de leitura: cada bloco de chamados vem
+                # com os andamentos de todos eles, buscados em poucas consultas
+                for calls in iter(lambda: cursor.fetchmany(sizer.size), []):
+                    yield calls, _fetch_andamentos(andamentos_cursor, calls)
+
+            # Grava o XML em fluxo (tags em português); leitura, serialização
+            # e gravação rodam em paralelo (pipeline), e as fases medem o tempo
+            # da serialização e o que ela esperou das outras etapas
+            with open_output(output_file) as f, AsyncFileWriter(f, phase=result.phase) as out, \
+                    (open(hash_manifest, 'w', encoding='utf-8') if hash_manifest else nullcontext()) as manifest, \
+                    prefetch(fetch_calls()) as chunks, \
+                    XmlStreamWriter(out, 'chamados', manifest, compact) as writer:
+                for calls, andamentos_by_call in result.timed(chunks, 'consulta'):
+                    started, written = time.perf_counter(), writer.bytes
+                    with result.phase('serializacao'):
+                        for call in calls:
+                            call_elem, digest = call_element(column_names, call,
+                                                             andamentos_by_call.get(call[0], []), hashed, compact)
+                            if with_hash:
+                                call_elem.set('hash', digest)
+                            writer.write(call_elem, call[0], digest)
+                    sizer.observe(len(calls), (writer.bytes - written) / len(calls),
+                                  time.perf_counter() - started)
+                total = writer.count
+        
+        operation_details['exportados'] = total
+        operation_details['tamanho_bloco'] = sizer.stats()
+        reporter.message(f"\nExportação de chamados concluída com sucesso!")
+        reporter.message(f"Total de chamados exportados: {total}")
+        reporter.message(f"Arquivo salvo em: {output_file}" if output_file != STDIO_PATH
+                         else "Arquivo enviado para a saída padrão")
+        if hash_manifest:
+            reporter.message(f"Manifesto de hashes salvo em: {hash_manifest}")
+        return result.finish(True)
+        
+    except Exception as e:
+        return fail('Erro na Exportação', f'Erro durante a exportação de chamados: {e}',
+                    'Verifique a conexão com o banco de dados e o espaço em disco')
+
+EXPORT_ALL_FILES = (('clientes', 'clientes.xml'), ('chamados', 'chamados.xml'))
+EXPORT_ALL_MANIFEST = 'manifesto.json'
+
+def _file_digest(path):
+    """BLAKE2b (128 bits) do conteúdo de um arquivo, lido em blocos."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(EXPORT_WRITE_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_all(directory, with_hash=False, reporter=None, compact=False):
+    """
+    Exporta clientes e chamados ao mesmo tempo, a partir de um único
+    instantâneo do banco.
+
+    Cada exportação roda em sua própria thread, com sua própria conexão de
+    leitura; as duas transações de leitura são abertas juntas (ver
+    ConnectionManager.snapshot), então os arquivos são consistentes entre si
+    mesmo com o HelpHub gravando durante a exportação; fora do modo WAL as
+    gravações do HelpHub aguardam o fim dela. Ao final grava em
+    `directory` o manifesto.json com o instantâneo, os arquivos, as contagens,
+    os tamanhos, o hash de cada arquivo e os tempos.
+
+    Args:
+        directory (str): Pasta onde gravar clientes.xml, chamados.xml e manifesto.json
+        with_hash (bool): Grava o hash do conteúdo de cada registro (atributo `hash`)
+        reporter (ConsoleReporter, optional): Destino das mensagens e erros
+        compact (bool): Usa o dialeto compacto (colunas como atributos)
+
+    Returns:
+        OperationResult: Verdadeiro se as duas exportações foram concluídas
+    """
+    import json
+    from datetime import datetime
+
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'pasta_destino': directory}
+    if compact:
+        operation_details['formato'] = 'compacto'
+    result = OperationResult('Exportação Completa', operation_details, errors)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        errors.append({
+            'type': 'Erro de Permissão',
+            'message': f'Erro ao criar a pasta: {e}',
+            'suggestion': 'Verifique se você tem permissões de escrita no diretório'
+        })
+        reporter.error_report('Exportação Completa', errors, operation_details)
+        return result.finish(False)
+
+    exporters = {'clientes': export_clients, 'chamados': export_calls}
+    results = {}
+    messages = {table: [] for table, _ in EXPORT_ALL_FILES}
+
+    def run(table, output_file, conn):
+        # As mensagens de cada exportação são exibidas juntas ao final,
+        # sem se misturar às da outra thread; no histórico só entra a
+        # exportação completa
+        _history_local.paused = True
+        sub_reporter = CallbackReporter(
+            on_error=lambda operation, error: errors.append({**error, 'data': {
+                **error.get('data', {}), 'exportacao': table}}),
+            on_message=messages[table].append)
+        try:
+            results[table] = exporters[table](output_file, with_hash=with_hash, reporter=sub_reporter,
+                                              compact=compact, connection=conn)
+        except Exception as e:
+            errors.append({
+                'type': 'Erro Inesperado',
+                'message': str(e),
+                'data': {'exportacao': table, 'traceback': traceback.format_exc()},
+                'suggestion': 'Entre em contato com o suporte técnico'
+            })
+
+    reporter.message(f"\nExportando clientes e chamados em paralelo para {directory}...")
+    started = time.perf_counter()
+    try:
+        with get_connection_manager().snapshot(len(EXPORT_ALL_FILES)) as conns:
+            snapshot_at = datetime.now().isoformat(timespec='seconds')
+            _warn_journal_mode(conns[0], operation_details, reporter)
+            threads = [threading.Thread(target=run, args=(table, os.path.join(directory, name), conn),
+                                        name=f'export-{table}', daemon=True)
+                       for (table, name), conn in zip(EXPORT_ALL_FILES, conns)]
+            with result.phase('exportacao'):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+    except sqlite3.Error as e:
+        errors.append({
+            'type': 'Erro de Banco de Dados',
+            'message': str(e),
+            'suggestion': (LOCK_SUGGESTION if _is_lock_error(e) else
+                           'Verifique a conexão com o banco de dados. O instantâneo exige '
+                           'obter por um instante o bloqueio de escrita do database.')
+        })
+        reporter.error_report('Exportação Completa', errors, operation_details)
+        return result.finish(False)
+    elapsed = time.perf_counter() - started
+
+    for table, _ in EXPORT_ALL_FILES:
+        for text in messages[table]:
+            reporter.message(text)
+
+    ok = all(results.get(table) for table, _ in EXPORT_ALL_FILES)
+    if not ok:
+        reporter.error_report('Exportação Completa', errors, operation_details)
+        return result.finish(False)
+
+    files = []
+    for table, name in EXPORT_ALL_FILES:
+        path = os.path.join(directory, name)
+        with result.phase('manifesto'):
+            digest = _file_digest(path)
+        files.append({
+            'arquivo': name,
+            'tabela': table,
+            'registros': results[table].details['exportados'],
+            'bytes': os.path.getsize(path),
+            'blake2b': digest,
+            'duracao_s': round(results[table].duration, 3),
+        })
+    busy = sum(item['duracao_s'] for item in files)
+    manifest = {
+        'banco': os.path.abspath(DATABASE),
+        'instantaneo': snapshot_at,
+        'formato': 'compacto' if compact else 'elementos',
+        'arquivos': files,
+        'duracao_total_s': round(elapsed, 3),
+    }
+    manifest_file = os.path.join(directory, EXPORT_ALL_MANIFEST)
+    try:
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        errors.append({
+            'type': 'Erro de Escrita',
+            'message': f"Falha ao salvar o manifesto: {str(e)}",
+            'suggestion': 'Verifique permissões e espaço em disco'
+        })
+        reporter.error_report('Exportação Completa', errors, operation_details)
+        return result.finish(False)
+
+    operation_details.update({
+        'instantaneo': snapshot_at,
+        'arquivos': files,
+        'manifesto': manifest_file,
+        'exportados': sum(item['registros'] for item in files),
+        'bytes': sum(item['bytes'] for item in files),
+        'duracao_total_s': round(elapsed, 3),
+        'sobreposicao': round(busy / elapsed, 2) if elapsed else None,
+    })
+    reporter.message("\nTempos da exportação completa")
+    reporter.message("─" * 62)
+    for item in files:
+        reporter.message(f"{item['arquivo']:<15} {item['registros']:>10} registros "
+                         f"{item['bytes'] / (1024 * 1024):>8.1f} MB {item['duracao_s']:>8.2f} s")
+    reporter.message(f"Total: {elapsed:.2f} s (soma das exportações: {busy:.2f} s, "
+                     f"sobreposição: {busy / elapsed if elapsed else 0:.2f}x)")
+    reporter.message(f"Manifesto salvo em: {manifest_file}")
+    return result.finish(True)
+
+def import_calls(xml_file, source=DEFAULT_ID_SOURCE, skip_known=None, reporter=None,
+              resume_from=0):
+    """
+    Importa chamados de um arquivo XML para o banco de dados.
+
+    O cliente_id de cada chamado é reescrito para o novo ID do cliente quando
+    ele foi importado da mesma origem (ver importacao_mapa_ids).
+
+    Args:
+        xml_file (str): Caminho do arquivo XML
+        source (str): Origem dos dados no mapeamento de IDs
+        skip_known (str, optional): Manifesto de hashes de uma exportação anterior;
+            chamados com conteúdo idêntico a ela são ignorados
+        reporter (ConsoleReporter, optional): Destino das mensagens, do progresso e dos erros
+        resume_from (int): Registros do início do arquivo já importados por uma
+            execução interrompida (ver 'registros_confirmados' no erro), pulados
+            sem serem analisados
+
+    Returns:
+        OperationResult: Verdadeiro se ao menos um registro foi importado
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivo_origem': xml_file, 'origem': source}
+    if resume_from:
+        operation_details['retomado_de'] = resume_from
+    result = OperationResult('Importação de Chamados', operation_details, errors)
+    read_count = resume_from
     imported_count = 0
     skipped_count = 0
+    unchanged_count = 0
     andamentos_count = 0
+    remapped_clients = 0
     
     try:
         # Verifica permissões
@@ -465,472 +3625,1231 @@ def import_calls(xml_file):
                 'message': error,
                 'suggestion': 'Verifique se o arquivo existe e você tem permissões de leitura'
             })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
+            reporter.error_report('Importação de Chamados', errors, operation_details)
+            return result.finish(False)
 
-        # Parse XML com tratamento de erros
-        try:
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            
-            # Verifica se a tag raiz é suportada
-            if root.tag not in ['calls', 'chamados']:
-                errors.append({
-                    'type': 'Formato Inválido',
-                    'message': f'A tag raiz do XML ({root.tag}) não é suportada',
-                    'suggestion': 'O arquivo deve usar <calls> ou <chamados> como tag raiz'
-                })
-                show_error_report('Importação de Chamados', errors, operation_details)
-                return False
-                
-        except ET.ParseError as e:
+        # Testa se o arquivo XML é válido antes de prosseguir
+        valid_xml, xml_error = test_xml_file(xml_file, ('calls', 'chamados'), ('call', 'chamado'))
+        if not valid_xml:
             errors.append({
                 'type': 'Erro de XML',
-                'message': f'Erro ao analisar o arquivo: {str(e)}',
-                'suggestion': 'Verifique se o arquivo XML está bem formatado'
-            })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
-            
-        # Verifica se há elementos <call> ou <chamado> no arquivo
-        call_elements = root.findall('call') or root.findall('chamado')
-        
-        if len(call_elements) == 0:
-            errors.append({
-                'type': 'Arquivo Inválido',
-                'message': 'Não foram encontrados chamados no arquivo XML',
-                'suggestion': 'Verifique se o arquivo XML está no formato correto com tags <call> ou <chamado>'
+                'message': xml_error,
+                'suggestion': 'O arquivo deve usar <calls> ou <chamados> como tag raiz, com tags <call> ou <chamado>'
             })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
-            
+            reporter.error_report('Importação de Chamados', errors, operation_details)
+            return result.finish(False)
+
+        manifest_ok, known_hashes = _load_skip_manifest(skip_known, 'Importação de Chamados', errors,
+                                                        operation_details, reporter)
+        if not manifest_ok:
+            return result.finish(False)
+
+        with result.phase('backup'):
+            backed_up = backup_before_import('Importação de Chamados', errors, operation_details, reporter)
+        if not backed_up:
+            return result.finish(False)
+
+        batch = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with get_connection_manager().writer() as conn:
+                cursor = conn.cursor()
             
-            # Verifica a estrutura da tabela chamados
-            cursor.execute("PRAGMA table_info(chamados)")
-            table_info = cursor.fetchall()
-            valid_columns = [col[1] for col in table_info]
-            
-            print(f"\nProcessando importação de chamados...")
+                # Verifica a estrutura da tabela chamados
+                cursor.execute("PRAGMA table_info(chamados)")
+                table_info = cursor.fetchall()
+                valid_columns = [col[1] for col in table_info]
+
+                reporter.message(f"\nProcessando importação de chamados...")
+                progress = reporter.progress('Importando chamados', total_bytes=_input_size(xml_file))
             
-            for call_elem in call_elements:
-                try:
-                    # Coleta todos os campos disponíveis no XML
-                    call_data = {}
-                    for field in valid_columns:
-                        elem = call_elem.find(field)
-                        if elem is not None and elem.text:
-                            call_data[field] = elem.text.strip()
-                        else:
-                            call_data[field] = None
-                    
-                    # Guardamos o ID original para mapear os andamentos
-                    original_id = call_elem.find('id')
-                    original_id = original_id.text if original_id is not None and original_id.text else None
-                    
-                    # Precisamos verificar se temos ao menos os campos essenciais
-                    if not call_data.get('descricao'):
-                        errors.append({
-                            'type': 'Dados Inválidos',
-                            'message': 'Chamado sem descrição encontrado no XML',
-                            'suggestion': 'Todos os chamados devem ter uma descrição'
-                        })
-                        skipped_count += 1
-                        continue
-                        
-                    # Prepara e executa a query de inserção
-                    insert_columns = []
-                    values = []
-                    placeholders = []
-                    
-                    for field, value in call_data.items():
-                        if field != 'id':  # Não inserimos o ID, deixamos o banco gerar
-                            insert_columns.append(field)
-                            values.append(value)
-                            placeholders.append('?')
-                    
-                    # Imprime informações de importação
-                    descr_preview = call_data.get('descricao', '')[:30]
-                    if len(call_data.get('descricao', '')) > 30:
-                        descr_preview += "..."
-                    print(f"Importando chamado: {descr_preview}")
-                    
-                    query = f"""
-                        INSERT INTO chamados ({', '.join(insert_columns)})
-                        VALUES ({', '.join(placeholders)})
-                    """
-                    
-                    cursor.execute(query, values)
-                    new_call_id = cursor.lastrowid
-                    
-                    # Importa os andamentos, se existirem
-                    andamentos_elem = call_elem.find('andamentos')
-                    if andamentos_elem is not None:
-                        for andamento_elem in andamentos_elem.findall('andamento'):
-                            try:
-                                data_hora = andamento_elem.find('data_hora')
-                                texto = andamento_elem.find('texto')
-                                
-                                if data_hora is not None and data_hora.text and texto is not None and texto.text:
-                                    # Insere o andamento com o ID do novo chamado
-                                    cursor.execute("""
-                                        INSERT INTO chamado_andamentos (chamado_id, data_hora, texto)
-                                        VALUES (?, ?, ?)
-                                    """, (new_call_id, data_hora.text, texto.text))
-                                    andamentos_count += 1
-                            except sqlite3.Error as e:
-                                errors.append({
-                                    'type': 'Erro de Importação',
-                                    'message': f'Erro ao importar andamento: {str(e)}',
-                                    'suggestion': 'Verifique os dados do andamento'
-                                })
-                    
-                    imported_count += 1
-                    
-                except sqlite3.Error as e:
+                def remap_clients(cursor, records):
+                    # Reescreve em lote o cliente_id dos chamados do lote. O valor
+                    # de origem é preservado, pois o lote pode ser regravado.
+                    nonlocal remapped_clients
+                    for record in records:
+                        record.setdefault('cliente_origem', record['chamado'].get('cliente_id'))
+                    mapping = lookup_id_mappings(
+                        cursor, 'clientes', source,
+                        (record['cliente_origem'] for record in records))
+                    for record in records:
+                        original_client = record['cliente_origem']
+                        if original_client is not None and original_client in mapping:
+                            if record['chamado']['cliente_id'] != mapping[original_client]:
+                                remapped_clients += 1
+                            record['chamado']['cliente_id'] = mapping[original_client]
+
+                def insert_call(cursor, record):
+                    return _insert_call(cursor, record, source)
+
+                def call_failed(record, e):
                     errors.append({
                         'type': 'Erro de Importação',
                         'message': f'Erro ao importar chamado: {str(e)}',
-                        'data': {'descrição': call_data.get('descricao', '')[:50]},
-                        'suggestion': 'Verifique se os dados do chamado são válidos'
+                        'data': {'descrição': record['chamado'].get('descricao', '')[:50],
+                                 'id_original': record['original_id']},
+                        'suggestion': 'Verifique os dados do chamado e de seus andamentos. '
+                                      'O chamado e seus andamentos não foram importados.'
                     })
-                    skipped_count += 1
+
+                batch = ImportBatcher(conn, insert_call, call_failed, prepare_batch=remap_clients,
+                                      finish_batch=_move_staged_andamentos, phase=result.phase,
+                                      committed_records=resume_from)
+
+                def prepare_tables():
+                    ensure_id_map(cursor)
+                    ensure_andamentos_staging(cursor)
+                    conn.commit()
+
+                # A criação das tabelas auxiliares também espera o banco bloqueado
+                batch.retry(prepare_tables)
+                with batch:
+                    # Lê os elementos <call> ou <chamado> de forma incremental;
+                    # o atributo versao da raiz indica o dialeto compacto
+                    root_attrib = {}
+                    records = iter_xml_records(xml_file, ['calls', 'chamados'], ['call', 'chamado'],
+                                               progress, root_attrib=root_attrib, skip_records=resume_from)
+                    for call_elem in result.timed(records, 'leitura'):
+                        read_count += 1
+                        compact = root_attrib.get('versao') == XML_COMPACT_VERSION
+                        if known_hashes and bytes.fromhex(element_hash(call_elem, compact)) in known_hashes:
+                            unchanged_count += 1
+                            continue
+
+                        record = _call_record(call_elem, valid_columns, compact)
+                        call_data = record['chamado']
+                    
+                        # Precisamos verificar se temos ao menos os campos essenciais
+                        if not call_data.get('descricao'):
+                            errors.append({
+                                'type': 'Dados Inválidos',
+                                'message': 'Chamado sem descrição encontrado no XML',
+                                'suggestion': 'Todos os chamados devem ter uma descrição'
+                            })
+                            skipped_count += 1
+                            continue
+                    
+                        # Imprime informações de importação
+                        if VERBOSE:
+                            descr_preview = call_data.get('descricao', '')[:30]
+                            if len(call_data.get('descricao', '')) > 30:
+                                descr_preview += "..."
+                            reporter.message(f"Importando chamado: {descr_preview}")
+                    
+                        batch.add(record, read_count)
             
-            # Confirma as alterações
-            conn.commit()
+                progress.finish()
+                imported_count = batch.imported
+                andamentos_count = batch.children
+                skipped_count += batch.failed
             
+        except (ET.ParseError, ValueError) as e:
+            confirmed_count = batch.committed_records if batch else resume_from
+            errors.append({
+                'type': 'Erro de XML',
+                'message': f'Erro ao analisar o arquivo: {str(e)}',
+                'data': {'chamados_ja_confirmados': batch.imported if batch else 0,
+                         'registros_confirmados': confirmed_count},
+                'suggestion': _resume_hint('Verifique se o arquivo XML está bem formatado. Os lotes '
+                                           'confirmados antes do erro foram mantidos.', confirmed_count)
+            })
+            reporter.error_report('Importação de Chamados', errors, operation_details)
+            return result.finish(False)
         except sqlite3.Error as e:
+            confirmed_count = batch.committed_records if batch else resume_from
             errors.append({
                 'type': 'Erro de Banco de Dados',
                 'message': str(e),
-                'suggestion': 'Verifique a conexão com o banco de dados'
+                'data': {'registros_confirmados': confirmed_count},
+                'suggestion': _resume_hint(LOCK_SUGGESTION if _is_lock_error(e) else
+                                           'Verifique a conexão com o banco de dados', confirmed_count)
             })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
-        finally:
-            if 'conn' in locals() and conn:
-                conn.close()
+            reporter.error_report('Importação de Chamados', errors, operation_details)
+            return result.finish(False)
                 
         # Atualiza detalhes da operação
         operation_details.update({
             'total_processado': imported_count + skipped_count,
             'importados': imported_count,
             'andamentos_importados': andamentos_count,
-            'ignorados': skipped_count
+            'clientes_remapeados': remapped_clients,
+            'ignorados': skipped_count,
+            'inalterados_ignorados': unchanged_count,
+            **batch.stats()
+        })
+
+        if errors:
+            reporter.error_report('Importação de Chamados', errors, operation_details)
+            # Retornamos True se pelo menos um chamado foi importado com sucesso
+            return result.finish(imported_count > 0)
+            
+        reporter.message(f"\nImportação concluída com sucesso!")
+        reporter.message(f"Chamados importados: {imported_count}")
+        reporter.message(f"Andamentos importados: {andamentos_count}")
+        if remapped_clients > 0:
+            reporter.message(f"Chamados com cliente_id reescrito pelo mapeamento de IDs: {remapped_clients}")
+        if unchanged_count > 0:
+            reporter.message(f"Chamados inalterados desde a última exportação: {unchanged_count}")
+        if skipped_count > 0:
+            reporter.message(f"Chamados ignorados devido a erros: {skipped_count}")
+        if batch.lock_waits:
+            reporter.message(f"Esperas pelo banco bloqueado por outro programa: {batch.lock_waits} "
+                             f"({batch.lock_wait_time:.1f} s)")
+        
+        return result.finish(imported_count > 0 or unchanged_count > 0)
+            
+    except Exception as e:
+        errors.append({
+            'type': 'Erro Inesperado',
+            'message': str(e),
+            'data': {'traceback': traceback.format_exc()},
+            'suggestion': 'Entre em contato com o suporte técnico'
+        })
+        reporter.error_report('Importação de Chamados', errors, operation_details)
+        return result.finish(False)
+
+# Arquivamento de chamados finalizados (--archive-calls)
+ARCHIVE_DIR = None             # Padrão: pasta "arquivo" ao lado do database
+ARCHIVE_DELETE_BATCH = 200     # Chamados excluídos por transação
+ARCHIVE_BATCH_PAUSE = 0.05     # Segundos entre transações, para o HelpHub gravar
+ARCHIVE_VACUUM_PAGES = 512     # Páginas liberadas por PRAGMA incremental_vacuum
+ARCHIVE_IDS_TABLE = 'temp.chamados_arquivados'
+ARCHIVE_ANDAMENTOS_TABLE = 'temp.andamentos_arquivados'
+
+def _archive_dir():
+    return ARCHIVE_DIR or os.path.join(os.path.dirname(os.path.abspath(DATABASE)), 'arquivo')
+
+def _count_archived(archive_file):
+    """Relê um arquivo compactado e conta os chamados e andamentos gravados."""
+    import gzip
+    calls = andamentos = 0
+    with gzip.open(archive_file, 'rb') as f:
+        for call_elem in _parse_records(_stream_chunks(f), ('chamados',), ('chamado',)):
+            calls += 1
+            andamentos_elem = call_elem.find('andamentos')
+            if andamentos_elem is not None:
+                andamentos += len(andamentos_elem)
+    return calls, andamentos
+
+def _incremental_vacuum(conn):
+    """
+    Devolve ao sistema as páginas livres em etapas de ARCHIVE_VACUUM_PAGES.
+
+    Returns:
+        int: Páginas liberadas, ou None se o banco não usa auto_vacuum incremental
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+    freed = 0
+    while True:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free == 0:
+            return freed
+        conn.execute(f"PRAGMA incremental_vacuum({ARCHIVE_VACUUM_PAGES})").fetchall()
+        freed += min(free, ARCHIVE_VACUUM_PAGES)
+        time.sleep(ARCHIVE_BATCH_PAUSE)
+
+def archive_calls(cutoff, directory=None, batch_size=None, reporter=None):
+    """
+    Arquiva e remove os chamados finalizados antes de `cutoff`.
+
+    Os chamados (status Finalizado, pela data de fechamento ou, na falta dela,
+    de abertura) são exportados com seus andamentos para um XML compactado por
+    mês. Cada arquivo é relido e as contagens conferidas com o banco; só então
+    os chamados são excluídos, em transações de `batch_size` chamados com uma
+    pausa entre elas, para não bloquear o aplicativo. Só são excluídos os
+    andamentos gravados no arquivo, e um chamado alterado após a exportação
+    (reaberto, com outra data de fechamento ou com andamentos novos ou
+    removidos) é mantido no banco. Ao final, o espaço é
+    devolvido com PRAGMA incremental_vacuum. Um backup é criado antes, se
+    habilitado.
+
+    Args:
+        cutoff (str): Data limite (ISO, ex: 2024-01-01), exclusiva
+        directory (str, optional): Pasta dos arquivos (padrão: ARCHIVE_DIR)
+        batch_size (int, optional): Chamados por transação de exclusão
+        reporter (ConsoleReporter, optional): Destino das mensagens e erros
+
+    Returns:
+        OperationResult: Verdadeiro se o arquivamento foi concluído
+    """
+    import gzip
+    from datetime import datetime
+    reporter = reporter or CONSOLE
+    directory = directory or _archive_dir()
+    batch_size = batch_size or ARCHIVE_DELETE_BATCH
+    errors = []
+    operation_details = {'data_limite': cutoff, 'pasta': directory}
+    result = OperationResult('Arquivamento de Chamados', operation_details, errors)
+
+    if not _is_date(cutoff):
+        errors.append({
+            'type': 'Data Inválida',
+            'message': f'Data limite inválida: {cutoff}',
+            'suggestion': 'Use o formato AAAA-MM-DD (ex: 2024-01-01)'
+        })
+        reporter.error_report('Arquivamento de Chamados', errors, operation_details)
+        return result.finish(False)
+
+    files = []
+    partial = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with result.phase('backup'):
+            backed_up = backup_before_import('Arquivamento de Chamados', errors, operation_details,
+                                             reporter, 'exclusão dos chamados')
+        if not backed_up:
+            return result.finish(False)
+
+        closing_date = "COALESCE(data_fechamento, data_abertura)"
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        manager = get_connection_manager()
+        with manager.writer() as write_conn:
+            if write_conn.in_transaction:
+                write_conn.commit()
+            # Chamados e andamentos gravados nos arquivos, com o estado exportado
+            # de cada chamado para conferir antes da exclusão
+            write_conn.execute(f"DROP TABLE IF EXISTS {ARCHIVE_IDS_TABLE}")
+            write_conn.execute(f"""
+                CREATE TABLE {ARCHIVE_IDS_TABLE} (
+                    id INTEGER PRIMARY KEY, data_fechamento TEXT, andamentos INTEGER NOT NULL)
+            """)
+            write_conn.execute(f"DROP TABLE IF EXISTS {ARCHIVE_ANDAMENTOS_TABLE}")
+            write_conn.execute(f"""
+                CREATE TABLE {ARCHIVE_ANDAMENTOS_TABLE} (id INTEGER PRIMARY KEY, chamado_id INTEGER NOT NULL)
+            """)
+            write_conn.commit()
+
+            # 1. Exporta um arquivo por mês, todos do mesmo instantâneo do banco
+            reporter.message(f"\nArquivando chamados finalizados antes de {cutoff}...")
+            with result.phase('exportacao'), manager.reader() as conn:
+                cursor = conn.cursor()
+                andamentos_cursor = conn.cursor()
+                column_names, query, params = _calls_select(cursor, 'Finalizado')
+                closed_at = column_names.index('data_fechamento')
+                query += f" AND {closing_date} < ?"
+                params.append(cutoff)
+                conn.execute('BEGIN')
+                try:
+                    cursor.execute(f"""
+                        SELECT substr({closing_date}, 1, 7) AS mes, COUNT(*)
+                        FROM ({query}) GROUP BY mes ORDER BY mes
+                    """, params)
+                    months = cursor.fetchall()
+
+                    def fetch_calls():
+                        # Executado na thread de leitura: os andamentos de cada bloco são
+                        # buscados ali, para a conexão de leitura ficar em uma só thread
+                        for calls in iter(lambda: cursor.fetchmany(EXPORT_FETCH_SIZE), []):
+                            yield calls, _fetch_andamentos(andamentos_cursor, calls)
+
+                    for month, expected in months:
+                        path = os.path.join(directory, f"chamados-{month}-{stamp}.xml.gz")
+                        partial = path + '.parcial'
+                        andamentos_count = 0
+                        cursor.execute(f"{query} AND substr({closing_date}, 1, 7) = ? ORDER BY id",
+                                       params + [month])
+                        with gzip.open(partial, 'wb') as f, AsyncFileWriter(f) as out, \
+                                prefetch(fetch_calls()) as chunks, \
+                                XmlStreamWriter(out, 'chamados') as writer:
+                            for calls, andamentos_by_call in chunks:
+                                for call in calls:
+                                    andamentos = andamentos_by_call.get(call[0], [])
+                                    call_elem, _ = call_element(column_names, call, andamentos)
+                                    writer.write(call_elem)
+                                    andamentos_count += len(andamentos)
+                                write_conn.executemany(
+                                    f"INSERT INTO {ARCHIVE_IDS_TABLE} (id, data_fechamento, andamentos) VALUES (?, ?, ?)",
+                                    [(call[0], call[closed_at], len(andamentos_by_call.get(call[0], [])))
+                                     for call in calls])
+                                write_conn.executemany(
+                                    f"INSERT INTO {ARCHIVE_ANDAMENTOS_TABLE} (id, chamado_id) VALUES (?, ?)",
+                                    [(andamento[0], call[0]) for call in calls
+                                     for andamento in andamentos_by_call.get(call[0], [])])
+                            written = writer.count
+                        os.replace(partial, path)
+                        partial = None
+                        files.append({'arquivo': path, 'mes': month, 'chamados': written,
+                                      'andamentos': andamentos_count, 'esperados': expected})
+                        reporter.message(f"  {os.path.basename(path)}: {written} chamados, "
+                                         f"{andamentos_count} andamentos")
+                finally:
+                    conn.rollback()
+            write_conn.commit()
+            operation_details['arquivos'] = [entry['arquivo'] for entry in files]
+
+            if not files:
+                reporter.message("\nNenhum chamado finalizado anterior à data limite.")
+                return result.finish(True)
+
+            # 2. Confere cada arquivo antes de excluir qualquer chamado
+            selected = write_conn.execute(f"SELECT COUNT(*) FROM {ARCHIVE_IDS_TABLE}").fetchone()[0]
+            for entry in files:
+                with result.phase('verificacao'):
+                    reread = _count_archived(entry['arquivo'])
+                if reread != (entry['chamados'], entry['andamentos']) or entry['chamados'] != entry['esperados']:
+                    errors.append({
+                        'type': 'Falha na Verificação',
+                        'message': f"Contagens divergentes em {entry['arquivo']}",
+                        'data': {'esperados': entry['esperados'], 'gravados': entry['chamados'],
+                                 'relidos': reread[0], 'andamentos_gravados': entry['andamentos'],
+                                 'andamentos_relidos': reread[1]},
+                        'suggestion': 'Nenhum chamado foi excluído. Verifique o disco e tente novamente'
+                    })
+            total_calls = sum(entry['chamados'] for entry in files)
+            total_andamentos = sum(entry['andamentos'] for entry in files)
+            if selected != total_calls:
+                errors.append({
+                    'type': 'Falha na Verificação',
+                    'message': f'{total_calls} chamados arquivados, mas {selected} selecionados para exclusão',
+                    'suggestion': 'Nenhum chamado foi excluído. Tente novamente'
+                })
+            if errors:
+                reporter.error_report('Arquivamento de Chamados', errors, operation_details)
+                return result.finish(False)
+            reporter.message(f"Arquivos conferidos: {total_calls} chamados, {total_andamentos} andamentos")
+
+            # 3. Exclui em transações curtas, deixando o banco livre entre elas
+            isolation_level = write_conn.isolation_level
+            write_conn.isolation_level = None
+            deleted = deleted_andamentos = expected_andamentos = 0
+            last_id = None
+            progress = reporter.progress('Excluindo chamados arquivados', total_rows=total_calls)
+            try:
+                with result.phase('exclusao'):
+                    while True:
+                        ids = [row[0] for row in write_conn.execute(
+                            f"SELECT id FROM {ARCHIVE_IDS_TABLE} WHERE id > ? ORDER BY id LIMIT ?",
+                            (last_id if last_id is not None else -1, batch_size))]
+                        if not ids:
+                            break
+                        last_id = ids[-1]
+                        marks = ', '.join('?' * len(ids))
+                        write_conn.execute('BEGIN IMMEDIATE')
+                        try:
+                            # Um chamado alterado após a exportação não é excluído: reaberto,
+                            # com outra data de fechamento ou com andamentos fora do arquivo
+                            rows = write_conn.execute(f"""
+                                SELECT c.id, a.andamentos
+                                FROM chamados c JOIN {ARCHIVE_IDS_TABLE} a ON a.id = c.id
+                                WHERE c.id IN ({marks}) AND c.status = 'Finalizado'
+                                  AND c.data_fechamento IS a.data_fechamento
+                                  AND (SELECT COUNT(*) FROM chamado_andamentos x
+                                       WHERE x.chamado_id = c.id) = a.andamentos
+                                  AND NOT EXISTS (
+                                      SELECT 1 FROM chamado_andamentos x
+                                      WHERE x.chamado_id = c.id
+                                        AND x.id NOT IN (SELECT id FROM {ARCHIVE_ANDAMENTOS_TABLE}))
+                            """, ids).fetchall()
+                            ids = [row[0] for row in rows]
+                            expected_andamentos += sum(row[1] for row in rows)
+                            marks = ', '.join('?' * len(ids))
+                            deleted_andamentos += write_conn.execute(f"""
+                                DELETE FROM chamado_andamentos WHERE id IN (
+                                    SELECT id FROM {ARCHIVE_ANDAMENTOS_TABLE} WHERE chamado_id IN ({marks}))
+                            """, ids).rowcount
+                            deleted += write_conn.execute(
+                                f"DELETE FROM chamados WHERE id IN ({marks})", ids).rowcount
+                            write_conn.execute('COMMIT')
+                        except BaseException:
+                            write_conn.execute('ROLLBACK')
+                            raise
+                        progress.update(rows=len(ids))
+                        time.sleep(ARCHIVE_BATCH_PAUSE)
+                    progress.finish()
+
+                # 4. Devolve o espaço liberado
+                with result.phase('vacuum'):
+                    freed = _incremental_vacuum(write_conn)
+            finally:
+                write_conn.isolation_level = isolation_level
+                write_conn.execute(f"DROP TABLE IF EXISTS {ARCHIVE_IDS_TABLE}")
+                write_conn.execute(f"DROP TABLE IF EXISTS {ARCHIVE_ANDAMENTOS_TABLE}")
+
+        operation_details.update({
+            'chamados_arquivados': total_calls,
+            'andamentos_arquivados': total_andamentos,
+            'chamados_excluidos': deleted,
+            'andamentos_excluidos': deleted_andamentos,
+            'chamados_reabertos': total_calls - deleted,
+            'paginas_liberadas': freed,
+        })
+        if deleted_andamentos != expected_andamentos:
+            errors.append({
+                'type': 'Divergência na Exclusão',
+                'message': f'{deleted_andamentos} andamentos excluídos, mas {expected_andamentos} '
+                           f'arquivados para os chamados excluídos',
+                'data': {'arquivos': operation_details['arquivos']},
+                'suggestion': 'Confira os arquivos gerados com o backup feito antes do arquivamento'
+            })
+            reporter.error_report('Arquivamento de Chamados', errors, operation_details)
+            return result.finish(False)
+        reporter.message(f"\nArquivamento concluído com sucesso!")
+        reporter.message(f"Chamados excluídos: {deleted} (andamentos: {deleted_andamentos})")
+        if total_calls != deleted:
+            reporter.message(f"Chamados mantidos por terem sido alterados após a exportação: {total_calls - deleted}")
+        if freed is None:
+            reporter.message("O banco não usa auto_vacuum incremental: o espaço fica livre para novos "
+                             "dados, mas o arquivo não diminui. Para ativar (uma única vez, com o "
+                             "HelpHub fechado): PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+        else:
+            reporter.message(f"Páginas devolvidas ao sistema: {freed}")
+        reporter.message(f"Arquivos salvos em: {directory}")
+        return result.finish(True)
+
+    except (sqlite3.Error, OSError, ET.ParseError) as e:
+        if partial and os.path.exists(partial):
+            os.remove(partial)
+        errors.append({
+            'type': 'Erro de Arquivamento',
+            'message': str(e),
+            'data': {'arquivos_gravados': [entry['arquivo'] for entry in files]},
+            'suggestion': 'Os chamados ainda não excluídos permanecem no banco; '
+                          'verifique o espaço em disco e tente novamente'
+        })
+        reporter.error_report('Arquivamento de Chamados', errors, operation_details)
+        return result.finish(False)
+
+# Tabela de destino e campo obrigatório de cada tipo de registro validado
+VALIDATION_TARGETS = {
+    'cliente': ('clientes', 'nome'),
+    'client': ('clientes', 'nome'),
+    'chamado': ('chamados', 'descricao'),
+    'call': ('chamados', 'descricao'),
+}
+# Exemplos guardados por problema no relatório de validação
+VALIDATION_SAMPLES = 5
+
+def _is_date(value):
+    """Indica se o texto é uma data/hora ISO (ex: 2024-05-13 10:00:00)."""
+    from datetime import datetime
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def _check_fields(fields, schema, issues, record_ref, required=(), prefix=''):
+    """
+    Confere os campos de um registro contra as colunas da tabela.
+
+    Args:
+        fields (dict): Campo → texto lido do XML
+        schema (dict): Coluna → (tipo declarado, NOT NULL, tem default)
+        issues (dict): Acumulador (gravidade, problema, campo) → [contagem, exemplos]
+        record_ref (str): Identificação do registro nos exemplos
+        required (tuple): Campos exigidos pelo importador além dos NOT NULL
+        prefix (str): Prefixo dos nomes de campo no relatório
+    """
+    def add(severity, problem, field):
+        entry = issues.setdefault((severity, problem, prefix + field), [0, []])
+        entry[0] += 1
+        if len(entry[1]) < VALIDATION_SAMPLES:
+            entry[1].append(record_ref)
+
+    for field, value in fields.items():
+        if field not in schema:
+            add('aviso', 'coluna desconhecida (será ignorada)', field)
+            continue
+        if not value:
+            continue
+        declared = schema[field][0].upper()
+        if 'INT' in declared:
+            try:
+                int(value)
+            except ValueError:
+                add('erro', 'valor não inteiro', field)
+        elif field.startswith('data') and not _is_date(value):
+            add('erro', 'data inválida', field)
+
+    for column, (_, notnull, has_default) in schema.items():
+        if column == 'id' or not (notnull and not has_default or column in required):
+            continue
+        if not fields.get(column):
+            add('erro', 'campo obrigatório ausente', column)
+
+def validate_xml_file(xml_file, reporter=None):
+    """
+    Valida um arquivo XML de clientes ou chamados sem gravar no banco.
+
+    Lê o arquivo inteiro em fluxo e confere cada registro com o esquema atual
+    (PRAGMA table_info): campos obrigatórios, colunas desconhecidas, inteiros
+    e datas, incluindo os andamentos dos chamados. Exibe os problemas
+    agrupados, com exemplos, e a taxa de leitura.
+
+    Args:
+        xml_file (str): Caminho do arquivo XML
+        reporter (ConsoleReporter, optional): Destino das mensagens, do progresso e dos erros
+
+    Returns:
+        OperationResult: Verdadeiro se nenhum erro foi encontrado (avisos não
+            reprovam o arquivo); os problemas agrupados ficam em details['problemas']
+    """
+    reporter = reporter or CONSOLE
+    errors = []
+    operation_details = {'arquivo_origem': xml_file}
+    result = OperationResult('Validação de XML', operation_details, errors)
+
+    valid_xml, xml_error = test_xml_file(xml_file, ('clients', 'clientes', 'calls', 'chamados'),
+                                         tuple(VALIDATION_TARGETS))
+    if not valid_xml:
+        errors.append({
+            'type': 'Erro de XML',
+            'message': xml_error,
+            'suggestion': 'Use <clientes>/<cliente> ou <chamados>/<chamado>'
         })
+        reporter.error_report('Validação de XML', errors, operation_details)
+        return result.finish(False)
 
-        if errors:
-            show_error_report('Importação de Chamados', errors, operation_details)
-            # Retornamos True se pelo menos um chamado foi importado com sucesso
-            return imported_count > 0
-            
-        print(f"\nImportação concluída com sucesso!")
-        print(f"Chamados importados: {imported_count}")
-        print(f"Andamentos importados: {andamentos_count}")
-        if skipped_count > 0:
-            print(f"Chamados ignorados devido a erros: {skipped_count}")
-        
-        return imported_count > 0
-            
-    except Exception as e:
+    try:
+        schemas = {}
+        with get_connection_manager().reader() as conn:
+            for table in ('clientes', 'chamados', 'chamado_andamentos'):
+                rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+                schemas[table] = {row[1]: (row[2], bool(row[3]), row[4] is not None) for row in rows}
+    except sqlite3.Error as e:
         errors.append({
-            'type': 'Erro Inesperado',
+            'type': 'Erro de Banco de Dados',
             'message': str(e),
-            'data': {'traceback': traceback.format_exc()},
-            'suggestion': 'Entre em contato com o suporte técnico'
+            'suggestion': 'Verifique a conexão com o banco de dados'
         })
-        show_error_report('Importação de Chamados', errors, operation_details)
-        return False
+        reporter.error_report('Validação de XML', errors, operation_details)
+        return result.finish(False)
+
+    # O chamado_id dos andamentos é definido na importação
+    andamento_schema = {column: info for column, info in schemas['chamado_andamentos'].items()
+                        if column != 'chamado_id'}
+    issues = {}
+    records = 0
+    tables = set()
+
+    def record_fields(elem, compact):
+        return {field: (value or '').strip() for field, value in _record_fields(elem, compact).items()
+                if field not in ('andamentos', 'chamados')}
+
+    def check_andamentos(call_elem, record_ref, prefix, compact):
+        for andamento in _andamento_elements(call_elem, compact):
+            _check_fields(record_fields(andamento, compact), andamento_schema, issues, record_ref,
+                          ('data_hora', 'texto'), prefix)
 
-def export_calls(output_file, status=None):
-    """Exporta chamados para um arquivo XML, com filtragem opcional por status."""
+    reporter.message(f"\nValidando {xml_file}...")
+    progress = reporter.progress('Validando registros', total_bytes=_input_size(xml_file))
     try:
-        # Validar e ajustar o caminho do arquivo
-        if not output_file or output_file.strip() in ['c:/', 'c:', '/', '\\']:
-            print("\nErro: Caminho inválido!")
-            print("Por favor, especifique um caminho completo incluindo o nome do arquivo.")
-            print("Exemplo: c:/HelpHub/export/chamados/chamados.xml")
-            return False
-            
-        if not output_file.lower().endswith('.xml'):
-            output_file += '.xml'
+        root_attrib = {}
+        for elem in iter_xml_records(xml_file, ('clients', 'clientes', 'calls', 'chamados'),
+                                     tuple(VALIDATION_TARGETS), progress, root_attrib=root_attrib):
+            records += 1
+            compact = root_attrib.get('versao') == XML_COMPACT_VERSION
+            table, required = VALIDATION_TARGETS[elem.tag]
+            tables.add(table)
+            fields = record_fields(elem, compact)
+            record_ref = f"#{records} (id {fields.get('id') or '?'})"
 
-        # Criar diretórios e verificar permissões
-        try:
-            dir_path = os.path.dirname(output_file)
-            if dir_path:
-                os.makedirs(dir_path, exist_ok=True)
-                
-            with open(output_file, 'w', encoding='utf-8') as test_file:
-                pass
-        except Exception as e:
-            print(f"\nErro ao preparar o arquivo: {e}")
-            return False
+            _check_fields(fields, schemas[table], issues, record_ref, (required,))
 
-        # Conexão com o banco
-        conn = get_db_connection()
-        cursor = conn.cursor()
+            if table == 'chamados':
+                check_andamentos(elem, record_ref, 'andamento.', compact)
+            else:
+                # Chamados aninhados no cliente (formato de export_nested)
+                for call in _nested_call_elements(elem, compact):
+                    _check_fields(record_fields(call, compact), schemas['chamados'], issues, record_ref,
+                                  ('descricao',), 'chamado.')
+                    check_andamentos(call, record_ref, 'chamado.andamento.', compact)
+        progress.finish()
+    except ET.ParseError as e:
+        progress.finish()
+        errors.append({
+            'type': 'Erro de XML',
+            'message': f'Erro ao analisar o arquivo após {records} registro(s): {str(e)}',
+            'suggestion': 'Verifique se o arquivo XML está bem formatado'
+        })
+        reporter.error_report('Validação de XML', errors, operation_details)
+        return result.finish(False)
 
-        # Verifica a estrutura da tabela chamados
-        cursor.execute("PRAGMA table_info(chamados)")
-        table_info = cursor.fetchall()
-        column_names = [col[1] for col in table_info]
-        
-        # Constrói a query dinamicamente
-        query = f"SELECT {', '.join(column_names)} FROM chamados"
-        
-        # Adiciona filtro de status se especificado
-        if status:
-            query += " WHERE status = ?"
-            cursor.execute(query, (status,))
-        else:
-            cursor.execute(query)
+    elapsed = max(time.perf_counter() - progress.started, 1e-9)
+    error_count = sum(count for (severity, _, _), (count, _) in issues.items() if severity == 'erro')
+    warning_count = sum(count for (severity, _, _), (count, _) in issues.items() if severity == 'aviso')
+    operation_details.update({
+        'registros_lidos': records,
+        'erros': error_count,
+        'avisos': warning_count,
+        'problemas': [{'gravidade': severity, 'campo': field, 'problema': problem,
+                       'ocorrencias': count, 'exemplos': samples}
+                      for (severity, problem, field), (count, samples) in sorted(issues.items())]
+    })
 
-        calls = cursor.fetchall()
+    reporter.message("\nResultado da validação")
+    reporter.message("─" * 62)
+    reporter.message(f"Tabela de destino: {', '.join(sorted(tables))}")
+    reporter.message(f"Registros lidos: {records}")
+    reporter.message(f"Tempo: {elapsed:.2f} s ({records / elapsed:,.0f} registros/s, "
+          f"{progress.position / elapsed / (1024 * 1024):.1f} MB/s)")
+    reporter.message(f"Erros: {error_count} | Avisos: {warning_count}")
 
-        # Cria a estrutura do XML (usando tags em português)
-        root = ET.Element('chamados')
-        
-        total = 0
-        for call in calls:
-            call_elem = ET.SubElement(root, 'chamado')
-            
-            # Adiciona todos os campos do chamado
-            for field_idx, field in enumerate(column_names):
-                sub = ET.SubElement(call_elem, field)
-                sub.text = str(call[field_idx]) if call[field_idx] is not None else ''
-
-            # Busca e adiciona os andamentos do chamado
-            cursor.execute("""
-                SELECT id, data_hora, texto
-                FROM chamado_andamentos
-                WHERE chamado_id = ?
-                ORDER BY data_hora
-            """, (call[0],))
-            
-            andamentos = cursor.fetchall()
-            andamentos_elem = ET.SubElement(call_elem, 'andamentos')
-            
-            for andamento in andamentos:
-                andamento_elem = ET.SubElement(andamentos_elem, 'andamento')
-                andamento_fields = ['id', 'data_hora', 'texto']
-                
-                for field_idx, field in enumerate(andamento_fields):
-                    sub = ET.SubElement(andamento_elem, field)
-                    sub.text = str(andamento[field_idx]) if andamento[field_idx] is not None else ''
-            
-            total += 1
+    for (severity, problem, field), (count, samples) in sorted(issues.items()):
+        reporter.message(f"\n  [{severity}] {field}: {problem} — {count} ocorrência(s)")
+        reporter.message(f"    exemplos: {', '.join(samples)}")
 
-        # Salva o XML
-        tree = ET.ElementTree(root)
-        tree.write(output_file, encoding='utf-8', xml_declaration=True)
-        
-        conn.close()
-        print(f"\nExportação de chamados concluída com sucesso!")
-        print(f"Total de chamados exportados: {total}")
-        print(f"Arquivo salvo em: {output_file}")
-        return True
-        
-    except Exception as e:
-        print(f"\nErro durante a exportação de chamados: {e}")
-        return False
+    if error_count:
+        reporter.message("\nArquivo reprovado: corrija os erros antes de importar.")
+    else:
+        reporter.message("\nArquivo aprovado para importação.")
+    return result.finish(error_count == 0)
+
+# Registros do XML comparados com o banco por consulta (limite de parâmetros do SQLite)
+DIFF_BATCH_SIZE = 500
+DIFF_SAMPLES = 5
+
+def diff_xml_file(xml_file, key='id', delta_file=None, reporter=None):
+    """
+    Compara um XML de clientes ou chamados com o banco, sem importar.
+
+    O arquivo é lido em fluxo e cada lote de registros é buscado no banco pela
+    coluna `key` (hash join com a tabela); as chaves vistas vão para um
+    DedupIndex, que transborda para disco acima de MEMORY_BUDGET. Em seguida a
+    tabela é percorrida uma vez para contar as linhas ausentes do arquivo.
+    Tudo é lido no mesmo instantâneo do banco, e a memória usada não depende
+    do tamanho do arquivo nem da tabela.
+
+    Só as colunas presentes no registro são comparadas; nos chamados, também
+    os andamentos (data_hora e texto, na ordem do banco). Os valores do arquivo
+    são normalizados como na importação (sem espaços nas pontas), então um
+    registro que seria importado igual ao do banco conta como igual.
+
+    Args:
+        xml_file (str): Caminho do arquivo XML ("-" para a entrada padrão)
+        key (str): Coluna que identifica o registro nos dois lados
+        delta_file (str, optional): XML com apenas as diferenças, cada registro
+            com o atributo diferenca="novo", "alterado" (e campos) ou "ausente"
+        reporter (ConsoleReporter, optional): Destino das mensagens, do progresso e dos erros
 
-def import_calls(xml_file):
-    """Importa chamados de um arquivo XML para o banco de dados."""
+    Returns:
+        OperationResult: Verdadeiro se a comparação foi concluída; as contagens
+            ficam em details
+    """
+    reporter = reporter or CONSOLE
     errors = []
-    operation_details = {'arquivo_origem': xml_file}
-    imported_count = 0
-    skipped_count = 0
-    andamentos_count = 0
-    
-    try:
-        # Verifica permissões
-        success, error = verify_xml_path(xml_file, 'r')
+    operation_details = {'arquivo_origem': xml_file, 'chave': key}
+    if delta_file:
+        operation_details['arquivo_diferencas'] = delta_file
+    result = OperationResult('Comparação com o Banco', operation_details, errors)
+
+    if delta_file:
+        success, error = verify_xml_path(delta_file, 'w')
         if not success:
             errors.append({
                 'type': 'Erro de Permissão',
                 'message': error,
-                'suggestion': 'Verifique se o arquivo existe e você tem permissões de leitura'
+                'suggestion': 'Verifique se você tem permissões de escrita no diretório'
             })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
+            reporter.error_report('Comparação com o Banco', errors, operation_details)
+            return result.finish(False)
+        if delta_file != STDIO_PATH and not delta_file.lower().endswith('.xml'):
+            delta_file += '.xml'
 
-        # Parse XML com tratamento de erros
-        try:
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            
-            # Verifica se a tag raiz é suportada
-            if root.tag not in ['calls', 'chamados']:
+    counts = {'novos': 0, 'alterados': 0, 'iguais': 0, 'ausentes': 0,
+              'sem_chave': 0, 'chaves_repetidas': 0, 'ignorados': 0}
+    changed_fields = {}
+    samples = {'novos': [], 'alterados': [], 'ausentes': [], 'chaves_repetidas': []}
+    index = DedupIndex(MEMORY_BUDGET)
+    records = 0
+
+    def sample(kind, text):
+        if len(samples[kind]) < DIFF_SAMPLES:
+            samples[kind].append(text)
+
+    progress = reporter.progress('Comparando registros', total_bytes=_input_size(xml_file))
+    try:
+        with get_connection_manager().reader() as conn:
+            cursor = conn.cursor()
+            andamentos_cursor = conn.cursor()
+            root_attrib = {}
+            elems = iter_xml_records(xml_file, ('clients', 'clientes', 'calls', 'chamados'),
+                                     tuple(VALIDATION_TARGETS), progress, root_attrib=root_attrib)
+
+            # O primeiro registro define a tabela comparada
+            first = next(elems, None)
+            if first is None:
+                progress.finish()
                 errors.append({
-                    'type': 'Formato Inválido',
-                    'message': f'A tag raiz do XML ({root.tag}) não é suportada',
-                    'suggestion': 'O arquivo deve usar <calls> ou <chamados> como tag raiz'
+                    'type': 'Dados Vazios',
+                    'message': 'Nenhum registro encontrado no XML',
+                    'suggestion': 'Use <clientes>/<cliente> ou <chamados>/<chamado>'
                 })
-                show_error_report('Importação de Chamados', errors, operation_details)
-                return False
-                
-        except ET.ParseError as e:
-            errors.append({
-                'type': 'Erro de XML',
-                'message': f'Erro ao analisar o arquivo: {str(e)}',
-                'suggestion': 'Verifique se o arquivo XML está bem formatado'
-            })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
-            
-        # Verifica se há elementos <call> ou <chamado> no arquivo
-        call_elements = root.findall('call') or root.findall('chamado')
-        
-        if len(call_elements) == 0:
-            errors.append({
-                'type': 'Arquivo Inválido',
-                'message': 'Não foram encontrados chamados no arquivo XML',
-                'suggestion': 'Verifique se o arquivo XML está no formato correto com tags <call> ou <chamado>'
-            })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
-            
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Verifica a estrutura da tabela chamados
-            cursor.execute("PRAGMA table_info(chamados)")
-            table_info = cursor.fetchall()
-            valid_columns = [col[1] for col in table_info]
-            
-            print(f"\nProcessando importação de chamados...")
-            
-            for call_elem in call_elements:
-                try:
-                    # Coleta todos os campos disponíveis no XML
-                    call_data = {}
-                    for field in valid_columns:
-                        elem = call_elem.find(field)
-                        if elem is not None and elem.text:
-                            call_data[field] = elem.text.strip()
+                reporter.error_report('Comparação com o Banco', errors, operation_details)
+                return result.finish(False)
+            table = VALIDATION_TARGETS[first.tag][0]
+            compact = root_attrib.get('versao') == XML_COMPACT_VERSION
+            operation_details['tabela'] = table
+
+            if table == 'clientes':
+                column_names, query, _ = _clients_select(cursor)
+            else:
+                column_names, query, _ = _calls_select(cursor)
+            if key not in column_names:
+                progress.finish()
+                errors.append({
+                    'type': 'Chave Inválida',
+                    'message': f"Coluna desconhecida na chave: {key}",
+                    'suggestion': f"Colunas disponíveis: {', '.join(column_names)}"
+                })
+                reporter.error_report('Comparação com o Banco', errors, operation_details)
+                return result.finish(False)
+            position = {column: i for i, column in enumerate(column_names)}
+            key_index = position[key]
+            lookup = f"{query} WHERE {key} IN ({{}})"
+            # O plano é obtido com um IN do tamanho dos lotes comparados
+            probe = lookup.format(', '.join('?' * DIFF_BATCH_SIZE))
+            if _plan_needs_index(_query_plan(cursor, probe, [None] * DIFF_BATCH_SIZE), table):
+                reporter.message(f"Aviso: a coluna {key} não tem índice; cada lote percorre "
+                                 f"a tabela {table} inteira (crie um índice em {table}({key})).")
+
+            def compare(batch):
+                keys = list({fields[key] for _, fields in batch})
+                cursor.execute(lookup.format(', '.join('?' * len(keys))), keys)
+                rows = {}
+                for row in cursor.fetchall():
+                    rows.setdefault(_xml_text(row[key_index]), row)
+                andamentos_by_call = (_fetch_andamentos(andamentos_cursor, list(rows.values()))
+                                      if table == 'chamados' else {})
+
+                for elem, fields in batch:
+                    ref = fields[key]
+                    row = rows.get(ref)
+                    owner = index.check_and_add(ref.encode('utf-8'), (None, str(records)))
+                    if owner is not None:
+                        counts['chaves_repetidas'] += 1
+                        sample('chaves_repetidas', ref)
+                        continue
+                    if row is None:
+                        counts['novos'] += 1
+                        sample('novos', ref)
+                        elem.set('diferenca', 'novo')
+                        yield elem
+                        continue
+
+                    diff = [field for field, value in fields.items()
+                            if (value or '') != _xml_text(row[position[field]])]
+                    if table == 'chamados':
+                        # Os mesmos andamentos que a importação gravaria
+                        theirs = _andamento_values(elem, compact)
+                        ours = [(_xml_text(a[1]), _xml_text(a[2]))
+                                for a in andamentos_by_call.get(row[0], [])]
+                        if theirs != ours:
+                            diff.append('andamentos')
+                    if not diff:
+                        counts['iguais'] += 1
+                        continue
+                    counts['alterados'] += 1
+                    sample('alterados', ref)
+                    for field in diff:
+                        changed_fields[field] = changed_fields.get(field, 0) + 1
+                    elem.set('diferenca', 'alterado')
+                    elem.set('campos', ','.join(diff))
+                    yield elem
+
+            def missing():
+                # Linhas do banco cuja chave não apareceu no arquivo
+                cursor.execute(query)
+                for rows in iter(lambda: cursor.fetchmany(EXPORT_FETCH_SIZE), []):
+                    absent = [row for row in rows
+                              if _xml_text(row[key_index]).encode('utf-8') not in index]
+                    if not absent:
+                        continue
+                    counts['ausentes'] += len(absent)
+                    for row in absent[:DIFF_SAMPLES - len(samples['ausentes'])]:
+                        sample('ausentes', _xml_text(row[key_index]))
+                    if not delta_file:
+                        continue
+                    if table == 'chamados':
+                        andamentos_by_call = _fetch_andamentos(andamentos_cursor, absent)
+                    for row in absent:
+                        if table == 'chamados':
+                            elem, _ = call_element(column_names, row, andamentos_by_call.get(row[0], []),
+                                                   compact=compact)
                         else:
-                            call_data[field] = None
-                    
-                    # Guardamos o ID original para mapear os andamentos
-                    original_id = call_elem.find('id')
-                    original_id = original_id.text if original_id is not None and original_id.text else None
-                    
-                    # Precisamos verificar se temos ao menos os campos essenciais
-                    if not call_data.get('descricao'):
-                        errors.append({
-                            'type': 'Dados Inválidos',
-                            'message': 'Chamado sem descrição encontrado no XML',
-                            'suggestion': 'Todos os chamados devem ter uma descrição'
-                        })
-                        skipped_count += 1
+                            elem, _ = client_element(column_names, row, compact=compact)
+                        elem.set('diferenca', 'ausente')
+                        yield elem
+
+            def file_records():
+                yield first
+                yield from elems
+
+            def differences():
+                nonlocal records
+                batch = []
+                for elem in file_records():
+                    records += 1
+                    if VALIDATION_TARGETS[elem.tag][0] != table:
+                        counts['ignorados'] += 1
                         continue
-                        
-                    # Prepara e executa a query de inserção
-                    insert_columns = []
-                    values = []
-                    placeholders = []
-                    
-                    for field, value in call_data.items():
-                        if field != 'id':  # Não inserimos o ID, deixamos o banco gerar
-                            insert_columns.append(field)
-                            values.append(value)
-                            placeholders.append('?')
-                    
-                    # Imprime informações de importação
-                    descr_preview = call_data.get('descricao', '')[:30]
-                    if len(call_data.get('descricao', '')) > 30:
-                        descr_preview += "..."
-                    print(f"Importando chamado: {descr_preview}")
-                    
-                    query = f"""
-                        INSERT INTO chamados ({', '.join(insert_columns)})
-                        VALUES ({', '.join(placeholders)})
-                    """
-                    
-                    cursor.execute(query, values)
-                    new_call_id = cursor.lastrowid
-                    
-                    # Importa os andamentos, se existirem
-                    andamentos_elem = call_elem.find('andamentos')
-                    if andamentos_elem is not None:
-                        for andamento_elem in andamentos_elem.findall('andamento'):
-                            try:
-                                data_hora = andamento_elem.find('data_hora')
-                                texto = andamento_elem.find('texto')
-                                
-                                if data_hora is not None and data_hora.text and texto is not None and texto.text:
-                                    # Insere o andamento com o ID do novo chamado
-                                    cursor.execute("""
-                                        INSERT INTO chamado_andamentos (chamado_id, data_hora, texto)
-                                        VALUES (?, ?, ?)
-                                    """, (new_call_id, data_hora.text, texto.text))
-                                    andamentos_count += 1
-                            except sqlite3.Error as e:
-                                errors.append({
-                                    'type': 'Erro de Importação',
-                                    'message': f'Erro ao importar andamento: {str(e)}',
-                                    'suggestion': 'Verifique os dados do andamento'
-                                })
-                    
-                    imported_count += 1
-                    
-                except sqlite3.Error as e:
-                    errors.append({
-                        'type': 'Erro de Importação',
-                        'message': f'Erro ao importar chamado: {str(e)}',
-                        'data': {'descrição': call_data.get('descricao', '')[:50]},
-                        'suggestion': 'Verifique se os dados do chamado são válidos'
-                    })
-                    skipped_count += 1
-            
-            # Confirma as alterações
-            conn.commit()
-            
-        except sqlite3.Error as e:
-            errors.append({
-                'type': 'Erro de Banco de Dados',
-                'message': str(e),
-                'suggestion': 'Verifique a conexão com o banco de dados'
-            })
-            show_error_report('Importação de Chamados', errors, operation_details)
-            return False
-        finally:
-            if 'conn' in locals() and conn:
-                conn.close()
-                
-        # Atualiza detalhes da operação
-        operation_details.update({
-            'total_processado': imported_count + skipped_count,
-            'importados': imported_count,
-            'andamentos_importados': andamentos_count,
-            'ignorados': skipped_count
+                    # Valores normalizados como na importação (ver _client_data)
+                    fields = {field: value.strip() if value else None
+                              for field, value in _record_fields(elem, compact).items()
+                              if field in position}
+                    if not fields.get(key):
+                        counts['sem_chave'] += 1
+                        continue
+                    batch.append((elem, fields))
+                    if len(batch) >= DIFF_BATCH_SIZE:
+                        yield from compare(batch)
+                        batch = []
+                if batch:
+                    yield from compare(batch)
+                progress.finish()
+                yield from missing()
+
+            # Arquivo e tabela são comparados no mesmo instantâneo do banco
+            conn.execute('BEGIN')
+            try:
+                if delta_file:
+                    with open_output(delta_file) as f, AsyncFileWriter(f) as out, \
+                            XmlStreamWriter(out, table, compact=compact) as writer:
+                        for elem in differences():
+                            writer.write(elem)
+                else:
+                    for _ in differences():
+                        pass
+            finally:
+                conn.rollback()
+
+    except (ValueError, ET.ParseError) as e:
+        if not progress.finished:
+            progress.finish()
+        errors.append({
+            'type': 'Erro de XML',
+            'message': f'Erro ao analisar o arquivo após {records} registro(s): {str(e)}',
+            'suggestion': 'Verifique se o arquivo XML está bem formatado'
+        })
+        reporter.error_report('Comparação com o Banco', errors, operation_details)
+        return result.finish(False)
+    except OSError as e:
+        errors.append({
+            'type': 'Erro de Escrita',
+            'message': f"Falha ao salvar arquivo: {str(e)}",
+            'suggestion': 'Verifique permissões e espaço em disco'
         })
+        reporter.error_report('Comparação com o Banco', errors, operation_details)
+        return result.finish(False)
+    except sqlite3.Error as e:
+        errors.append({
+            'type': 'Erro de Banco de Dados',
+            'message': str(e),
+            'suggestion': 'Verifique a conexão com o banco de dados'
+        })
+        reporter.error_report('Comparação com o Banco', errors, operation_details)
+        return result.finish(False)
+    finally:
+        index.close()
 
-        if errors:
-            show_error_report('Importação de Chamados', errors, operation_details)
-            # Retornamos True se pelo menos um chamado foi importado com sucesso
-            return imported_count > 0
-            
-        print(f"\nImportação concluída com sucesso!")
-        print(f"Chamados importados: {imported_count}")
-        print(f"Andamentos importados: {andamentos_count}")
-        if skipped_count > 0:
-            print(f"Chamados ignorados devido a erros: {skipped_count}")
-        
-        return imported_count > 0
-            
-    except Exception as e:
+    operation_details.update({
+        'registros_lidos': records,
+        **counts,
+        'campos_alterados': changed_fields,
+        'exemplos': {kind: refs for kind, refs in samples.items() if refs},
+        'chaves_em_disco': index.spilled,
+    })
+
+    reporter.message("\nResultado da comparação")
+    reporter.message("─" * 62)
+    reporter.message(f"Tabela: {table} (chave: {key})")
+    reporter.message(f"Registros lidos: {records}")
+    reporter.message(f"Novos: {counts['novos']} | Alterados: {counts['alterados']} | "
+                     f"Iguais: {counts['iguais']} | Ausentes do arquivo: {counts['ausentes']}")
+    if changed_fields:
+        reporter.message("Campos alterados: " + ', '.join(
+            f"{field} ({count})" for field, count in sorted(changed_fields.items(), key=lambda item: -item[1])))
+    if counts['chaves_repetidas']:
+        reporter.message(f"Chaves repetidas no arquivo (ignoradas): {counts['chaves_repetidas']}")
+    if counts['sem_chave']:
+        reporter.message(f"Registros sem {key} (ignorados): {counts['sem_chave']}")
+    if counts['ignorados']:
+        reporter.message(f"Registros de outra tabela (ignorados): {counts['ignorados']}")
+    for kind in ('novos', 'alterados', 'ausentes', 'chaves_repetidas'):
+        if samples[kind]:
+            reporter.message(f"  exemplos de {kind.replace('_', ' ')}: {', '.join(samples[kind])}")
+    if index.spilled:
+        reporter.message(f"Chaves transferidas para o índice em disco: {index.spilled}")
+    if delta_file:
+        reporter.message(f"Diferenças salvas em: {delta_file}" if delta_file != STDIO_PATH
+                         else "Diferenças enviadas para a saída padrão")
+    return result.finish(True)
+
+# Consultas executadas pelos exportadores e os índices que as atendem.
+# 'amostra' gera os parâmetros usados para medir o tempo de cada consulta
+# (None: a consulta não tem parâmetros e é executada uma vez); com 'lote', o
+# IN recebe esse número de parâmetros, como na exportação, e a amostra é
+# dividida em lotes desse tamanho. 'sql' pode ser uma função do cursor quando
+# a consulta depende das colunas da tabela.
+EXPORT_QUERIES = [
+    {
+        'descricao': 'Chamados filtrados por status (export_calls)',
+        'sql': 'SELECT * FROM chamados WHERE status = ?',
+        'amostra': 'SELECT DISTINCT status FROM chamados',
+        'indice': ('idx_chamados_status', 'chamados', ('status',)),
+    },
+    {
+        'descricao': 'Andamentos de um bloco de chamados por data (export_calls)',
+        'sql': 'SELECT chamado_id, id, data_hora, texto FROM chamado_andamentos WHERE chamado_id IN ({}) ORDER BY chamado_id, data_hora, id',
+        'amostra': f'SELECT id FROM chamados LIMIT {ANDAMENTOS_IN_SIZE * 10}',
+        'lote': ANDAMENTOS_IN_SIZE,
+        'indice': ('idx_chamado_andamentos_chamado_data', 'chamado_andamentos', ('chamado_id', 'data_hora')),
+    },
+    {
+        'descricao': 'Chamados ordenados por cliente (export_nested)',
+        'sql': lambda cursor: _nested_queries(_calls_select(cursor)[1])[0],
+        'amostra': None,
+        'lote': 0,
+        'indice': ('idx_chamados_cliente', 'chamados', ('cliente_id',)),
+    },
+]
+
+def _query_plan(cursor, sql, params):
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN de uma consulta."""
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row[3] for row in cursor.fetchall()]
+
+def _export_query_sql(cursor, query):
+    """SQL de uma consulta de EXPORT_QUERIES, com o IN do tamanho usado na exportação."""
+    sql = query['sql'](cursor) if callable(query['sql']) else query['sql']
+    return sql.format(', '.join('?' * query.get('lote', 1)))
+
+def _plan_needs_index(plan, table):
+    """
+    Indica se o plano faz varredura completa da tabela ou ordenação temporária,
+    inclusive parcial ('USE TEMP B-TREE FOR RIGHT PART OF ORDER BY').
+    """
+    for detail in plan:
+        if detail.startswith(f'SCAN {table}') and 'INDEX' not in detail:
+            return True
+        if detail.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detail:
+            return True
+    return False
+
+def _has_index_prefix(cursor, table, columns):
+    """Verifica se já existe um índice cujas primeiras colunas são `columns`."""
+    cursor.execute(f"PRAGMA index_list({table})")
+    for index in cursor.fetchall():
+        cursor.execute(f"PRAGMA index_info({index[1]})")
+        indexed = [col[2] for col in sorted(cursor.fetchall())]
+        if tuple(indexed[:len(columns)]) == tuple(columns):
+            return True
+    return False
+
+def _time_query(cursor, query):
+    """Mede o tempo total da consulta para cada parâmetro (ou lote) da amostra."""
+    size = query.get('lote', 1)
+    sql = _export_query_sql(cursor, query)
+    if query['amostra'] is None:
+        batches = [[]]
+    else:
+        cursor.execute(query['amostra'])
+        values = [row[0] for row in cursor.fetchall()]
+        batches = [values[start:start + size] for start in range(0, len(values), size)]
+    started = time.perf_counter()
+    for params in batches:
+        cursor.execute(sql, params + [None] * (size - len(params)))
+        cursor.fetchall()
+    return time.perf_counter() - started, len(batches)
+
+def analyze_indexes(create=None):
+    """
+    Analisa os planos de execução das consultas dos exportadores e sugere índices.
+
+    Args:
+        create (bool, optional): True cria os índices sugeridos sem perguntar,
+            False apenas reporta. None pergunta ao usuário quando interativo.
+
+    Returns:
+        bool: True se a análise foi concluída
+    """
+    errors = []
+    operation_details = {'database': DATABASE}
+
+    try:
+        manager = get_connection_manager()
+        missing = []
+        timings_before = {}
+
+        with manager.reader() as conn:
+            cursor = conn.cursor()
+            print("\nAnálise de índices das consultas de exportação")
+            print("─" * 62)
+
+            for query in EXPORT_QUERIES:
+                name, table, columns = query['indice']
+                plan = _query_plan(cursor, _export_query_sql(cursor, query), [None] * query.get('lote', 1))
+                elapsed, samples = _time_query(cursor, query)
+                timings_before[name] = elapsed
+
+                print(f"\n{query['descricao']}")
+                for detail in plan:
+                    print(f"  plano: {detail}")
+                print(f"  tempo: {elapsed * 1000:.1f} ms ({samples} execuções)")
+
+                if _plan_needs_index(plan, table) and not _has_index_prefix(cursor, table, columns):
+                    missing.append(query['indice'])
+                    print(f"  ÍNDICE AUSENTE: {table}({', '.join(columns)})")
+                else:
+                    print("  índice adequado encontrado")
+
+        if not missing:
+            print("\nNenhum índice ausente. O banco já atende às consultas de exportação.")
+            return True
+
+        if create is None:
+            if sys.stdin.isatty():
+                answer = input(f"\nCriar {len(missing)} índice(s) sugerido(s) e executar ANALYZE? (s/N): ")
+                create = answer.strip().lower() in ('s', 'sim', 'y', 'yes')
+            else:
+                create = False
+
+        if not create:
+            print("\nÍndices sugeridos (não criados):")
+            for name, table, columns in missing:
+                print(f"  CREATE INDEX {name} ON {table}({', '.join(columns)});")
+            return True
+
+        with manager.writer() as conn:
+            for name, table, columns in missing:
+                print(f"\nCriando índice {name}...")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})")
+            conn.commit()
+            print("Executando ANALYZE...")
+            conn.execute("ANALYZE")
+            conn.commit()
+
+        # Mede novamente após a criação dos índices
+        print("\nComparativo de tempos (antes → depois):")
+        with manager.reader() as conn:
+            cursor = conn.cursor()
+            for query in EXPORT_QUERIES:
+                name = query['indice'][0]
+                elapsed, _ = _time_query(cursor, query)
+                before = timings_before[name]
+                print(f"  {query['descricao']}: {before * 1000:.1f} ms → {elapsed * 1000:.1f} ms")
+        return True
+
+    except sqlite3.Error as e:
         errors.append({
-            'type': 'Erro Inesperado',
+            'type': 'Erro de Banco de Dados',
             'message': str(e),
-            'data': {'traceback': traceback.format_exc()},
-            'suggestion': 'Entre em contato com o suporte técnico'
+            'suggestion': 'Verifique a conexão com o banco de dados'
         })
-        show_error_report('Importação de Chamados', errors, operation_details)
+        show_error_report('Análise de Índices', errors, operation_details)
+        return False
+
+def _history_rate(row):
+    """Vazão de uma execução: registros/s ou, sem contagem, bytes/s."""
+    duration, rows, size = row
+    if not duration:
+        return None
+    if rows:
+        return rows / duration
+    if size:
+        return size / duration
+    return None
+
+def show_history(operation=None, runs=10):
+    """
+    Exibe o histórico de execuções por operação: as últimas `runs` execuções
+    com a vazão de cada uma, comparada à mediana das HISTORY_BASELINE_RUNS
+    execuções bem-sucedidas anteriores (quedas acima de HISTORY_REGRESSION
+    são sinalizadas), a tendência dos últimos HISTORY_TREND_DAYS dias contra
+    o período anterior e o tempo por fase da execução mais recente.
+
+    Args:
+        operation (str, optional): Trecho do nome da operação (ex: "chamados")
+        runs (int): Execuções exibidas por operação
+
+    Returns:
+        bool: True se o relatório foi exibido
+    """
+    import json
+    import statistics
+    from datetime import datetime, timedelta
+
+    history_file = _history_db()
+    if not os.path.exists(history_file):
+        print(f"\nNenhuma execução registrada ainda ({history_file}).")
+        return True
+
+    try:
+        conn = _open_history()
+        try:
+            operations = [row[0] for row in conn.execute(
+                "SELECT operacao FROM execucoes GROUP BY operacao ORDER BY MAX(id) DESC")]
+            if operation:
+                operations = [name for name in operations if operation.casefold() in name.casefold()]
+            if not operations:
+                print(f"\nNenhuma execução registrada para: {operation}")
+                return True
+
+            print(f"\nHistórico de execuções ({history_file})")
+            for name in operations:
+                rows = conn.execute("""
+                    SELECT data, sucesso, duracao_s, registros, bytes, fases
+                    FROM execucoes WHERE operacao = ? ORDER BY data, id
+                """, (name,)).fetchall()
+                successes = [row for row in rows if row[1]]
+                print("\n" + "─" * 62)
+                print(f"{name}: {len(rows)} execução(ões), {len(successes)} com sucesso")
+                print(f"  {'data':<19} {'registros':>10} {'duração':>9} {'vazão':>12} {'vs. ref.':>9}")
+
+                rates = []
+                shown = rows[-max(runs, 1):]
+                first_shown = len(rows) - len(shown)
+                for position, (date, ok, duration, count, size, _) in enumerate(rows):
+                    rate = _history_rate((duration, count, size)) if ok else None
+                    baseline = rates[-HISTORY_BASELINE_RUNS:]
+                    if position >= first_shown:
+                        unit = 'reg/s' if count else 'B/s'
+                        rate_text = f"{rate:,.0f} {unit}" if rate is not None else '—'
+                        compare = ''
+                        if rate is not None and len(baseline) >= 3:
+                            change = rate / statistics.median(baseline) - 1
+                            compare = f"{change:+.0%}"
+                            if change < -HISTORY_REGRESSION:
+                                compare += '  REGRESSÃO'
+                        status = '' if ok else '  (falhou)'
+                        print(f"  {date.replace('T', ' '):<19} {count if count is not None else '—':>10} "
+                              f"{duration:>8.2f}s {rate_text:>12} {compare:>9}{status}")
+                    if rate is not None:
+                        rates.append(rate)
+
+                # Tendência: vazão média da janela recente contra a anterior
+                now = datetime.now()
+                window = timedelta(days=HISTORY_TREND_DAYS)
+                recent, previous = [], []
+                for date, ok, duration, count, size, _ in successes:
+                    rate = _history_rate((duration, count, size))
+                    if rate is None:
+                        continue
+                    age = now - datetime.fromisoformat(date)
+                    if age <= window:
+                        recent.append(rate)
+                    elif age <= 2 * window:
+                        previous.append(rate)
+                if recent and previous:
+                    change = statistics.mean(recent) / statistics.mean(previous) - 1
+                    flag = '  REGRESSÃO' if change < -HISTORY_REGRESSION else ''
+                    print(f"  Tendência ({HISTORY_TREND_DAYS} dias): {statistics.mean(recent):,.0f} contra "
+                          f"{statistics.mean(previous):,.0f} no período anterior ({change:+.0%}){flag}")
+
+                phases = json.loads(rows[-1][5] or '{}')
+                if phases:
+                    print("  Fases (última): " + ', '.join(f"{phase} {seconds:.2f} s"
+                                                          for phase, seconds in phases.items()))
+        finally:
+            conn.close()
+        return True
+
+    except sqlite3.Error as e:
+        show_error_report('Histórico de Execuções', [{
+            'type': 'Erro de Banco de Dados',
+            'message': str(e),
+            'suggestion': f'Verifique o arquivo de histórico: {history_file}'
+        }], {'historico': history_file})
         return False
 
 def navigate_interactive(start_path, file_ext=None, title="Navegador de Arquivos"):
@@ -952,7 +4871,7 @@ def navigate_interactive(start_path, file_ext=None, title="Navegador de Arquivos
     
     while True:
         # Limpa a tela
-        os.system('cls' if os.name == 'nt' else 'clear')
+        clear_screen()
         
         # Cabeçalho
         print("\n┌─────────────────────────────────────────────────────────────┐")
@@ -1107,6 +5026,9 @@ def ensure_database_exists():
         return True
         
     print(f"\nDatabase não encontrado em: {DATABASE}")
+    if not INTERACTIVE:
+        print("Informe o caminho correto com --db.")
+        return False
     print("\nPressione Enter para navegar e selecionar o arquivo database.db...")
     input()
     
@@ -1179,7 +5101,7 @@ def main():
     
     # Interface gráfica do menu principal
     while True:
-        os.system('cls' if os.name == 'nt' else 'clear')
+        clear_screen()
         
         # Cabeçalho do programa
         print("\n┌─────────────────────────────────────────────────────────────┐")
@@ -1192,7 +5114,9 @@ def main():
         print("  2. Importar clientes de XML")
         print("  3. Exportar chamados para XML")
         print("  4. Importar chamados de XML")
-        print("  5. Sair")
+        print("  5. Analisar índices do banco")
+        print("  6. Validar arquivo XML (sem importar)")
+        print("  7. Sair")
         
         opcao = input("\nDigite o número da opção desejada: ").strip()
 
@@ -1205,6 +5129,18 @@ def main():
         elif opcao == "4":
             import_calls_menu()
         elif opcao == "5":
+            clear_screen()
+            analyze_indexes()
+            print("\nPressione qualquer tecla para continuar...")
+            getch()
+        elif opcao == "6":
+            clear_screen()
+            xml_file = get_xml_file("input")
+            if xml_file:
+                validate_xml_file(xml_file)
+                print("\nPressione qualquer tecla para continuar...")
+                getch()
+        elif opcao == "7":
             print("\nEncerrando o programa...")
             break
         else:
@@ -1214,7 +5150,7 @@ def main():
 def export_clients_menu():
     """Menu para exportação de clientes."""
     while True:
-        os.system('cls' if os.name == 'nt' else 'clear')
+        clear_screen()
         print("\n┌─────────────────────────────────────────────────────────────┐")
         print("│                   Exportação de Clientes                    │")
         print("└─────────────────────────────────────────────────────────────┘")
@@ -1259,7 +5195,7 @@ def export_clients_menu():
 
 def import_clients_menu():
     """Menu para importação de clientes."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    clear_screen()
     print("\n┌─────────────────────────────────────────────────────────────┐")
     print("│                   Importação de Clientes                    │")
     print("└─────────────────────────────────────────────────────────────┘")
@@ -1273,7 +5209,7 @@ def import_clients_menu():
 def export_calls_menu():
     """Menu para exportação de chamados."""
     while True:
-        os.system('cls' if os.name == 'nt' else 'clear')
+        clear_screen()
         print("\n┌─────────────────────────────────────────────────────────────┐")
         print("│                   Exportação de Chamados                    │")
         print("└─────────────────────────────────────────────────────────────┘")
@@ -1304,7 +5240,7 @@ def export_calls_menu():
             continue
             
         # Submenu para escolher o destino do arquivo
-        os.system('cls' if os.name == 'nt' else 'clear')
+        clear_screen()
         print("\n┌─────────────────────────────────────────────────────────────┐")
         print(f"│              Exportação de Chamados {status_text:<18} │")
         print("└─────────────────────────────────────────────────────────────┘")
@@ -1343,7 +5279,7 @@ def export_calls_menu():
 
 def import_calls_menu():
     """Menu para importação de chamados."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    clear_screen()
     print("\n┌─────────────────────────────────────────────────────────────┐")
     print("│                   Importação de Chamados                    │")
     print("└─────────────────────────────────────────────────────────────┘")
@@ -1355,37 +5291,193 @@ def import_calls_menu():
             getch()
 
 if __name__ == '__main__':
+    import argparse
+
     parser = argparse.ArgumentParser(description="Importação e Exportação de Dados do HelpHub")
     parser.add_argument('--db', help='Caminho para o arquivo database.db', default=DATABASE)
-    parser.add_argument('--export-clients', help='Exportar clientes para arquivo XML')
-    parser.add_argument('--import-clients', help='Importar clientes de arquivo XML')
-    parser.add_argument('--export-calls', help='Exportar chamados para arquivo XML')
-    parser.add_argument('--import-calls', help='Importar chamados de arquivo XML')
+    parser.add_argument('--export-clients', help='Exportar clientes para arquivo XML ("-" para a saída padrão)')
+    parser.add_argument('--import-clients', help='Importar clientes de arquivo XML ("-" para a entrada padrão)')
+    parser.add_argument('--export-calls', help='Exportar chamados para arquivo XML ("-" para a saída padrão)')
+    parser.add_argument('--import-calls', help='Importar chamados de arquivo XML ("-" para a entrada padrão)')
+    parser.add_argument('--export-nested', metavar='ARQUIVO',
+                        help='Exportar clientes com seus chamados e andamentos aninhados ("-" para a saída padrão)')
+    parser.add_argument('--export-all', metavar='PASTA',
+                        help='Exporta clientes e chamados em paralelo, do mesmo instantâneo do banco, com manifesto.json')
+    parser.add_argument('--merge-clients', metavar='PADRAO',
+                        help='Importa clientes de todos os XML de um diretório ou padrão glob, sem duplicados entre arquivos')
+    parser.add_argument('--merge-key', help='Colunas que identificam um cliente na mesclagem, separadas por vírgula (padrão: todas exceto id)')
+    parser.add_argument('--memory-budget', type=int, metavar='MB',
+                        help='Memória para os lotes das importações e exportações e para o índice de chaves da mesclagem, em MB (padrão: 64)')
+    parser.add_argument('--source', default=DEFAULT_ID_SOURCE,
+                        help='Nome da origem dos dados nas importações, usado no mapeamento de IDs antigos para novos')
     parser.add_argument('--calls-status', help='Filtro de status para exportação de chamados (Aberto/Finalizado)')
+    parser.add_argument('--search', help='Exporta apenas chamados cuja descrição ou andamentos correspondam à busca (FTS5)')
+    parser.add_argument('--build-search-index', action='store_true', help='Cria ou atualiza o índice de busca textual dos chamados')
+    parser.add_argument('--filter', help='Filtro das exportações, ex: "data_abertura>=2024-01-01;cliente_id=1,2;descricao~erro"')
+    parser.add_argument('--compact', action='store_true',
+                        help='Exporta no dialeto compacto: um elemento por linha do banco, com as colunas como atributos, um registro por linha do arquivo')
+    parser.add_argument('--with-hash', action='store_true', help='Grava o hash do conteúdo de cada registro exportado (atributo hash)')
+    parser.add_argument('--hash-manifest', metavar='ARQUIVO', help='Na exportação, grava o manifesto de hashes (id e hash por linha)')
+    parser.add_argument('--skip-known', metavar='MANIFESTO', help='Na importação, ignora registros cujo hash consta no manifesto informado')
+    parser.add_argument('--resume-from', metavar='N', type=int, default=0,
+                        help='Retoma uma importação interrompida pulando os N primeiros registros do arquivo (informados no erro)')
+    parser.add_argument('--validate', metavar='ARQUIVO', help='Valida um XML de clientes ou chamados contra o esquema do banco, sem importar')
+    parser.add_argument('--diff', metavar='ARQUIVO',
+                        help='Compara um XML de clientes ou chamados com o banco: novos, alterados e ausentes, sem importar')
+    parser.add_argument('--diff-key', default='id', metavar='COLUNA',
+                        help='Coluna que identifica o registro na comparação (padrão: id)')
+    parser.add_argument('--diff-output', metavar='ARQUIVO',
+                        help='Com --diff, grava um XML só com as diferenças ("-" para a saída padrão)')
+    parser.add_argument('--busy-timeout', type=int, metavar='MS',
+                        help=f'Espera do SQLite por um banco bloqueado por outro programa (padrão: {BUSY_TIMEOUT_MS} ms)')
+    parser.add_argument('--lock-retries', type=int, metavar='N',
+                        help=f'Novas tentativas de um lote da importação com o banco bloqueado (padrão: {IMPORT_LOCK_RETRIES})')
+    parser.add_argument('--batch-target-ms', type=int, metavar='MS',
+                        help=f'Duração desejada de cada lote: transação da importação ou bloco lido na exportação; '
+                             f'0 mantém o tamanho inicial (padrão: {int(BATCH_TARGET * 1000)} ms)')
+    parser.add_argument('--no-backup', action='store_true', help='Não cria o backup automático antes das importações')
+    parser.add_argument('--backup-compress', action='store_true', help='Compacta os backups com gzip')
+    parser.add_argument('--backup-keep', type=int, metavar='N', help=f'Quantidade de backups mantidos (padrão: {BACKUP_KEEP})')
+    parser.add_argument('--backup-dir', help='Pasta dos backups (padrão: "backups" ao lado do database)')
+    parser.add_argument('--backup', action='store_true', help='Cria um backup online do database e sai')
+    parser.add_argument('--restore', metavar='BACKUP', help='Restaura um backup (.db ou .db.gz) sobre o database')
+    parser.add_argument('--archive-calls', metavar='DATA',
+                        help='Arquiva em XML compactado e exclui os chamados finalizados antes da data (AAAA-MM-DD)')
+    parser.add_argument('--archive-dir', help='Pasta dos arquivos de chamados (padrão: "arquivo" ao lado do database)')
+    parser.add_argument('--archive-batch', type=int, metavar='N',
+                        help=f'Chamados excluídos por transação no arquivamento (padrão: {ARCHIVE_DELETE_BATCH})')
+    parser.add_argument('--analyze', action='store_true', help='Analisa os planos das consultas de exportação e sugere índices')
+    parser.add_argument('--create-indexes', action='store_true', help='Com --analyze, cria os índices sugeridos e executa ANALYZE')
+    parser.add_argument('--history', nargs='?', const='', metavar='OPERACAO',
+                        help='Exibe o histórico de execuções com as tendências de desempenho (opcionalmente de uma operação)')
+    parser.add_argument('--history-runs', type=int, default=10, metavar='N',
+                        help='Execuções exibidas por operação em --history (padrão: 10)')
+    parser.add_argument('--history-db', help='Arquivo do histórico (padrão: importexport_historico.db ao lado do database)')
+    parser.add_argument('--no-history', action='store_true', help='Não grava esta execução no histórico')
+    parser.add_argument('--verbose', action='store_true', help='Exibe cada registro processado durante as importações')
+    parser.add_argument('--pool-stats', action='store_true', help='Exibe estatísticas do pool de conexões ao final')
+    parser.add_argument('--startup-timing', action='store_true', help='Informa em stderr o instante da primeira consulta SQL')
+    parser.add_argument('--benchmark-startup', type=int, metavar='N', help='Mede N vezes o tempo até a primeira consulta SQL')
     
     args = parser.parse_args()
+
+    if args.pool_stats:
+        atexit.register(print_pool_stats)
     
+    VERBOSE = args.verbose
+    BACKUP_ENABLED = not args.no_backup
+    BACKUP_COMPRESS = args.backup_compress
+    if args.backup_keep is not None:
+        BACKUP_KEEP = max(args.backup_keep, 1)
+    if args.backup_dir:
+        BACKUP_DIR = args.backup_dir
+    if args.busy_timeout is not None:
+        BUSY_TIMEOUT_MS = max(args.busy_timeout, 0)
+    if args.lock_retries is not None:
+        IMPORT_LOCK_RETRIES = max(args.lock_retries, 0)
+    if args.batch_target_ms is not None:
+        BATCH_TARGET = max(args.batch_target_ms, 0) / 1000
+    if args.memory_budget:
+        MEMORY_BUDGET = max(args.memory_budget, 1) * 1024 * 1024
+    STARTUP_TIMING = args.startup_timing
+    HISTORY_ENABLED = not args.no_history
+    if args.history_db:
+        HISTORY_DB = args.history_db
+
+    # Operações pela linha de comando não limpam a tela nem aguardam teclas
+    INTERACTIVE = not any((args.export_clients, args.import_clients, args.export_calls, args.merge_clients,
+                           args.export_nested, args.export_all,
+                           args.import_calls, args.build_search_index, args.analyze, args.validate, args.diff,
+                           args.backup, args.restore, args.archive_calls, args.history is not None,
+                           args.benchmark_startup))
+
     # Atualiza a localização do database
     if args.db:
         DATABASE = args.db
+
+    # Com '-' a exportação vai para stdout; as mensagens seguem por stderr
+    reporter = (ConsoleReporter(sys.stderr)
+                if STDIO_PATH in (args.export_clients, args.export_calls, args.export_nested,
+                                  args.diff_output) else None)
     
     # Modo de linha de comando com argumentos específicos
+    # (o código de saída é 1 quando a operação falha, útil em agendamentos)
     if args.export_clients:
-        if ensure_database_exists():
-            export_clients(args.export_clients)
-        sys.exit(0)
+        ok = ensure_database_exists() and export_clients(args.export_clients, args.filter,
+                                                         args.with_hash, args.hash_manifest,
+                                                         reporter=reporter, compact=args.compact)
+        sys.exit(0 if ok else 1)
+    elif args.export_nested:
+        ok = ensure_database_exists() and export_nested(args.export_nested, args.filter,
+                                                        reporter=reporter, compact=args.compact)
+        sys.exit(0 if ok else 1)
+    elif args.export_all:
+        ok = ensure_database_exists() and export_all(args.export_all, args.with_hash,
+                                                     compact=args.compact)
+        sys.exit(0 if ok else 1)
     elif args.import_clients:
-        if ensure_database_exists():
-            import_clients(args.import_clients)
-        sys.exit(0)
+        ok = ensure_database_exists() and import_clients(args.import_clients, args.source,
+                                                         args.skip_known, resume_from=max(args.resume_from, 0))
+        sys.exit(0 if ok else 1)
+    elif args.merge_clients:
+        key_fields = [field.strip() for field in args.merge_key.split(',') if field.strip()] if args.merge_key else None
+        ok = ensure_database_exists() and merge_import_clients(args.merge_clients, args.source,
+                                                               key_fields, MEMORY_BUDGET)
+        sys.exit(0 if ok else 1)
     elif args.export_calls:
-        if ensure_database_exists():
-            export_calls(args.export_calls, args.calls_status)
-        sys.exit(0)
+        ok = ensure_database_exists() and export_calls(args.export_calls, args.calls_status,
+                                                       args.filter, args.search,
+                                                       args.with_hash, args.hash_manifest,
+                                                       reporter=reporter, compact=args.compact)
+        sys.exit(0 if ok else 1)
     elif args.import_calls:
-        if ensure_database_exists():
-            import_calls(args.import_calls)
-        sys.exit(0)
+        ok = ensure_database_exists() and import_calls(args.import_calls, args.source,
+                                                     args.skip_known, resume_from=max(args.resume_from, 0))
+        sys.exit(0 if ok else 1)
+    elif args.backup:
+        ok = ensure_database_exists()
+        if ok:
+            try:
+                backup_database()
+            except (sqlite3.Error, OSError) as e:
+                print(f"\nErro ao criar o backup: {e}")
+                ok = False
+        sys.exit(0 if ok else 1)
+    elif args.restore:
+        ok = ensure_database_exists() and restore_database(args.restore)
+        sys.exit(0 if ok else 1)
+    elif args.archive_calls:
+        ok = ensure_database_exists() and archive_calls(args.archive_calls, args.archive_dir,
+                                                        args.archive_batch)
+        sys.exit(0 if ok else 1)
+    elif args.validate:
+        ok = ensure_database_exists() and validate_xml_file(args.validate)
+        sys.exit(0 if ok else 1)
+    elif args.diff:
+        ok = ensure_database_exists() and diff_xml_file(args.diff, args.diff_key, args.diff_output,
+                                                        reporter=reporter)
+        sys.exit(0 if ok else 1)
+    elif args.build_search_index:
+        ok = ensure_database_exists()
+        if ok:
+            try:
+                index_stats = refresh_search_index()
+                print("\nÍndice de busca atualizado com sucesso!")
+                print(f"Chamados reindexados: {index_stats['reindexados']}")
+                print(f"Chamados removidos do índice: {index_stats['removidos']}")
+                print(f"Total indexado: {index_stats['total_indexado']}")
+            except sqlite3.Error as e:
+                print(f"\nErro ao atualizar o índice de busca: {e}")
+                ok = False
+        sys.exit(0 if ok else 1)
+    elif args.analyze:
+        ok = ensure_database_exists() and analyze_indexes(create=True if args.create_indexes else None)
+        sys.exit(0 if ok else 1)
+    elif args.history is not None:
+        sys.exit(0 if show_history(args.history, args.history_runs) else 1)
+    elif args.benchmark_startup:
+        ok = ensure_database_exists() and benchmark_startup(args.benchmark_startup)
+        sys.exit(0 if ok else 1)
     
     # Sem argumentos específicos, inicia o menu interativo
     try:
@@ -0,0 +1,81 @@
+"""
+API programática do Import-Export, para uso em outros programas Python.
+
+O script principal ("import-export sqlite3.py") tem espaço e hífen no nome e
+não pode ser importado com `import`; este módulo o carrega e reexporta as
+funções de biblioteca. Nada é impresso quando um CallbackReporter é usado, e
+a tela nunca é limpa nem uma tecla é aguardada. As rotinas só de linha de
+comando (analyze_indexes, show_history, refresh_search_index) não são
+exportadas. O histórico de execuções fica desativado; enable_history() passa
+a gravar cada operação nele, como na linha de comando.
+
+Exemplo:
+    import import_export_api as api
+
+    api.set_database('c:/HelpHub/backend/database.db')
+    reporter = api.CallbackReporter(on_progress=lambda p: print(p.rows, p.position))
+    result = api.import_clients('clientes.xml', reporter=reporter)
+    if not result:
+        print(result.errors)
+    print(result.details, result.duration)
+
+    for cliente in api.iter_clients('cidade=SP'):
+        print(cliente['nome'])
+"""
+
+import importlib.util
+import os
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import-export sqlite3.py')
+_spec = importlib.util.spec_from_file_location('import_export_sqlite3', _SCRIPT)
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+# Uso como biblioteca: sem limpar a tela nem aguardar teclas nos relatórios e
+# sem gravar o histórico de execuções (ver enable_history)
+_module.INTERACTIVE = False
+_module.HISTORY_ENABLED = False
+
+__all__ = [
+    'set_database',
+    'OperationResult',
+    'ConsoleReporter',
+    'CallbackReporter',
+    'ProgressReporter',
+    'export_clients',
+    'export_calls',
+    'export_nested',
+    'export_all',
+    'import_clients',
+    'import_calls',
+    'merge_import_clients',
+    'validate_xml_file',
+    'diff_xml_file',
+    'iter_clients',
+    'iter_calls',
+    'iter_xml_records',
+    'client_element',
+    'call_element',
+    'XmlStreamWriter',
+    'backup_database',
+    'restore_database',
+    'archive_calls',
+]
+
+globals().update({name: getattr(_module, name) for name in __all__})
+
+
+def enable_history(history_db=None):
+    """
+    Grava cada operação no histórico de execuções (consultado com --history).
+
+    Args:
+        history_db (str, optional): Banco do histórico (padrão:
+            importexport_historico.db ao lado do database)
+    """
+    _module.HISTORY_ENABLED = True
+    if history_db:
+        _module.HISTORY_DB = history_db
+
+
+__all__.append('enable_history')
@@ -0,0 +1,114 @@
+"""
+Testes do arquivamento de chamados: conferência do arquivo antes da exclusão.
+"""
+
+import gzip
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import import_export_api as api
+
+SCHEMA = """
+CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, email TEXT,
+                       telefone TEXT, cidade TEXT);
+CREATE TABLE chamados (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+                       descricao TEXT NOT NULL, status TEXT DEFAULT 'Aberto',
+                       data_abertura TEXT, data_fechamento TEXT,
+                       FOREIGN KEY (cliente_id) REFERENCES clientes(id));
+CREATE TABLE chamado_andamentos (id INTEGER PRIMARY KEY AUTOINCREMENT, chamado_id INTEGER NOT NULL,
+                                 data_hora TEXT NOT NULL, texto TEXT NOT NULL,
+                                 FOREIGN KEY (chamado_id) REFERENCES chamados(id));
+"""
+
+
+class ArchiveCallsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'database.db')
+        self.directory = os.path.join(self.tmp.name, 'arquivo')
+        with sqlite3.connect(self.database) as conn:
+            conn.executescript(SCHEMA)
+            # 1 a 6 finalizados antes do corte, 7 aberto e 8 finalizado depois
+            for n in range(1, 9):
+                status = 'Aberto' if n == 7 else 'Finalizado'
+                closed = '2025-06-01 10:00:00' if n == 8 else f'2023-0{1 + n % 2}-10 10:00:00'
+                conn.execute("INSERT INTO chamados (id, descricao, status, data_abertura, data_fechamento) "
+                             "VALUES (?, ?, ?, '2023-01-01 09:00:00', ?)", (n, f'Chamado {n}', status, closed))
+                conn.executemany("INSERT INTO chamado_andamentos (chamado_id, data_hora, texto) VALUES (?, ?, ?)",
+                                 [(n, '2023-01-01 10:00:00', f'a{n}'), (n, '2023-01-02 10:00:00', f'b{n}')])
+        api.set_database(self.database)
+        names = ('BACKUP_ENABLED', 'ARCHIVE_BATCH_PAUSE', '_count_archived')
+        self._saved = {name: getattr(api._module, name) for name in names}
+        api._module.BACKUP_ENABLED = False
+        api._module.ARCHIVE_BATCH_PAUSE = 0
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(api._module, name, value)
+        api._module.close_connection_manager()
+        self.tmp.cleanup()
+
+    def _remaining(self):
+        with sqlite3.connect(self.database) as conn:
+            calls = [row[0] for row in conn.execute("SELECT id FROM chamados ORDER BY id")]
+            andamentos = conn.execute("SELECT COUNT(*) FROM chamado_andamentos").fetchone()[0]
+        return calls, andamentos
+
+    def test_archive_and_delete(self):
+        result = api.archive_calls('2024-01-01', directory=self.directory, batch_size=2,
+                                   reporter=api.CallbackReporter())
+        self.assertTrue(result)
+        self.assertEqual(result.details['chamados_arquivados'], 6)
+        self.assertEqual(result.details['chamados_excluidos'], 6)
+        self.assertEqual(result.details['andamentos_excluidos'], 12)
+        self.assertEqual(self._remaining(), ([7, 8], 4))
+
+        # Um arquivo por mês de fechamento, com os chamados e andamentos excluídos
+        self.assertEqual(len(result.details['arquivos']), 2)
+        archived = 0
+        for path in result.details['arquivos']:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                archived += f.read().count('<chamado>')
+        self.assertEqual(archived, 6)
+
+    def test_changed_after_export_is_kept(self):
+        # Alterações feitas pelo aplicativo entre a gravação e a conferência
+        verify = api._module._count_archived
+
+        def change_then_verify(path):
+            if not changed:
+                changed.append(path)
+                with sqlite3.connect(self.database) as conn:
+                    conn.execute("INSERT INTO chamado_andamentos (chamado_id, data_hora, texto) "
+                                 "VALUES (1, '2025-01-01 10:00:00', 'novo')")
+                    conn.execute("UPDATE chamados SET data_fechamento = '2023-12-31 10:00:00' WHERE id = 2")
+                    conn.execute("UPDATE chamados SET status = 'Aberto' WHERE id = 3")
+            return verify(path)
+
+        changed = []
+        api._module._count_archived = change_then_verify
+        result = api.archive_calls('2024-01-01', directory=self.directory,
+                                   reporter=api.CallbackReporter())
+        self.assertTrue(result)
+        self.assertEqual(result.details['chamados_excluidos'], 3)
+        self.assertEqual(result.details['chamados_reabertos'], 3)
+        self.assertEqual(result.details['andamentos_excluidos'], 6)
+        calls, andamentos = self._remaining()
+        self.assertEqual(calls, [1, 2, 3, 7, 8])
+        self.assertEqual(andamentos, 11)
+
+    def test_unreadable_file_deletes_nothing(self):
+        api._module._count_archived = lambda path: (0, 0)
+        result = api.archive_calls('2024-01-01', directory=self.directory,
+                                   reporter=api.CallbackReporter())
+        self.assertFalse(result)
+        self.assertEqual(self._remaining(), ([1, 2, 3, 4, 5, 6, 7, 8], 16))
+
+
+if __name__ == '__main__':
+    unittest.main()
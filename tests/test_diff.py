@@ -0,0 +1,94 @@
+"""
+Testes das contagens da comparação com o banco (--diff).
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import import_export_api as api
+
+SCHEMA = """
+CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, email TEXT,
+                       telefone TEXT, cidade TEXT);
+CREATE TABLE chamados (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+                       descricao TEXT NOT NULL, status TEXT DEFAULT 'Aberto',
+                       data_abertura TEXT, data_fechamento TEXT,
+                       FOREIGN KEY (cliente_id) REFERENCES clientes(id));
+CREATE TABLE chamado_andamentos (id INTEGER PRIMARY KEY AUTOINCREMENT, chamado_id INTEGER NOT NULL,
+                                 data_hora TEXT NOT NULL, texto TEXT NOT NULL,
+                                 FOREIGN KEY (chamado_id) REFERENCES chamados(id));
+"""
+
+
+def calls_xml(records):
+    body = ''.join(
+        f"<chamado><id>{id_}</id><descricao>{descricao}</descricao><andamentos>"
+        + ''.join(f"<andamento><data_hora>{data_hora}</data_hora><texto>{texto}</texto></andamento>"
+                  for data_hora, texto in andamentos)
+        + "</andamentos></chamado>"
+        for id_, descricao, andamentos in records)
+    return "<?xml version='1.0' encoding='utf-8'?>\n<chamados>" + body + "</chamados>"
+
+
+class DiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'database.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.executescript(SCHEMA)
+            conn.executemany("INSERT INTO chamados (id, descricao) VALUES (?, ?)",
+                             [(1, 'Igual'), (2, 'Antes'), (3, 'Com andamento'), (4, 'Ausente')])
+            conn.execute("INSERT INTO chamado_andamentos (chamado_id, data_hora, texto) "
+                         "VALUES (3, '2024-01-01 10:00:00', 'original')")
+        api.set_database(self.database)
+
+    def tearDown(self):
+        api._module.close_connection_manager()
+        self.tmp.cleanup()
+
+    def _diff(self, records, delta_file=None):
+        xml_file = os.path.join(self.tmp.name, 'chamados.xml')
+        with open(xml_file, 'w', encoding='utf-8') as f:
+            f.write(calls_xml(records))
+        return api.diff_xml_file(xml_file, delta_file=delta_file, reporter=api.CallbackReporter())
+
+    def test_counts(self):
+        result = self._diff([
+            (1, '  Igual  ', []),                                    # espaços somem, como na importação
+            (2, 'Depois', []),
+            (3, 'Com andamento', [('2024-01-01 10:00:00', 'outro')]),
+            (5, 'Novo', []),
+        ])
+        self.assertTrue(result)
+        counts = {kind: result.details[kind] for kind in ('novos', 'alterados', 'iguais', 'ausentes')}
+        self.assertEqual(counts, {'novos': 1, 'alterados': 2, 'iguais': 1, 'ausentes': 1})
+        self.assertEqual(result.details['registros_lidos'], 4)
+
+    def test_identical_file(self):
+        result = self._diff([
+            (1, 'Igual', []),
+            (2, 'Antes', []),
+            (3, 'Com andamento', [('2024-01-01 10:00:00', 'original')]),
+            (4, 'Ausente', []),
+        ])
+        self.assertTrue(result)
+        self.assertEqual((result.details['iguais'], result.details['novos'],
+                          result.details['alterados'], result.details['ausentes']), (4, 0, 0, 0))
+
+    def test_delta_file(self):
+        delta_file = os.path.join(self.tmp.name, 'delta.xml')
+        self._diff([(1, 'Igual', []), (2, 'Depois', []), (5, 'Novo', [])], delta_file=delta_file)
+        with open(delta_file, encoding='utf-8') as f:
+            content = f.read()
+        self.assertEqual(content.count('diferenca="novo"'), 1)
+        self.assertEqual(content.count('diferenca="alterado"'), 1)
+        self.assertEqual(content.count('diferenca="ausente"'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Testes do --skip-known com um manifesto de hashes corrompido.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import import_export_api as api
+
+SCHEMA = """
+CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, email TEXT,
+                       telefone TEXT, cidade TEXT);
+CREATE TABLE chamados (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+                       descricao TEXT NOT NULL, status TEXT DEFAULT 'Aberto',
+                       data_abertura TEXT, data_fechamento TEXT,
+                       FOREIGN KEY (cliente_id) REFERENCES clientes(id));
+CREATE TABLE chamado_andamentos (id INTEGER PRIMARY KEY AUTOINCREMENT, chamado_id INTEGER NOT NULL,
+                                 data_hora TEXT NOT NULL, texto TEXT NOT NULL,
+                                 FOREIGN KEY (chamado_id) REFERENCES chamados(id));
+"""
+
+CLIENTS_XML = ("<?xml version='1.0' encoding='utf-8'?>\n"
+               "<clientes><cliente><id>1</id><nome>Cliente 0</nome></cliente></clientes>")
+CALLS_XML = ("<?xml version='1.0' encoding='utf-8'?>\n"
+             "<chamados><chamado><id>1</id><descricao>Problema</descricao>"
+             "<andamentos /></chamado></chamados>")
+
+
+class CorruptManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'database.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.executescript(SCHEMA)
+        api.set_database(self.database)
+        self._saved = {name: getattr(api._module, name) for name in ('BACKUP_ENABLED', 'HISTORY_ENABLED')}
+        api._module.BACKUP_ENABLED = False
+        api._module.HISTORY_ENABLED = False
+
+        self.manifest = os.path.join(self.tmp.name, 'manifesto.txt')
+        with open(self.manifest, 'w', encoding='utf-8') as f:
+            f.write("1\t174ae0c1980015ae46e3dd35d195383b\n2\tnao-e-hexadecimal\n")
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(api._module, name, value)
+        api._module.close_connection_manager()
+        self.tmp.cleanup()
+
+    def _import(self, function, content):
+        xml_file = os.path.join(self.tmp.name, 'dados.xml')
+        with open(xml_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        reported = []
+        reporter = api.CallbackReporter(on_error=lambda operation, error: reported.append(error))
+        return function(xml_file, skip_known=self.manifest, reporter=reporter), reported
+
+    def assert_manifest_error(self, result, reported):
+        self.assertFalse(result)
+        self.assertEqual([error['type'] for error in result.errors], ['Manifesto Inválido'])
+        self.assertIn('linha 2', result.errors[0]['message'])
+        self.assertTrue(reported)
+
+    def test_import_clients_reports_corrupt_manifest(self):
+        result, reported = self._import(api.import_clients, CLIENTS_XML)
+        self.assert_manifest_error(result, reported)
+        with sqlite3.connect(self.database) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0], 0)
+
+    def test_import_calls_reports_corrupt_manifest(self):
+        result, reported = self._import(api.import_calls, CALLS_XML)
+        self.assert_manifest_error(result, reported)
+        with sqlite3.connect(self.database) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM chamados").fetchone()[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Testes da retomada de uma importação interrompida (resume_from).
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import import_export_api as api
+
+SCHEMA = """
+CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, email TEXT,
+                       telefone TEXT, cidade TEXT);
+CREATE TABLE chamados (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+                       descricao TEXT NOT NULL, status TEXT DEFAULT 'Aberto',
+                       data_abertura TEXT, data_fechamento TEXT,
+                       FOREIGN KEY (cliente_id) REFERENCES clientes(id));
+CREATE TABLE chamado_andamentos (id INTEGER PRIMARY KEY AUTOINCREMENT, chamado_id INTEGER NOT NULL,
+                                 data_hora TEXT NOT NULL, texto TEXT NOT NULL,
+                                 FOREIGN KEY (chamado_id) REFERENCES chamados(id));
+"""
+
+
+def calls_xml(total, broken_at=None):
+    records = []
+    for n in range(total):
+        if n == broken_at:
+            records.append("<chamado><descricao>quebrado</chamado>")
+        records.append(f"<chamado><id>{n + 1}</id><descricao>Problema {n}</descricao><andamentos>"
+                       f"<andamento><data_hora>2024-01-01 10:00:00</data_hora><texto>a{n}</texto></andamento>"
+                       f"</andamentos></chamado>")
+    return "<?xml version='1.0' encoding='utf-8'?>\n<chamados>" + ''.join(records) + "</chamados>"
+
+
+class ResumeImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'database.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.executescript(SCHEMA)
+        api.set_database(self.database)
+        names = ('BACKUP_ENABLED', 'IMPORT_BATCH_SIZE', 'IMPORT_BATCH_MIN', 'IMPORT_BATCH_MAX')
+        self._saved = {name: getattr(api._module, name) for name in names}
+        api._module.BACKUP_ENABLED = False
+        # Lotes fixos de 10 registros, para que o erro aconteça após alguns COMMITs
+        api._module.IMPORT_BATCH_SIZE = api._module.IMPORT_BATCH_MIN = api._module.IMPORT_BATCH_MAX = 10
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(api._module, name, value)
+        api._module.close_connection_manager()
+        self.tmp.cleanup()
+
+    def _write(self, content):
+        xml_file = os.path.join(self.tmp.name, 'chamados.xml')
+        with open(xml_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return xml_file
+
+    def test_resume_after_malformed_record(self):
+        reporter = api.CallbackReporter()
+        result = api.import_calls(self._write(calls_xml(50, broken_at=35)), reporter=reporter)
+        self.assertFalse(result)
+        error = result.errors[-1]
+        self.assertEqual(error['type'], 'Erro de XML')
+        self.assertEqual(error['data']['registros_confirmados'], 30)
+        self.assertIn('--resume-from 30', error['suggestion'])
+
+        result = api.import_calls(self._write(calls_xml(50)), reporter=reporter, resume_from=30)
+        self.assertTrue(result)
+        self.assertEqual(result.details['importados'], 20)
+        with sqlite3.connect(self.database) as conn:
+            descriptions = [row[0] for row in conn.execute("SELECT descricao FROM chamados ORDER BY id")]
+            andamentos = conn.execute("SELECT COUNT(*) FROM chamado_andamentos").fetchone()[0]
+        self.assertEqual(descriptions, [f'Problema {n}' for n in range(50)])
+        self.assertEqual(andamentos, 50)
+
+    def test_error_on_batch_boundary(self):
+        # O erro logo após o COMMIT do terceiro lote: os 30 registros estão confirmados
+        result = api.import_calls(self._write(calls_xml(50, broken_at=30)), reporter=api.CallbackReporter())
+        self.assertFalse(result)
+        error = result.errors[-1]
+        self.assertEqual(error['data']['registros_confirmados'], 30)
+        self.assertIn('--resume-from 30', error['suggestion'])
+
+        result = api.import_calls(self._write(calls_xml(50)), reporter=api.CallbackReporter(),
+                                  resume_from=30)
+        self.assertTrue(result)
+        with sqlite3.connect(self.database) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*), COUNT(DISTINCT descricao) FROM chamados").fetchone(),
+                             (50, 50))
+
+    def test_error_after_first_batch(self):
+        result = api.import_calls(self._write(calls_xml(50, broken_at=10)), reporter=api.CallbackReporter())
+        self.assertEqual(result.errors[-1]['data']['registros_confirmados'], 10)
+        self.assertIn('--resume-from 10', result.errors[-1]['suggestion'])
+
+    def test_resume_beyond_end_of_file(self):
+        result = api.import_calls(self._write(calls_xml(5)), reporter=api.CallbackReporter(),
+                                  resume_from=5)
+        self.assertFalse(result)
+        self.assertEqual(result.errors[-1]['type'], 'Erro de XML')
+
+
+if __name__ == '__main__':
+    unittest.main()
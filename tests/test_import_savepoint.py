@@ -0,0 +1,93 @@
+"""
+Testes do SAVEPOINT por chamado na importação em lotes.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import import_export_api as api
+
+SCHEMA = """
+CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, email TEXT,
+                       telefone TEXT, cidade TEXT);
+CREATE TABLE chamados (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+                       descricao TEXT NOT NULL, status TEXT DEFAULT 'Aberto',
+                       data_abertura TEXT, data_fechamento TEXT,
+                       FOREIGN KEY (cliente_id) REFERENCES clientes(id));
+CREATE TABLE chamado_andamentos (id INTEGER PRIMARY KEY AUTOINCREMENT, chamado_id INTEGER NOT NULL,
+                                 data_hora TEXT NOT NULL, texto TEXT NOT NULL,
+                                 FOREIGN KEY (chamado_id) REFERENCES chamados(id));
+-- Recusa um andamento específico, depois que o chamado já foi gravado
+CREATE TRIGGER recusa_andamento BEFORE INSERT ON chamado_andamentos
+WHEN NEW.texto = 'recusado'
+BEGIN
+    SELECT RAISE(ABORT, 'andamento recusado');
+END;
+"""
+
+
+def calls_xml(total, refused_at):
+    records = []
+    for n in range(total):
+        second = 'recusado' if n == refused_at else f'b{n}'
+        records.append(f"<chamado><id>{n + 1}</id><descricao>Problema {n}</descricao><andamentos>"
+                       f"<andamento><data_hora>2024-01-01 10:00:00</data_hora><texto>a{n}</texto></andamento>"
+                       f"<andamento><data_hora>2024-01-01 11:00:00</data_hora><texto>{second}</texto></andamento>"
+                       f"</andamentos></chamado>")
+    return "<?xml version='1.0' encoding='utf-8'?>\n<chamados>" + ''.join(records) + "</chamados>"
+
+
+class SavepointImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'database.db')
+        with sqlite3.connect(self.database) as conn:
+            conn.executescript(SCHEMA)
+        api.set_database(self.database)
+        names = ('BACKUP_ENABLED', 'IMPORT_BATCH_SIZE', 'IMPORT_BATCH_MIN', 'IMPORT_BATCH_MAX')
+        self._saved = {name: getattr(api._module, name) for name in names}
+        api._module.BACKUP_ENABLED = False
+        api._module.IMPORT_BATCH_SIZE = api._module.IMPORT_BATCH_MIN = api._module.IMPORT_BATCH_MAX = 10
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(api._module, name, value)
+        api._module.close_connection_manager()
+        self.tmp.cleanup()
+
+    def _import(self, content):
+        xml_file = os.path.join(self.tmp.name, 'chamados.xml')
+        with open(xml_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return api.import_calls(xml_file, reporter=api.CallbackReporter())
+
+    def test_half_imported_call_is_rolled_back(self):
+        # O segundo andamento do chamado 13 falha: o chamado e o primeiro
+        # andamento dele são desfeitos, e o resto do lote é confirmado
+        result = self._import(calls_xml(25, refused_at=12))
+        self.assertTrue(result)
+        self.assertEqual(result.details['importados'], 24)
+        with sqlite3.connect(self.database) as conn:
+            descriptions = [row[0] for row in conn.execute("SELECT descricao FROM chamados ORDER BY id")]
+            texts = {row[0] for row in conn.execute("SELECT texto FROM chamado_andamentos")}
+            orphans = conn.execute("""SELECT COUNT(*) FROM chamado_andamentos
+                                      WHERE chamado_id NOT IN (SELECT id FROM chamados)""").fetchone()[0]
+        self.assertEqual(descriptions, [f'Problema {n}' for n in range(25) if n != 12])
+        self.assertNotIn('a12', texts)
+        self.assertEqual(len(texts), 48)
+        self.assertEqual(orphans, 0)
+
+    def test_failed_call_is_reported(self):
+        result = self._import(calls_xml(5, refused_at=0))
+        self.assertTrue(result)
+        self.assertEqual(result.details['importados'], 4)
+        self.assertTrue(any('andamento recusado' in error['message'] for error in result.errors))
+
+
+if __name__ == '__main__':
+    unittest.main()
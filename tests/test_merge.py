@@ -0,0 +1,88 @@
+"""
+Testes da importação mesclada de clientes (eliminação de duplicados entre arquivos).
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import import_export_api as api
+
+SCHEMA = """
+CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, email TEXT,
+                       telefone TEXT, cidade TEXT);
+CREATE TABLE chamados (id INTEGER PRIMARY KEY AUTOINCREMENT, cliente_id INTEGER,
+                       descricao TEXT NOT NULL, status TEXT DEFAULT 'Aberto',
+                       data_abertura TEXT, data_fechamento TEXT,
+                       FOREIGN KEY (cliente_id) REFERENCES clientes(id));
+CREATE TABLE chamado_andamentos (id INTEGER PRIMARY KEY AUTOINCREMENT, chamado_id INTEGER NOT NULL,
+                                 data_hora TEXT NOT NULL, texto TEXT NOT NULL,
+                                 FOREIGN KEY (chamado_id) REFERENCES chamados(id));
+"""
+
+
+def clients_xml(records):
+    body = ''.join(f"<cliente><id>{id_}</id><nome>{nome}</nome><email>{email}</email>"
+                   f"<cidade>SP</cidade></cliente>" for id_, nome, email in records)
+    return "<?xml version='1.0' encoding='utf-8'?>\n<clientes>" + body + "</clientes>"
+
+
+class MergeImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp.name, 'database.db')
+        self.directory = os.path.join(self.tmp.name, 'filiais')
+        os.makedirs(self.directory)
+        with sqlite3.connect(self.database) as conn:
+            conn.executescript(SCHEMA)
+        api.set_database(self.database)
+        self._saved = {'BACKUP_ENABLED': api._module.BACKUP_ENABLED}
+        api._module.BACKUP_ENABLED = False
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(api._module, name, value)
+        api._module.close_connection_manager()
+        self.tmp.cleanup()
+
+    def _write(self, name, records):
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(clients_xml(records))
+
+    def test_duplicates_across_files(self):
+        self._write('a.xml', [(n, f'Cliente {n}', f'c{n}@x.com') for n in range(1, 6)])
+        # Os três primeiros repetem clientes de a.xml, com outra caixa e espaços
+        self._write('b.xml', [(1, 'CLIENTE 1', 'c1@x.com'), (2, ' Cliente 2 ', 'C2@X.COM'),
+                              (3, 'Cliente 3', 'c3@x.com'), (4, 'Outro 4', 'o4@x.com'),
+                              (5, 'Outro 5', 'o5@x.com')])
+        result = api.merge_import_clients(self.directory, reporter=api.CallbackReporter())
+        self.assertTrue(result)
+        self.assertEqual(result.details['registros_lidos'], 10)
+        self.assertEqual(result.details['importados'], 7)
+        self.assertEqual(result.details['duplicados'], 3)
+        self.assertEqual(result.details['duplicados_mapeados'], 3)
+
+        with sqlite3.connect(self.database) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0], 7)
+            mapping = dict(conn.execute(f"""SELECT origem || '/' || id_origem, id_novo
+                                            FROM {api._module.ID_MAP_TABLE}"""))
+        # Os duplicados de b.xml apontam para o cliente mantido de a.xml
+        for n in (1, 2, 3):
+            self.assertEqual(mapping[f'padrao:b/{n}'], mapping[f'padrao:a/{n}'])
+        self.assertNotEqual(mapping['padrao:b/4'], mapping['padrao:a/4'])
+
+    def test_duplicate_file(self):
+        records = [(n, f'Cliente {n}', f'c{n}@x.com') for n in range(1, 4)]
+        self._write('a.xml', records)
+        self._write('b.xml', records)
+        result = api.merge_import_clients(self.directory, reporter=api.CallbackReporter())
+        self.assertTrue(result)
+        self.assertEqual((result.details['importados'], result.details['duplicados']), (3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()